@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date, datetime, timedelta
+from typing import Optional
+from routes import get_db, verify_admin
+from repositories import get_repositories
+from serialization import FastJSONResponse, encode_documents
+from pricing import price_index
+import sales_rollups
+
+router = APIRouter()
+
+# Widest range each rollup period may be queried over
+MAX_RANGE_DAYS = {"day": 366, "hour": 31}
+
+
+def _local_range(date_from: Optional[date], date_to: Optional[date], default_days: int, period: str):
+    """Inclusive local dates to a [start, end) pair of local midnights"""
+    today = sales_rollups.local_time(datetime.utcnow()).date()
+    date_to = date_to or today
+    date_from = date_from or date_to - timedelta(days=default_days - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days + 1 > MAX_RANGE_DAYS[period]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too large for {period} rollups (max {MAX_RANGE_DAYS[period]} days)"
+        )
+    start = datetime.combine(date_from, datetime.min.time())
+    return start, datetime.combine(date_to, datetime.min.time()) + timedelta(days=1)
+
+# ============= ANALYTICS ROUTES =============
+
+@router.get("/analytics/sales", dependencies=[Depends(verify_admin)])
+async def get_sales(
+    period: str = Query("day", regex="^(day|hour)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Per-day or per-hour sales rollups, oldest first"""
+    db = get_db()
+    start, end = _local_range(date_from, date_to, 30 if period == "day" else 1, period)
+    rollups = await sales_rollups.get_rollups(db, period, start, end)
+    return FastJSONResponse(content=encode_documents(rollups))
+
+@router.get("/analytics/summary", dependencies=[Depends(verify_admin)])
+async def get_sales_summary(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    top_items: int = Query(10, ge=1, le=100)
+):
+    """Totals and best sellers over a date range"""
+    db = get_db()
+    start, end = _local_range(date_from, date_to, 30, "day")
+    summary = sales_rollups.summarize(await sales_rollups.get_rollups(db, "day", start, end), top_items)
+    await get_repositories().menu.prices()  # loads the price index used for item names
+    for item in summary["top_items"]:
+        entry = price_index.get(item["item_id"])
+        item["name"] = entry.name if entry else None
+    summary["date_from"] = start.date()
+    summary["date_to"] = (end - timedelta(days=1)).date()
+    return FastJSONResponse(content=summary)
+
+@router.post("/analytics/rebuild", dependencies=[Depends(verify_admin)])
+async def rebuild_sales(date_from: date, date_to: date):
+    """Recompute rollups for a date range from the orders collection"""
+    db = get_db()
+    start, end = _local_range(date_from, date_to, 1, "day")
+    count = await sales_rollups.rebuild(db, start, end)
+    return {"message": "Sales rollups rebuilt", "rollups": count}
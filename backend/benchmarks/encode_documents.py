@@ -0,0 +1,100 @@
+"""Cost of turning 1000 Mongo documents into a response body.
+
+    python benchmarks/encode_documents.py [-n 1000] [--rounds 50]
+
+"legacy" is what the list routes did before serialization.py: copy _id to
+id in a Python loop, then FastAPI's jsonable_encoder and json.dumps.
+"""
+from pathlib import Path
+import argparse
+import copy
+import json
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from models import MenuCategory, Order
+from serialization import encode_documents, orjson
+
+
+def order_documents(n: int):
+    return [{
+        "_id": ObjectId(),
+        "order_number": f"ORD20241220-{i:04d}",
+        "customer_name": "John Doe",
+        "customer_email": "john@example.com",
+        "customer_phone": "+91 9876543210",
+        "items": [
+            {"item_id": f"item-{j}", "name": "Paneer Tikka", "price": 220.0, "quantity": 2, "subtotal": 440.0}
+            for j in range(3)
+        ],
+        "total_amount": 1320.0,
+        "payment_status": "completed",
+        "payment_id": "pay_XYZ123",
+        "order_status": "preparing",
+        "delivery_type": "delivery",
+        "delivery_address": "123 Main Street, Patna",
+        "special_instructions": "Extra spicy please",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    } for i in range(n)]
+
+
+def menu_documents(n: int):
+    item = {
+        "id": "item", "name": "Paneer Tikka", "description": "Cottage cheese marinated in spices",
+        "price": 220.0, "image": None, "category": "Starters", "spicy": "Low",
+        "is_vegetarian": True, "is_spicy": False, "available": True,
+        "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+    }
+    per_category = 20
+    return [{
+        "_id": ObjectId(), "name": f"Category {c}", "description": "Begin your culinary journey",
+        "items": [dict(item, id=f"item-{c}-{i}") for i in range(per_category)],
+    } for c in range(max(n // per_category, 1))]
+
+
+def legacy(docs, model=None):
+    for doc in docs:
+        doc["id"] = str(doc["_id"])
+        doc.pop("_id", None)
+    if model is not None:
+        # response_model: validate, then encode the validated models
+        docs = [model(**doc) for doc in docs]
+    return json.dumps(jsonable_encoder(docs)).encode("utf-8")
+
+
+def bench(name, fn, docs, rounds, model=None):
+    samples = [copy.deepcopy(docs) for _ in range(rounds)]
+    start = time.perf_counter()
+    for sample in samples:
+        fn(sample, model)
+    per_round = (time.perf_counter() - start) / rounds * 1000
+    print(f"  {name:<28} {per_round:8.2f} ms")
+    return per_round
+
+
+def main(args):
+    print(f"encoder: {'orjson' if orjson else 'stdlib json'}")
+    cases = [
+        ("orders", order_documents(args.n), Order),
+        ("menu items", menu_documents(args.n), MenuCategory),
+    ]
+    for label, docs, model in cases:
+        print(f"{label} (per {args.n} documents, mean of {args.rounds} rounds)")
+        before = bench("legacy", legacy, docs, args.rounds)
+        after = bench("encode_documents", encode_documents, docs, args.rounds)
+        before_v = bench("legacy + response_model", legacy, docs, args.rounds, model)
+        after_v = bench("encode_documents + model", encode_documents, docs, args.rounds, model)
+        print(f"  speedup: {before / after:.1f}x unvalidated, {before_v / after_v:.1f}x validated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,283 @@
+"""Mixed-traffic load test of the API with per-route latency percentiles.
+
+Boots the FastAPI app from server.py in process, backed by an in-memory
+Mongo stand-in (mongomock-motor), a real server or the in-memory
+repositories (--storage memory, no Mongo at all), with the stub payment
+gateway, and drives it through httpx's ASGI transport:
+
+    python benchmarks/load.py -c 20 -d 30
+    python benchmarks/load.py --storage memory
+    python benchmarks/load.py --mongo-url mongodb://localhost:27017 --save-baseline main
+    python benchmarks/load.py --compare main
+
+Each virtual user browses the menu and, with probability --checkout-ratio,
+checks out: create order, create payment, verify. With --admin-ratio it
+instead loads the admin order list. Baselines are JSON files in
+benchmarks/baselines/. --compare exits non-zero when a route's p95 is more
+than --tolerance slower than the baseline, when it has more errors, or when
+the run's settings differ from the baseline's.
+
+The committed baselines were recorded with the default settings on a
+single-vCPU Linux VM (Python 3.11):
+
+    python benchmarks/load.py --save-baseline mongomock
+    python benchmarks/load.py --storage memory --save-baseline memory
+
+Latencies depend on the machine, so re-record them before comparing on
+another one, and use a generous --tolerance in CI.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def configure_environment(args) -> None:
+    """Settings that must be in place before server.py is imported"""
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["PAYMENT_GATEWAY"] = "stub"
+    os.environ["PAYMENT_STUB_LATENCY_MS"] = str(args.gateway_latency_ms)
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("ORDER_EVENTS_BROKER", "memory")
+    os.environ["STORAGE_BACKEND"] = args.storage
+
+
+def load_app(args):
+    import server
+    if not args.mongo_url and args.storage == "mongo":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("mongomock-motor is not installed; pip install mongomock-motor or pass --mongo-url")
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db_name]
+    return server
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+
+    def record(self, route: str, elapsed_ms: float, ok: bool) -> None:
+        self.timings.setdefault(route, []).append(elapsed_ms)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, duration: float) -> dict:
+        routes = {}
+        for route, timings in sorted(self.timings.items()):
+            timings = sorted(timings)
+            routes[route] = {
+                "count": len(timings),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(timings) / duration, 1),
+                "mean_ms": round(statistics.mean(timings), 2),
+                "p50_ms": round(_percentile(timings, 50), 2),
+                "p95_ms": round(_percentile(timings, 95), 2),
+                "p99_ms": round(_percentile(timings, 99), 2),
+            }
+        total = sum(r["count"] for r in routes.values())
+        return {"duration_s": round(duration, 2), "requests": total,
+                "rps": round(total / duration, 1), "routes": routes}
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def timed(http, recorder: Recorder, route: str, method: str, url: str, ok_statuses=(200,), **kwargs):
+    start = time.perf_counter()
+    response = await http.request(method, url, **kwargs)
+    recorder.record(route, (time.perf_counter() - start) * 1000, response.status_code in ok_statuses)
+    return response
+
+
+async def seed_menu(http, headers: dict, categories: int, items_per_category: int) -> None:
+    for c in range(categories):
+        category = await http.post("/api/menu/category", headers=headers, json={
+            "name": f"Category {c}", "description": "Benchmark category"
+        })
+        for i in range(items_per_category):
+            await http.post("/api/menu/item", headers=headers, params={"category_id": category.json()["id"]}, json={
+                "name": f"Dish {c}-{i}", "description": "Benchmark dish",
+                "price": 120 + 10 * i, "category": "Veg", "available": True
+            })
+
+
+async def virtual_user(http, recorder: Recorder, args, admin_headers: dict, deadline: float, rng: random.Random):
+    from payment_gateway import get_gateway
+    etag, items = None, []
+    while time.perf_counter() < deadline:
+        if rng.random() < args.admin_ratio:
+            await timed(http, recorder, "GET /api/orders", "GET", "/api/orders",
+                        headers=admin_headers, params={"limit": 50, "view": "summary"})
+            continue
+
+        headers = {"If-None-Match": etag} if etag and rng.random() < args.revalidate_ratio else {}
+        menu = await timed(http, recorder, "GET /api/menu/categories", "GET", "/api/menu/categories",
+                           ok_statuses=(200, 304), headers=headers)
+        if menu.status_code == 200:
+            etag = menu.headers.get("etag")
+            items = [item for category in menu.json() for item in category["items"]]
+        if rng.random() >= args.checkout_ratio or not items:
+            continue
+
+        chosen = rng.sample(items, min(len(items), rng.randint(1, 4)))
+        order = await timed(http, recorder, "POST /api/orders", "POST", "/api/orders", json={
+            "customer_name": "Load Test", "customer_email": "load@example.com", "customer_phone": "9999999999",
+            "items": [{"item_id": item["id"], "name": item["name"], "price": item["price"],
+                       "quantity": 1, "subtotal": item["price"]} for item in chosen],
+            "total_amount": sum(item["price"] for item in chosen),
+        })
+        if order.status_code != 200:
+            continue
+        order = order.json()
+        payment = await timed(http, recorder, "POST /api/payment/create-order", "POST", "/api/payment/create-order", json={
+            "amount": int(order["total_amount"] * 100), "order_id": order["order_id"]
+        })
+        if payment.status_code != 200:
+            continue
+        razorpay_order_id = payment.json()["order_id"]
+        payment_id = f"pay_{uuid.uuid4().hex[:14]}"
+        await timed(http, recorder, "POST /api/payment/verify", "POST", "/api/payment/verify", json={
+            "razorpay_order_id": razorpay_order_id,
+            "razorpay_payment_id": payment_id,
+            "razorpay_signature": get_gateway().sign_payment(razorpay_order_id, payment_id),
+        })
+
+
+async def run(args) -> dict:
+    import httpx
+    server = load_app(args)
+    app = server.app
+    for handler in app.router.on_startup:
+        await handler()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            login = await http.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+            admin_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+            await seed_menu(http, admin_headers, args.categories, args.items)
+
+            if args.warmup:
+                await asyncio.gather(*[
+                    virtual_user(http, Recorder(), args, admin_headers, time.perf_counter() + args.warmup, random.Random(i))
+                    for i in range(args.concurrency)
+                ])
+
+            recorder = Recorder()
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                virtual_user(http, recorder, args, admin_headers, start + args.duration, random.Random(args.seed + i))
+                for i in range(args.concurrency)
+            ])
+            return recorder.summary(time.perf_counter() - start)
+    finally:
+        for handler in app.router.on_shutdown:
+            await handler()
+        if args.mongo_url:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            cleanup = AsyncIOMotorClient(args.mongo_url)
+            await cleanup.drop_database(args.db_name)
+            cleanup.close()
+
+
+def print_report(result: dict) -> None:
+    print(f"{result['requests']} requests in {result['duration_s']} s ({result['rps']} req/s)")
+    print(f"{'route':<32} {'count':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, r in result["routes"].items():
+        print(f"{route:<32} {r['count']:>7} {r['errors']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+
+# Settings that change what is measured; comparing across them is meaningless
+COMPARED_CONFIG = ("concurrency", "storage", "mongo_url", "categories", "items", "checkout_ratio", "admin_ratio",
+                   "revalidate_ratio", "gateway_latency_ms")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print p95 deltas against a baseline; returns False on a regression"""
+    mismatched = [
+        key for key in COMPARED_CONFIG
+        if key in baseline.get("config", {}) and baseline["config"][key] != result["config"].get(key)
+    ]
+    if mismatched:
+        print(f"\nBaseline was recorded with different settings: {', '.join(mismatched)}")
+        return False
+
+    ok = True
+    print(f"\nComparison with baseline (p95, tolerance {tolerance:.0%}):")
+    for route, r in result["routes"].items():
+        base = baseline["routes"].get(route)
+        if not base:
+            print(f"  {route:<32} new route")
+            continue
+        delta = (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0
+        regressed = delta > tolerance or r["errors"] > base["errors"]
+        ok = ok and not regressed
+        print(f"  {route:<32} {base['p95_ms']:>8} -> {r['p95_ms']:>8} ms  {delta:+.0%}"
+              f"{'  errors ' + str(r['errors']) if r['errors'] else ''}"
+              f"{'  REGRESSION' if regressed else ''}")
+    for route in baseline["routes"].keys() - result["routes"].keys():
+        print(f"  {route:<32} missing from this run  REGRESSION")
+        ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("-d", "--duration", type=float, default=15, help="seconds of measured traffic")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of unmeasured traffic first")
+    parser.add_argument("--mongo-url", help="real MongoDB to use instead of mongomock-motor")
+    parser.add_argument("--db-name", default="bench_load")
+    parser.add_argument("--storage", choices=("mongo", "memory"), default="mongo",
+                        help="memory runs on the in-process repositories instead of any MongoDB")
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--items", type=int, default=12, help="items per category")
+    parser.add_argument("--checkout-ratio", type=float, default=0.3)
+    parser.add_argument("--admin-ratio", type=float, default=0.05)
+    parser.add_argument("--revalidate-ratio", type=float, default=0.5,
+                        help="share of menu loads sent with If-None-Match")
+    parser.add_argument("--gateway-latency-ms", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    result = asyncio.run(run(args))
+    result["config"] = {k: v for k, v in vars(args).items()
+                        if k not in ("save_baseline", "compare", "json", "tolerance")}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    print_report(result)
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(result, indent=2))
+        print(f"\nBaseline saved to {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        return 0 if compare(result, baseline, args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Latency of the payment verification write path, old flow vs complete_payment.
+
+Run from the backend directory against a scratch database:
+
+    python benchmarks/verify_payment.py --mongo-url mongodb://localhost:27017 -n 500
+
+The legacy flow is the update_one + find_one + update_one sequence that
+verify_payment used before payment_store.complete_payment replaced it.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from payment_store import complete_payment, supports_transactions
+
+
+async def legacy_flow(client, db, razorpay_order_id: str, payment_id: str):
+    await db.payment_orders.update_one(
+        {"razorpay_order_id": razorpay_order_id},
+        {"$set": {"status": "completed", "razorpay_payment_id": payment_id}}
+    )
+    payment_order = await db.payment_orders.find_one({"razorpay_order_id": razorpay_order_id})
+    if payment_order and payment_order.get("order_id"):
+        await db.orders.update_one(
+            {"_id": ObjectId(payment_order["order_id"])},
+            {"$set": {"payment_status": "completed", "payment_id": payment_id}}
+        )
+
+
+async def seed(db, prefix: str, count: int):
+    orders = [{"_id": ObjectId(), "payment_status": "pending"} for _ in range(count)]
+    await db.orders.insert_many(orders)
+    await db.payment_orders.insert_many([
+        {"razorpay_order_id": f"{prefix}_{i}", "order_id": str(order["_id"]), "status": "created"}
+        for i, order in enumerate(orders)
+    ])
+
+
+async def measure(flow, client, db, prefix: str, count: int):
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        await flow(client, db, f"{prefix}_{i}", f"pay_{prefix}_{i}")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<18} mean {statistics.mean(timings):7.2f} ms   p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db_name]
+    try:
+        await db.payment_orders.create_index("razorpay_order_id", unique=True)
+        await seed(db, "legacy", args.n)
+        await seed(db, "atomic", args.n)
+        mode = "transaction" if await supports_transactions(db) else "compensating"
+        print(f"{args.n} verifications per flow, new flow mode: {mode}")
+        report("legacy (3 trips)", await measure(legacy_flow, client, db, "legacy", args.n))
+        report("complete_payment", await measure(complete_payment, client, db, "atomic", args.n))
+    finally:
+        await client.drop_database(args.db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="bench_verify_payment")
+    parser.add_argument("-n", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""Table booking capacity kept as one counter document per date and slot.
+
+Reservations are a single conditional ``$inc`` that only matches while the
+slot still has room, so concurrent bookings can never oversell it and
+availability is read from the counters instead of counting bookings.
+"""
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from typing import List, Optional
+import os
+
+BOOKING_OPEN = os.getenv("BOOKING_OPEN", "11:00")
+BOOKING_CLOSE = os.getenv("BOOKING_CLOSE", "23:00")  # last slot starts before this
+BOOKING_SLOT_MINUTES = int(os.getenv("BOOKING_SLOT_MINUTES", "30"))
+BOOKING_SLOT_COVERS = int(os.getenv("BOOKING_SLOT_COVERS", "40"))
+
+
+class SlotError(ValueError):
+    """Raised for dates or times that do not map to a bookable slot"""
+
+
+class SlotFull(Exception):
+    """Raised when a slot does not have enough covers left"""
+
+
+def _minutes(hhmm: str) -> int:
+    try:
+        parsed = datetime.strptime(hhmm.strip(), "%H:%M")
+    except ValueError:
+        raise SlotError(f"Invalid time: {hhmm}")
+    return parsed.hour * 60 + parsed.minute
+
+
+def _format(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slot_times() -> List[str]:
+    """All slot start times of a service day"""
+    return [
+        _format(m)
+        for m in range(_minutes(BOOKING_OPEN), _minutes(BOOKING_CLOSE), BOOKING_SLOT_MINUTES)
+    ]
+
+
+def validate_date(date: str) -> str:
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise SlotError(f"Invalid date: {date}")
+    return date
+
+
+def slot_for(time: str) -> str:
+    """Map a requested time such as 19:10 to the slot that contains it"""
+    minutes = _minutes(time)
+    opens, closes = _minutes(BOOKING_OPEN), _minutes(BOOKING_CLOSE)
+    if not opens <= minutes < closes:
+        raise SlotError(f"Bookings are available between {BOOKING_OPEN} and {BOOKING_CLOSE}")
+    return _format(opens + (minutes - opens) // BOOKING_SLOT_MINUTES * BOOKING_SLOT_MINUTES)
+
+
+def slot_key(date: str, slot: str) -> str:
+    return f"{date}|{slot}"
+
+
+async def _ensure_slot(db, date: str, slot: str) -> None:
+    try:
+        await db.booking_slots.update_one(
+            {"_id": slot_key(date, slot)},
+            {"$setOnInsert": {"date": date, "slot": slot, "capacity": BOOKING_SLOT_COVERS, "booked": 0}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Created concurrently by another request
+        pass
+
+
+async def reserve(db, date: str, slot: str, guests: int) -> str:
+    """Atomically take ``guests`` covers from a slot; returns the slot key"""
+    key = slot_key(date, slot)
+    query = {"_id": key, "$expr": {"$lte": [{"$add": ["$booked", guests]}, "$capacity"]}}
+    result = await db.booking_slots.update_one(query, {"$inc": {"booked": guests}})
+    if result.matched_count == 0:
+        # Either the slot is full or nobody has booked it yet
+        await _ensure_slot(db, date, slot)
+        result = await db.booking_slots.update_one(query, {"$inc": {"booked": guests}})
+        if result.matched_count == 0:
+            raise SlotFull(f"Not enough seats left at {slot} on {date}")
+    return key
+
+
+async def release(db, key: str, guests: int) -> None:
+    await db.booking_slots.update_one(
+        {"_id": key, "booked": {"$gte": guests}},
+        {"$inc": {"booked": -guests}}
+    )
+
+
+async def set_capacity(db, date: str, slot: str, capacity: int) -> None:
+    await _ensure_slot(db, date, slot)
+    await db.booking_slots.update_one({"_id": slot_key(date, slot)}, {"$set": {"capacity": capacity}})
+
+
+async def availability(db, date: str) -> List[dict]:
+    """Covers left per slot for a date, read from the slot counters only"""
+    counters = {
+        doc["slot"]: doc
+        async for doc in db.booking_slots.find({"date": date})
+    }
+    return slot_availability(counters)
+
+
+def slot_availability(counters: dict) -> List[dict]:
+    """Covers left per slot of a day, given its counter documents keyed by slot"""
+    slots = []
+    for slot in slot_times():
+        counter: Optional[dict] = counters.get(slot)
+        capacity = counter["capacity"] if counter else BOOKING_SLOT_COVERS
+        booked = counter["booked"] if counter else 0
+        slots.append({
+            "time": slot,
+            "capacity": capacity,
+            "booked": booked,
+            "available": max(capacity - booked, 0),
+        })
+    return slots
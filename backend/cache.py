@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+from serialization import dumps
+import asyncio
+import hashlib
+import os
+import time
+
+# How often a worker re-reads the shared version counter before trusting its
+# cached payload again. Mutations on the same worker invalidate immediately;
+# mutations on other workers become visible within this window.
+CACHE_VERSION_CHECK_SECONDS = float(os.getenv("CACHE_VERSION_CHECK_SECONDS", "2"))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+class VersionedCache:
+    """Serialized JSON payload held in memory and keyed by a version counter.
+
+    The counter is kept by ``versions`` (repositories.base.CacheVersionRepository);
+    with Mongo it lives in the ``cache_versions`` collection so that every
+    uvicorn worker agrees on it, which also makes the derived ETag stable
+    across workers.
+
+    A loader reading from a replica may see data older than the write that
+    bumped the version. With ``reload_after`` the payload is reloaded once
+    that many seconds after each version change (the replica's staleness
+    bound), and the ETag also carries a hash of the body so the settled
+    payload revalidates.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Awaitable[object]],
+        versions,
+        check_interval: float = CACHE_VERSION_CHECK_SECONDS,
+        on_load: Optional[Callable[[object], None]] = None,
+        reload_after: Optional[float] = None,
+    ):
+        self.name = name
+        self.version = 0
+        self._loader = loader
+        self._versions = versions
+        self._on_load = on_load
+        self._check_interval = check_interval
+        self._reload_after = reload_after
+        self._body: Optional[bytes] = None
+        self._checked_at = 0.0
+        self._reload_at: Optional[float] = None
+        self._etag = f'"{name}-v0"'
+        self._lock = asyncio.Lock()
+
+    @property
+    def etag(self) -> str:
+        return self._etag
+
+    def _fresh(self) -> bool:
+        now = time.monotonic()
+        return (
+            self._body is not None
+            and now - self._checked_at < self._check_interval
+            and (self._reload_at is None or now < self._reload_at)
+        )
+
+    async def get(self) -> Tuple[str, bytes]:
+        """Return ``(etag, body)``, reloading only when the version moved"""
+        if not self._fresh():
+            async with self._lock:
+                if not self._fresh():
+                    # Read the version before the data so the payload is never
+                    # older than the version it is tagged with.
+                    version = await self._versions.get(self.name)
+                    changed = self._body is None or version != self.version
+                    settling = self._reload_at is not None and time.monotonic() >= self._reload_at
+                    if changed or settling:
+                        data = await self._loader()
+                        if self._on_load:
+                            # Lets derived in-memory views rebuild from the same read
+                            self._on_load(data)
+                        self._body = dumps(data)
+                        self.version = version
+                        self._etag = f'"{self.name}-v{version}"'
+                        self._reload_at = None
+                        if self._reload_after:
+                            self._etag = f'"{self.name}-v{version}-{hashlib.sha256(self._body).hexdigest()[:8]}"'
+                            if changed:
+                                self._reload_at = time.monotonic() + self._reload_after
+                    self._checked_at = time.monotonic()
+        return self.etag, self._body
+
+    async def bump(self) -> int:
+        """Invalidate the payload on every worker after a mutation"""
+        version = await self._versions.bump(self.name)
+        self.expire()
+        return version
+
+    def expire(self) -> None:
+        """Reload on the next get(), e.g. for a second cache sharing a bumped version"""
+        self._body = None
+        self._checked_at = 0.0
+
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024"))
+
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of users resolved from verified access tokens.
+
+    Entries are keyed by a hash of the raw token (the token itself is never
+    kept) and never outlive the token's ``exp`` claim.
+
+    User writes bump the shared ``users`` version (see
+    repositories.caching.CachedUserRepository); ``sync`` re-reads it like
+    VersionedCache does and empties the cache once it moved, so a changed
+    or revoked user is dropped by every worker within the check interval.
+    """
+
+    VERSION = "users"
+
+    def __init__(
+        self,
+        max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+        ttl: float = PRINCIPAL_CACHE_TTL_SECONDS,
+        check_interval: float = CACHE_VERSION_CHECK_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._checked_at = 0.0
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    async def sync(self, versions) -> None:
+        """Drop every entry if the shared ``users`` version moved since the last check"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        version = await versions.get(self.VERSION)
+        if version != self.version:
+            self.clear()
+            self.version = version
+        self._checked_at = now
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, token: str, user: dict, token_exp: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+        key = self._key(token)
+        self._entries[key] = (expires_at, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: Optional[str] = None, user_id=None) -> int:
+        """Drop every cached token of a user, matched by username or ``_id``"""
+        stale = [
+            key for key, (_, user) in self._entries.items()
+            if (username is not None and user.get("username") == username)
+            or (user_id is not None and user.get("_id") == user_id)
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+from auth import STREAM_TOKEN_EXPIRE_SECONDS, STREAM_TOKEN_SCOPE, create_stream_token, decode_access_token
+from events import broker
+from repositories import get_repositories
+from routes import get_db, verify_admin
+import asyncio
+import json
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = 15
+
+
+async def verify_admin_stream(
+    authorization: Optional[str] = Header(None),
+    stream_token: Optional[str] = None
+):
+    """verify_admin, or a stream token from POST /events/orders/token as ?stream_token=.
+
+    EventSource cannot send headers, and query strings end up in access and
+    proxy logs, so the query only takes these short-lived stream tokens.
+    """
+    if authorization or not stream_token:
+        return await verify_admin(authorization)
+    payload = decode_access_token(stream_token)
+    if not payload or payload.get("scope") != STREAM_TOKEN_SCOPE:
+        raise HTTPException(status_code=401, detail="Invalid stream token")
+    user = await get_repositories().users.get_by_username(payload.get("sub"))
+    if not user or not user.get("is_admin"):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return user
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _format_event(event: dict) -> str:
+    data = json.dumps(event["data"], default=_json_default)
+    return f"id: {event['_id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+# ============= ORDER EVENT ROUTES =============
+
+@router.post("/events/orders/token")
+async def create_order_stream_token(user: dict = Depends(verify_admin)):
+    """Short-lived token for opening the order stream from a browser EventSource"""
+    return {"stream_token": create_stream_token(user["username"]), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
+
+@router.get("/events/orders", dependencies=[Depends(verify_admin_stream)])
+async def stream_order_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    since: Optional[str] = None
+):
+    """Server-sent events for order.created, order.status_changed and payment.completed.
+
+    Reconnecting clients resume after the Last-Event-ID header (browsers send
+    it automatically) or the ``since`` query parameter.
+    """
+    db = get_db()
+    subscription = await broker.subscribe(db, last_event_id or since)
+
+    async def body():
+        sent = set()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if subscription.overflowed or await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if event["_id"] in sent:
+                    continue
+                sent.add(event["_id"])
+                if len(sent) > 1000:
+                    sent.clear()
+                yield _format_event(event)
+                if subscription.overflowed and subscription.queue.empty():
+                    # Too slow to keep up: close so the client resumes from history
+                    break
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,196 @@
+"""Order event fan-out for live kitchen displays.
+
+Events are published by the order and payment routes and pushed to every
+subscribed connection. ``InProcessBroker`` only reaches connections on the
+same worker; ``MongoBroker`` relays events through a capped collection so
+all uvicorn workers see them. Select with ORDER_EVENTS_BROKER=memory|mongo.
+"""
+from bson import ObjectId
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import CursorType
+from typing import List, Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_BROKER = os.getenv("ORDER_EVENTS_BROKER", "memory")
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "500"))
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENTS_COLLECTION = "order_events"
+EVENTS_COLLECTION_BYTES = 16 * 1024 * 1024
+
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+PAYMENT_COMPLETED = "payment.completed"
+
+
+class Subscription:
+    """One connection's bounded event queue.
+
+    A consumer that falls EVENT_QUEUE_SIZE events behind is disconnected
+    instead of buffering without limit; it reconnects with Last-Event-ID and
+    catches up from history.
+    """
+
+    def __init__(self, maxsize: int = EVENT_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, event: dict) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+
+
+def _parse_event_id(event_id: str) -> Optional[ObjectId]:
+    try:
+        return ObjectId(event_id)
+    except Exception:
+        return None
+
+
+class InProcessBroker:
+    """Fans events out to subscribers on this worker and keeps recent history"""
+
+    def __init__(self, history_size: int = EVENT_HISTORY_SIZE):
+        self._history_size = history_size
+        # Insertion ordered and keyed by event id, which also dedupes replays
+        self._history: "OrderedDict[ObjectId, dict]" = OrderedDict()
+        self._subscribers: List[Subscription] = []
+
+    async def start(self, db) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def _dispatch(self, event: dict) -> None:
+        if event["_id"] in self._history:
+            return
+        self._history[event["_id"]] = event
+        while len(self._history) > self._history_size:
+            self._history.popitem(last=False)
+        for subscription in list(self._subscribers):
+            if not subscription.offer(event):
+                self._subscribers.remove(subscription)
+                logger.warning("Dropped slow order event subscriber")
+
+    @staticmethod
+    def _new_event(event_type: str, data: dict) -> dict:
+        return {"_id": ObjectId(), "type": event_type, "data": data, "created_at": datetime.utcnow()}
+
+    async def publish(self, db, event_type: str, data: dict) -> dict:
+        event = self._new_event(event_type, data)
+        self._dispatch(event)
+        return event
+
+    async def history_after(self, db, last_event_id: str) -> List[dict]:
+        last_id = _parse_event_id(last_event_id)
+        if last_id is None:
+            return []
+        if last_id in self._history:
+            ids = list(self._history)
+            return [self._history[i] for i in ids[ids.index(last_id) + 1:]]
+        return [event for event in self._history.values() if event["_id"] > last_id]
+
+    async def subscribe(self, db, last_event_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription()
+        # Register first so nothing published during the replay is missed;
+        # the replay may then overlap with the queue, which readers dedupe by id
+        self._subscribers.append(subscription)
+        if last_event_id:
+            for event in await self.history_after(db, last_event_id):
+                subscription.offer(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+
+class MongoBroker(InProcessBroker):
+    """Relays events between workers through a tailable capped collection.
+
+    ObjectIds from different workers are only ordered to the second, so
+    reads that resume from an id rewind a few seconds and rely on the
+    history dedupe to drop what was already delivered.
+    """
+
+    REWIND = timedelta(seconds=5)
+
+    def __init__(self, history_size: int = EVENT_HISTORY_SIZE):
+        super().__init__(history_size)
+        self._tail_task: Optional[asyncio.Task] = None
+
+    async def start(self, db) -> None:
+        if EVENTS_COLLECTION not in await db.list_collection_names():
+            try:
+                await db.create_collection(EVENTS_COLLECTION, capped=True, size=EVENTS_COLLECTION_BYTES)
+            except Exception:
+                # Another worker created it first
+                pass
+        self._tail_task = asyncio.create_task(self._tail(db))
+
+    async def stop(self) -> None:
+        if self._tail_task:
+            self._tail_task.cancel()
+
+    def _rewound(self, event_id: ObjectId) -> ObjectId:
+        return ObjectId.from_datetime(event_id.generation_time - self.REWIND)
+
+    async def _tail(self, db) -> None:
+        collection = db[EVENTS_COLLECTION]
+        since = ObjectId()
+        while True:
+            try:
+                cursor = collection.find(
+                    {"_id": {"$gte": self._rewound(since)}},
+                    cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                async for event in cursor:
+                    since = event["_id"]
+                    self._dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Order event tail interrupted: %s", e)
+            await asyncio.sleep(1)
+
+    async def publish(self, db, event_type: str, data: dict) -> dict:
+        # Delivered locally by the tailer, like on every other worker
+        event = self._new_event(event_type, data)
+        await db[EVENTS_COLLECTION].insert_one(event)
+        return event
+
+    async def history_after(self, db, last_event_id: str) -> List[dict]:
+        last_id = _parse_event_id(last_event_id)
+        if last_id is None:
+            return []
+        if last_id in self._history:
+            return await super().history_after(db, last_event_id)
+        # Older than this worker's memory: read the collection in insertion
+        # order and skip up to the last delivered event if it is still there
+        events = await db[EVENTS_COLLECTION].find(
+            {"_id": {"$gte": self._rewound(last_id)}}
+        ).sort("$natural", 1).to_list(EVENT_HISTORY_SIZE)
+        ids = [event["_id"] for event in events]
+        if last_id in ids:
+            return events[ids.index(last_id) + 1:]
+        return [event for event in events if event["_id"] > last_id]
+
+
+broker = MongoBroker() if ORDER_EVENTS_BROKER == "mongo" else InProcessBroker()
+
+
+async def publish_order_event(db, event_type: str, data: dict) -> None:
+    """Publish without ever failing the request that triggered it"""
+    try:
+        await broker.publish(db, event_type, data)
+    except Exception as e:
+        logger.error("Could not publish %s event: %s", event_type, e)
@@ -0,0 +1,209 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from datetime import datetime
+from typing import Optional
+from routes import get_db, verify_admin
+from serialization import dumps
+import csv
+import io
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = 500
+FORMAT_PATTERN = "^(csv|ndjson)$"
+
+ORDER_COLUMNS = [
+    "id", "order_number", "created_at", "customer_name", "customer_email",
+    "customer_phone", "delivery_type", "order_status", "payment_status",
+    "payment_id", "item_count", "total_amount", "razorpay_order_id",
+    "razorpay_payment_id", "payment_amount", "payment_currency",
+    "payment_record_status",
+]
+BOOKING_COLUMNS = [
+    "id", "date", "time", "name", "email", "phone", "guests", "status",
+    "created_at",
+]
+PAYMENT_COLUMNS = [
+    "id", "razorpay_order_id", "razorpay_payment_id", "order_id", "amount",
+    "currency", "status", "created_at",
+]
+
+
+# Leading characters a spreadsheet would evaluate as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Customer-supplied text: quote it so it opens as text, not a formula
+        return "'" + value
+    return value
+
+
+def _date_range(field: str, date_from, date_to) -> dict:
+    if not date_from and not date_to:
+        return {}
+    bounds = {}
+    if date_from:
+        bounds["$gte"] = date_from
+    if date_to:
+        bounds["$lt"] = date_to
+    return {field: bounds}
+
+
+async def _batches(cursor):
+    """Group a Motor cursor into lists without ever holding more than one batch"""
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _encode(docs, fmt: str, columns, to_row) -> str:
+    if fmt == "ndjson":
+        lines = []
+        for doc in docs:
+            doc["id"] = str(doc.pop("_id"))
+            lines.append(dumps(doc).decode("utf-8") + "\n")
+        return "".join(lines)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for doc in docs:
+        row = to_row(doc)
+        writer.writerow([_csv_value(row.get(column)) for column in columns])
+    return buffer.getvalue()
+
+
+def _header(fmt: str, columns) -> str:
+    if fmt != "csv":
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue()
+
+
+def _export_response(body, fmt: str, name: str) -> StreamingResponse:
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _pick_payment(current: Optional[dict], candidate: dict) -> dict:
+    """Prefer a completed payment record when an order was paid on a retry"""
+    if current is None or candidate.get("status") == "completed":
+        return candidate
+    return current
+
+
+def _order_row(order: dict) -> dict:
+    payment = order.get("payment") or {}
+    return {
+        **order,
+        "id": order["_id"],
+        "item_count": sum(item.get("quantity", 0) for item in order.get("items", [])),
+        "razorpay_order_id": payment.get("razorpay_order_id"),
+        "razorpay_payment_id": payment.get("razorpay_payment_id"),
+        "payment_amount": payment.get("amount"),
+        "payment_currency": payment.get("currency"),
+        "payment_record_status": payment.get("status"),
+    }
+
+
+# ============= EXPORT ROUTES =============
+
+@router.get("/export/orders", dependencies=[Depends(verify_admin)])
+async def export_orders(
+    format: str = Query("csv", regex=FORMAT_PATTERN),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    order_status: Optional[str] = None,
+    payment_status: Optional[str] = None
+):
+    """Stream orders joined with their payment records"""
+    db = get_db()
+    query = _date_range("created_at", date_from, date_to)
+    if order_status:
+        query["order_status"] = order_status
+    if payment_status:
+        query["payment_status"] = payment_status
+
+    async def body():
+        yield _header(format, ORDER_COLUMNS)
+        cursor = db.orders.find(query).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+        async for orders in _batches(cursor):
+            # One indexed lookup per batch instead of one per order
+            order_ids = [str(order["_id"]) for order in orders]
+            payments = {}
+            async for payment in db.payment_orders.find(
+                {"order_id": {"$in": order_ids}}, {"_id": 0}
+            ):
+                key = payment["order_id"]
+                payments[key] = _pick_payment(payments.get(key), payment)
+            for order in orders:
+                order["payment"] = payments.get(str(order["_id"]))
+            yield _encode(orders, format, ORDER_COLUMNS, _order_row)
+
+    return _export_response(body(), format, "orders")
+
+
+@router.get("/export/bookings", dependencies=[Depends(verify_admin)])
+async def export_bookings(
+    format: str = Query("csv", regex=FORMAT_PATTERN),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Stream bookings; dates are inclusive YYYY-MM-DD bounds on the booking date"""
+    db = get_db()
+    query = {}
+    if date_from or date_to:
+        query["date"] = {}
+        if date_from:
+            query["date"]["$gte"] = date_from
+        if date_to:
+            query["date"]["$lte"] = date_to
+    if status:
+        query["status"] = status
+
+    async def body():
+        yield _header(format, BOOKING_COLUMNS)
+        cursor = db.bookings.find(query).sort("date", 1).batch_size(EXPORT_BATCH_SIZE)
+        async for bookings in _batches(cursor):
+            yield _encode(bookings, format, BOOKING_COLUMNS, lambda b: {**b, "id": b["_id"]})
+
+    return _export_response(body(), format, "bookings")
+
+
+@router.get("/export/payments", dependencies=[Depends(verify_admin)])
+async def export_payments(
+    format: str = Query("csv", regex=FORMAT_PATTERN),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None
+):
+    """Stream Razorpay payment records"""
+    db = get_db()
+    query = _date_range("created_at", date_from, date_to)
+    if status:
+        query["status"] = status
+
+    async def body():
+        yield _header(format, PAYMENT_COLUMNS)
+        cursor = db.payment_orders.find(query).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+        async for payments in _batches(cursor):
+            yield _encode(payments, format, PAYMENT_COLUMNS, lambda p: {**p, "id": p["_id"]})
+
+    return _export_response(body(), format, "payments")
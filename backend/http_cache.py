@@ -0,0 +1,189 @@
+"""Cache-Control policy and response compression for the API.
+
+Public read routes answer from a VersionedCache and set a version-derived
+ETag, returning 304 for a matching If-None-Match (see routes.cached_json).
+``HTTPCacheMiddleware`` then adds the shared Cache-Control policy to those
+routes, so a CDN can serve them and revalidate in the background, and
+compresses complete responses with brotli or gzip as the client accepts.
+Compressed bodies of ETag'd responses are kept in a small LRU, so a hot
+payload is compressed once per version rather than once per request.
+
+Streaming responses (live order feed, exports) are passed through as is.
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is in requirements.txt
+    brotli = None
+
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "60"))
+PUBLIC_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("PUBLIC_CACHE_STALE_WHILE_REVALIDATE", "600"))
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "512"))
+COMPRESSION_CACHE_ENTRIES = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "64"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+PUBLIC_CACHE_CONTROL = (
+    f"public, max-age={PUBLIC_CACHE_MAX_AGE}, "
+    f"stale-while-revalidate={PUBLIC_CACHE_STALE_WHILE_REVALIDATE}"
+)
+
+
+def public_cache_control(expires_in: Optional[float] = None) -> str:
+    """PUBLIC_CACHE_CONTROL, shortened so no cache serves the payload past ``expires_in`` seconds"""
+    if expires_in is None or expires_in >= PUBLIC_CACHE_MAX_AGE + PUBLIC_CACHE_STALE_WHILE_REVALIDATE:
+        return PUBLIC_CACHE_CONTROL
+    max_age = int(min(PUBLIC_CACHE_MAX_AGE, expires_in))
+    return f"public, max-age={max_age}, stale-while-revalidate={int(expires_in) - max_age}"
+
+
+# Route templates sent with PUBLIC_CACHE_CONTROL unless the handler set its own
+PUBLIC_ROUTES = {
+    "/api/restaurant/info",
+    "/api/testimonials",
+    "/api/testimonials/summary",
+    "/api/gallery",
+    "/api/offers",
+}
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred coding the client accepts: br (when available), then gzip"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class _CompressedBodies:
+    """LRU of compressed payloads keyed by (path and query, ETag, coding)"""
+
+    def __init__(self, max_entries: int = COMPRESSION_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[bytes, bytes, str], bytes]" = OrderedDict()
+
+    def get(self, resource: bytes, etag: bytes, coding: str, body: bytes) -> bytes:
+        key = (resource, etag, coding)
+        compressed = self._entries.get(key)
+        if compressed is None:
+            compressed = compress(body, coding)
+            if self.max_entries:
+                self._entries[key] = compressed
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return compressed
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class HTTPCacheMiddleware:
+    """ASGI middleware adding PUBLIC_ROUTES caching headers and compression"""
+
+    def __init__(self, app):
+        self.app = app
+        self.compressed = _CompressedBodies()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_headers = dict(scope["headers"])
+        coding = None
+        if COMPRESSION_ENABLED:
+            coding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        cacheable = scope["method"] in ("GET", "HEAD")
+        start: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                if cacheable:
+                    self._apply_cache_policy(scope, message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            if message.get("more_body", False):
+                # Streaming response: never buffer it
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            resource = scope.get("raw_path", b"") + b"?" + scope.get("query_string", b"")
+            await self._send_complete(start, message.get("body", b""), coding, resource, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _apply_cache_policy(scope, message: dict) -> None:
+        route = scope.get("route")
+        if getattr(route, "path", None) not in PUBLIC_ROUTES or message["status"] not in (200, 304):
+            return
+        headers = message.setdefault("headers", [])
+        if _header(headers, b"cache-control") is None:
+            headers.append((b"cache-control", PUBLIC_CACHE_CONTROL.encode("latin-1")))
+
+    async def _send_complete(self, start: dict, body: bytes, coding: Optional[str], resource: bytes, send) -> None:
+        headers = list(start.get("headers", []))
+        content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+        eligible = (
+            start["status"] == 200
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and _header(headers, b"content-encoding") is None
+        )
+        if eligible:
+            vary = _header(headers, b"vary")
+            if vary is None:
+                headers.append((b"vary", b"Accept-Encoding"))
+            elif b"accept-encoding" not in vary.lower():
+                headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+                headers.append((b"vary", vary + b", Accept-Encoding"))
+
+        if eligible and coding and len(body) >= COMPRESSION_MIN_BYTES:
+            etag = _header(headers, b"etag")
+            if etag:
+                body = self.compressed.get(resource, etag, coding, body)
+                if not etag.startswith(b"W/"):
+                    # The representation changed, so the ETag can only be weak now
+                    headers = [(k, v) for k, v in headers if k.lower() != b"etag"]
+                    headers.append((b"etag", b"W/" + etag))
+            else:
+                body = compress(body, coding)
+            headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            headers.append((b"content-encoding", coding.encode("latin-1")))
+
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
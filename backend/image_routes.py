@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from routes import get_db, verify_admin
+import images
+
+router = APIRouter()
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# ============= IMAGE ROUTES =============
+
+@router.post("/images", dependencies=[Depends(verify_admin)])
+async def upload_image(file: UploadFile = File(...)):
+    """Store an image and its resized derivatives; use the returned id as image_id"""
+    db = get_db()
+    data = await file.read(images.IMAGE_MAX_BYTES + 1)
+    if len(data) > images.IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {images.IMAGE_MAX_BYTES} bytes")
+    try:
+        doc = await images.store_image(db, data)
+    except images.ImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except images.ImageProcessingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return images.public_image(doc)
+
+@router.get("/images/{name}")
+async def get_image(name: str):
+    """Serve a derivative; names are content hashes so they can be cached forever"""
+    match = images.DERIVATIVE_NAME.match(name)
+    if not match:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = images.derivative_path(match["digest"], int(match["width"]), match["ext"])
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(
+        path,
+        media_type=images.FORMATS[match["ext"]],
+        headers={"Cache-Control": IMMUTABLE_CACHE}
+    )
@@ -0,0 +1,239 @@
+"""Content-addressed image storage with resized WebP/JPEG derivatives.
+
+Originals are stored under their sha256 in IMAGE_STORAGE_DIR, so uploading
+the same picture twice is free. Derivatives ``{hash}-{width}.webp|.jpg``
+are rendered in a process pool, keeping Pillow's CPU work off the event
+loop. They never change once written, so they are served with immutable
+cache headers. Menu items and gallery entries store only a derivative URL.
+
+Pillow is optional at import time; without it uploads are refused with a
+503. Inline ``data:`` images already in the database can be moved into
+storage with
+
+    python images.py --migrate-inline
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORAGE_DIR = Path(os.getenv("IMAGE_STORAGE_DIR", Path(__file__).parent / "media"))
+IMAGE_URL_PREFIX = os.getenv("IMAGE_URL_PREFIX", "/api/images")
+IMAGE_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_WIDTHS", "320,640,1280").split(","))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Width each payload's ``image`` URL points at (2x the largest CSS size)
+MENU_IMAGE_WIDTH = int(os.getenv("MENU_IMAGE_WIDTH", "640"))
+GALLERY_IMAGE_WIDTH = int(os.getenv("GALLERY_IMAGE_WIDTH", "1280"))
+
+FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+DERIVATIVE_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})-(?P<width>\d+)\.(?P<ext>webp|jpg)$")
+DATA_URL = re.compile(r"^data:image/[\w.+-]+;base64,", re.IGNORECASE)
+
+
+class ImageError(ValueError):
+    """Raised for uploads that are not a usable image"""
+
+
+class ImageProcessingUnavailable(RuntimeError):
+    """Raised when Pillow is not installed"""
+
+
+def _shard(kind: str, digest: str, root: Path) -> Path:
+    return Path(root) / kind / digest[:2]
+
+
+def original_path(digest: str, root: Path = IMAGE_STORAGE_DIR) -> Path:
+    return _shard("originals", digest, root) / digest
+
+
+def derivative_path(digest: str, width: int, ext: str, root: Path = IMAGE_STORAGE_DIR) -> Path:
+    return _shard("derived", digest, root) / f"{digest}-{width}.{ext}"
+
+
+def image_url(digest: str, width: int, ext: str = "webp") -> str:
+    return f"{IMAGE_URL_PREFIX}/{digest}-{width}.{ext}"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _render(digest: str, widths: List[int], root: str) -> dict:
+    """Decode an original and write its derivatives (runs in a worker process)"""
+    import io
+
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    try:
+        with Image.open(original_path(digest, root)) as source:
+            if source.width * source.height > IMAGE_MAX_PIXELS:
+                raise ImageError("Image has too many pixels")
+            image = ImageOps.exif_transpose(source)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Not a supported image: {e}")
+
+    targets = sorted({min(width, image.width) for width in widths})
+    for width in targets:
+        resized = image.copy()
+        resized.thumbnail((width, width * image.height // image.width or 1), Image.LANCZOS)
+        webp, jpeg = io.BytesIO(), io.BytesIO()
+        resized.save(webp, "WEBP", quality=WEBP_QUALITY, method=4)
+        resized.convert("RGB").save(jpeg, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        _write_atomic(derivative_path(digest, width, "webp", root), webp.getvalue())
+        _write_atomic(derivative_path(digest, width, "jpg", root), jpeg.getvalue())
+    return {"width": image.width, "height": image.height, "widths": targets}
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the server process runs Motor's thread pool
+        _pool = ProcessPoolExecutor(IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def close_image_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def public_image(doc: dict) -> dict:
+    digest, widths = doc["_id"], doc["widths"]
+    return {
+        "id": digest,
+        "width": doc["width"],
+        "height": doc["height"],
+        "url": display_url(doc, MENU_IMAGE_WIDTH),
+        "variants": {
+            ext: {str(width): image_url(digest, width, ext) for width in widths} for ext in FORMATS
+        },
+    }
+
+
+def display_url(doc: dict, width: int, ext: str = "webp") -> str:
+    """Smallest stored derivative at least ``width`` wide (else the largest)"""
+    widths = doc["widths"]
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return image_url(doc["_id"], chosen, ext)
+
+
+async def store_image(db, data: bytes) -> dict:
+    """Store an original and its derivatives; returns the images document"""
+    if Image is None:
+        raise ImageProcessingUnavailable("Image processing is unavailable (Pillow is not installed)")
+    if not data:
+        raise ImageError("Empty upload")
+    if len(data) > IMAGE_MAX_BYTES:
+        raise ImageError(f"Image larger than {IMAGE_MAX_BYTES} bytes")
+
+    digest = hashlib.sha256(data).hexdigest()
+    existing = await db.images.find_one({"_id": digest})
+    if existing and all(
+        derivative_path(digest, w, ext).exists() for w in existing["widths"] for ext in FORMATS
+    ):
+        return existing
+
+    if not original_path(digest).exists():
+        await asyncio.to_thread(_write_atomic, original_path(digest), data)
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(_get_pool(), _render, digest, IMAGE_WIDTHS, str(IMAGE_STORAGE_DIR))
+
+    doc = {"_id": digest, "bytes": len(data), "created_at": datetime.utcnow(), **rendered}
+    await db.images.replace_one({"_id": digest}, doc, upsert=True)
+    return doc
+
+
+def decode_data_url(value: str) -> Optional[bytes]:
+    """Bytes of an inline ``data:image/...;base64,`` URL, None for anything else"""
+    match = DATA_URL.match(value or "")
+    if not match:
+        return None
+    try:
+        return base64.b64decode(value[match.end():], validate=True)
+    except (binascii.Error, ValueError):
+        raise ImageError("Malformed data URL")
+
+
+async def resolve_image(db, image: Optional[str], image_id: Optional[str], width: int) -> Optional[str]:
+    """The URL a menu item or gallery entry should store for its picture.
+
+    ``image_id`` (a hash from POST /images) wins; an inline data URL is
+    moved into storage; any other URL is kept as given.
+    """
+    if image_id:
+        doc = await db.images.find_one({"_id": image_id})
+        if not doc:
+            raise ImageError("Unknown image_id")
+        return display_url(doc, width)
+    data = decode_data_url(image)
+    if data is not None:
+        return display_url(await store_image(db, data), width)
+    return image
+
+
+async def migrate_inline_images(db) -> int:
+    """Move data-URL images in menu items and the gallery into storage"""
+    moved = 0
+    inline = {"image": {"$regex": "^data:image/", "$options": "i"}}
+    async for item in db.menu_items.find(inline, {"image": 1}):
+        url = await resolve_image(db, item["image"], None, MENU_IMAGE_WIDTH)
+        await db.menu_items.update_one({"_id": item["_id"]}, {"$set": {"image": url}})
+        moved += 1
+    async for image in db.gallery.find(inline, {"image": 1}):
+        url = await resolve_image(db, image["image"], None, GALLERY_IMAGE_WIDTH)
+        await db.gallery.update_one({"_id": image["_id"]}, {"$set": {"image": url}})
+        moved += 1
+    return moved
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Image storage maintenance")
+    parser.add_argument("--migrate-inline", action="store_true",
+                        help="move data: URL images from menu items and gallery into storage")
+    args = parser.parse_args()
+
+    if args.migrate_inline:
+        async def main():
+            from server import db
+            from repositories import get_repositories
+            moved = await migrate_inline_images(db)
+            if moved:
+                repos = get_repositories()
+                await repos.menu.invalidate()
+                await repos.gallery.invalidate()
+            print(f"Moved {moved} inline images into {IMAGE_STORAGE_DIR}")
+            close_image_pool()
+
+        asyncio.run(main())
+    else:
+        parser.print_help()
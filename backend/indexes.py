@@ -0,0 +1,157 @@
+"""Declarative index registry reconciled at startup.
+
+Run ``python indexes.py --explain`` from the backend directory to check
+every registered route query shape for collection scans.
+"""
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "menu_categories": [
+        # Still used for items not yet migrated out of their category
+        IndexModel([("items.id", ASCENDING)], name="items_id"),
+    ],
+    "menu_items": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category_id", ASCENDING), ("created_at", ASCENDING)], name="category_id_created_at"),
+    ],
+    "orders": [
+        IndexModel([("order_number", ASCENDING)], name="order_number_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel([("order_status", ASCENDING), ("created_at", DESCENDING)], name="order_status_created_at"),
+        IndexModel([("payment_status", ASCENDING), ("created_at", DESCENDING)], name="payment_status_created_at"),
+    ],
+    "payment_orders": [
+        IndexModel([("razorpay_order_id", ASCENDING)], name="razorpay_order_id_unique", unique=True),
+        # Sparse indexes still hold explicit nulls: leave the field unset until there is an id
+        IndexModel([("razorpay_payment_id", ASCENDING)], name="razorpay_payment_id_unique", unique=True, sparse=True),
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "bookings": [
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="date_id"),
+        IndexModel([("status", ASCENDING), ("date", DESCENDING)], name="status_date"),
+    ],
+    "booking_slots": [
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+    "webhook_events": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("claim", ASCENDING)], name="claim", sparse=True),
+    ],
+    "testimonials": [
+        # Kept under its old name so ensure_indexes rebuilds it in place
+        IndexModel([("approved", ASCENDING), ("created_at", DESCENDING)], name="approved"),
+    ],
+    "special_offers": [
+        # Kept under its old name so ensure_indexes rebuilds it in place
+        IndexModel([("active", ASCENDING), ("ends_at", ASCENDING)], name="active"),
+    ],
+    "sales_rollups": [
+        IndexModel([("period", ASCENDING), ("start", ASCENDING)], name="period_start"),
+    ],
+}
+
+# (route, collection, filter, sort) for the queries the routes issue
+QUERY_SHAPES = [
+    ("POST /auth/login", "users", {"username": "admin"}, None),
+    ("POST /auth/register", "users", {"$or": [{"username": "x"}, {"email": "x@example.com"}]}, None),
+    ("PUT /menu/item/{item_id}", "menu_items", {"id": "x"}, None),
+    ("GET /menu/categories", "menu_items", {"category_id": "x"}, None),
+    ("GET /orders", "orders", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /orders?order_status=", "orders", {"order_status": "received"}, [("created_at", DESCENDING)]),
+    ("POST /payment/verify", "payment_orders", {"razorpay_order_id": "x"}, None),
+    ("POST /payment/webhook", "payment_orders", {"razorpay_order_id": {"$in": ["x"]}}, None),
+    ("GET /export/orders", "payment_orders", {"order_id": {"$in": ["x"]}}, None),
+    ("GET /bookings", "bookings", {}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /bookings/availability", "booking_slots", {"date": "2024-12-20"}, None),
+    ("GET /testimonials", "testimonials", {"approved": True}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    (
+        "GET /offers", "special_offers",
+        {"active": True, "$or": [{"ends_at": None}, {"ends_at": {"$gt": datetime(2024, 12, 20)}}]}, None,
+    ),
+    ("GET /analytics/sales", "sales_rollups", {"period": "day"}, [("start", ASCENDING)]),
+]
+
+
+def _same_spec(existing: dict, model: IndexModel) -> bool:
+    wanted = model.document
+    return (
+        list(existing["key"]) == list(wanted["key"].items())
+        and bool(existing.get("unique")) == bool(wanted.get("unique"))
+        and bool(existing.get("sparse")) == bool(wanted.get("sparse"))
+    )
+
+
+async def ensure_indexes(db) -> None:
+    """Create missing registry indexes and rebuild ones whose spec drifted.
+
+    Indexes not in the registry are left alone. A failure on one index (for
+    example duplicates blocking a unique index) is logged and skipped so the
+    API still starts.
+    """
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for model in models:
+            name = model.document["name"]
+            try:
+                if name in existing:
+                    if _same_spec(existing[name], model):
+                        continue
+                    logger.info("Rebuilding index %s.%s with new spec", collection_name, name)
+                    await collection.drop_index(name)
+                await collection.create_indexes([model])
+                logger.info("Created index %s.%s", collection_name, name)
+            except OperationFailure as e:
+                logger.error("Could not create index %s.%s: %s", collection_name, name, e)
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def explain_query_shapes(db) -> List[str]:
+    """Explain every registered query shape and return the routes that still COLLSCAN"""
+    offenders = []
+    for route, collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_plan_stages(winning_plan)):
+            logger.warning("COLLSCAN: %s on %s %s", route, collection_name, query)
+            offenders.append(route)
+    if not offenders:
+        logger.info("All %d registered query shapes use an index", len(QUERY_SHAPES))
+    return offenders
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    from server import db
+
+    async def main():
+        await ensure_indexes(db)
+        if "--explain" in sys.argv:
+            offenders = await explain_query_shapes(db)
+            sys.exit(1 if offenders else 0)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""Online migration of menu items out of embedded ``menu_categories.items``.
+
+Safe to run repeatedly and while old workers are still serving: each item
+is copied into ``menu_items`` before it is pulled from its category, an
+existing ``menu_items`` row is never overwritten, and items pushed into a
+category after the copy are left for the next pass.
+"""
+from pymongo import UpdateOne
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_embedded_menu_items(db) -> int:
+    """Move embedded items into menu_items; returns how many were moved"""
+    moved = 0
+    async for category in db.menu_categories.find({"items.0": {"$exists": True}}):
+        category_id = str(category["_id"])
+        items = category["items"]
+        if any(not item.get("id") for item in items):
+            # Items from before ids were assigned cannot be addressed otherwise.
+            # Give them ids in place first, only if the array is unchanged
+            # since it was read; after a concurrent write, try the next pass.
+            with_ids = [item if item.get("id") else {**item, "id": str(uuid.uuid4())} for item in items]
+            result = await db.menu_categories.update_one(
+                {"_id": category["_id"], "items": items},
+                {"$set": {"items": with_ids}}
+            )
+            if not result.modified_count:
+                continue
+            items = with_ids
+
+        await db.menu_items.bulk_write([
+            UpdateOne(
+                {"id": item["id"]},
+                {"$setOnInsert": {**item, "category_id": category_id}},
+                upsert=True
+            )
+            for item in items
+        ], ordered=False)
+
+        # Pull exactly the copied items; anything added concurrently stays
+        # embedded (and visible) until the next pass
+        await db.menu_categories.update_one(
+            {"_id": category["_id"]},
+            {"$pull": {"items": {"id": {"$in": [item["id"] for item in items]}}}}
+        )
+        moved += len(items)
+
+    if moved:
+        logger.info("Migrated %d embedded menu items into menu_items", moved)
+    return moved
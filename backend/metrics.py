@@ -0,0 +1,298 @@
+"""Request, MongoDB and payment gateway metrics in Prometheus text format.
+
+``MetricsMiddleware`` counts requests and times them per route template,
+``MongoCommandListener`` is registered on the Motor client to time every
+command per collection and operation, and ``time_payment_call`` wraps
+gateway calls. ``GET /metrics`` renders the registry.
+
+Set SLOW_REQUEST_MS to log requests slower than that, together with the
+Mongo commands each one issued and how long every command took.
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from pymongo import monitoring
+from typing import Dict, List, Optional, Sequence, Tuple
+import bisect
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Mongo commands run on Motor's executor threads; it copies the context, so
+# the list set by the middleware collects the commands of that one request
+_request_commands: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar(
+    "request_commands", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        lines = self.header()
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        _sample_gauges()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",)
+))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+))
+rejected_requests = registry.register(Counter(
+    "http_requests_rejected_total", "Requests refused by rate limiting or load shedding",
+    ("method", "route", "reason")
+))
+mongo_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and operation",
+    ("collection", "command"), MONGO_BUCKETS
+))
+mongo_failures = registry.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and operation",
+    ("collection", "command")
+))
+payment_duration = registry.register(Histogram(
+    "payment_gateway_request_duration_seconds", "Payment gateway call latency, retries included",
+    ("gateway", "operation", "outcome")
+))
+event_loop_lag = registry.register(Gauge(
+    "event_loop_lag_seconds", "How late the event loop last woke from a timed sleep"
+))
+principal_cache_size = registry.register(Gauge(
+    "principal_cache_entries", "Verified access tokens held in the principal cache"
+))
+principal_cache_hits = registry.register(Counter(
+    "principal_cache_hits_total", "Admin requests authorized from the principal cache"
+))
+principal_cache_misses = registry.register(Counter(
+    "principal_cache_misses_total", "Admin requests that had to decode the token and load the user"
+))
+
+
+def _sample_gauges() -> None:
+    from cache import principal_cache
+    from rate_limit import load_monitor
+    event_loop_lag.set(value=load_monitor.loop_lag_ms / 1000)
+    principal_cache_size.set(value=principal_cache.stats()["size"])
+
+
+# ============= MONGODB =============
+
+# Commands whose first field names the collection; getMore names it in "collection"
+_NON_COLLECTION_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions",
+                            "commitTransaction", "abortTransaction", "saslStart", "saslContinue"}
+
+
+def _collection_of(event: monitoring.CommandStartedEvent) -> str:
+    if event.command_name == "getMore":
+        return str(event.command.get("collection", ""))
+    if event.command_name in _NON_COLLECTION_COMMANDS:
+        return ""
+    value = event.command.get(event.command_name)
+    return value if isinstance(value, str) else ""
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command; pass to the client via ``event_listeners``"""
+
+    def __init__(self):
+        self._pending: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        with self._lock:
+            self._pending[self._key(event)] = _collection_of(event)
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._lock:
+            collection = self._pending.pop(self._key(event), "")
+        seconds = event.duration_micros / 1_000_000
+        mongo_duration.observe(collection, event.command_name, value=seconds)
+        if failed:
+            mongo_failures.inc(collection, event.command_name)
+        commands = _request_commands.get()
+        if commands is not None:
+            commands.append((event.command_name, collection, seconds * 1000))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+
+mongo_listener = MongoCommandListener()
+
+
+# ============= PAYMENT GATEWAY =============
+
+@asynccontextmanager
+async def time_payment_call(gateway: str, operation: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        payment_duration.observe(gateway, operation, outcome, value=time.perf_counter() - start)
+
+
+# ============= HTTP =============
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one label so scanners cannot blow up cardinality
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route counts, in-flight and latency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        commands: Optional[list] = [] if SLOW_REQUEST_MS else None
+        token = _request_commands.set(commands)
+        http_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_commands.reset(token)
+            http_in_flight.inc(method, amount=-1)
+            route = _route_template(scope)
+            http_requests.inc(method, route, str(status["code"]))
+            http_duration.observe(method, route, value=elapsed)
+            if commands is not None and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow_request(method, route, status["code"], elapsed, commands)
+
+
+def _log_slow_request(method: str, route: str, status: int, elapsed: float, commands: list) -> None:
+    mongo_ms = sum(ms for _, _, ms in commands)
+    detail = "; ".join(f"{name} {collection or '-'} {ms:.1f}ms" for name, collection, ms in commands)
+    logger.warning(
+        "Slow request %s %s -> %d in %.1fms (%d mongo commands, %.1fms): %s",
+        method, route, status, elapsed * 1000, len(commands), mongo_ms, detail or "no mongo commands"
+    )
@@ -38,6 +38,7 @@ class MenuItem(BaseModel):
     description: str
     price: float
     image: Optional[str] = None
+    image_id: Optional[str] = None  # hash from POST /images; sets image
     category: str
     # Updated to match your frontend checkboxes
     spicy: str = "None"
@@ -99,6 +100,7 @@ class Booking(BaseModel):
     guests: int
     special_request: Optional[str] = None
     status: str = "pending"  # pending, confirmed, cancelled
+    slot_key: Optional[str] = None  # booking_slots counter holding this booking's covers
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -125,13 +127,14 @@ class Testimonial(BaseModel):
 class TestimonialCreate(BaseModel):
     name: str
     role: str
-    rating: int
+    rating: int = Field(..., ge=1, le=5)
     comment: str
 
 # Gallery Models
 class GalleryImage(BaseModel):
     id: Optional[str] = None
-    image: str
+    image: Optional[str] = None
+    image_id: Optional[str] = None  # hash from POST /images; sets image
     title: str
     category: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -141,6 +144,7 @@ class SpecialOffer(BaseModel):
     id: Optional[str] = None
     title: str
     description: str
+    valid_from: Optional[str] = None
     valid_until: str
     active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -173,3 +177,4 @@ class PaymentVerification(BaseModel):
     razorpay_order_id: str
     razorpay_payment_id: str
     razorpay_signature: str
+    order_id: Optional[str] = None  # Our order, for payments created before it
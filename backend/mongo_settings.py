@@ -0,0 +1,87 @@
+"""MongoDB client tuning and read routing, configured from the environment.
+
+Pool and timeout settings are passed to the AsyncIOMotorClient in server.py
+only when set, so options in MONGO_URL and the driver defaults still apply
+otherwise.
+
+Public catalog reads (menu, gallery, offers, testimonials, restaurant info)
+use CATALOG_READ_PREFERENCE, secondaryPreferred by default, bounded by
+CATALOG_MAX_STALENESS_SECONDS. Admin, order, booking, payment and user
+queries keep the client's default primary reads (see repositories.mongo).
+"""
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from typing import Optional
+import os
+
+# Env var -> AsyncIOMotorClient keyword argument
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_MAX_CONNECTING": "maxConnecting",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_TIMEOUT_MS": "timeoutMS",
+}
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# MongoDB rejects a max staleness below 90 seconds
+MIN_MAX_STALENESS_SECONDS = 90
+
+CATALOG_READ_PREFERENCE = os.getenv("CATALOG_READ_PREFERENCE", "secondaryPreferred")
+CATALOG_MAX_STALENESS_SECONDS = int(os.getenv("CATALOG_MAX_STALENESS_SECONDS", str(MIN_MAX_STALENESS_SECONDS)))
+
+if CATALOG_READ_PREFERENCE not in READ_PREFERENCES:
+    raise ValueError(f"CATALOG_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+if CATALOG_MAX_STALENESS_SECONDS < MIN_MAX_STALENESS_SECONDS:
+    raise ValueError(f"CATALOG_MAX_STALENESS_SECONDS must be at least {MIN_MAX_STALENESS_SECONDS}")
+
+
+def client_options() -> dict:
+    """AsyncIOMotorClient keyword arguments for the MONGO_* settings that are set"""
+    return {option: int(os.environ[name]) for name, option in CLIENT_OPTIONS.items() if os.getenv(name)}
+
+
+def catalog_read_preference():
+    if CATALOG_READ_PREFERENCE == "primary":
+        return Primary()
+    return READ_PREFERENCES[CATALOG_READ_PREFERENCE](max_staleness=CATALOG_MAX_STALENESS_SECONDS)
+
+
+def catalog_reload_seconds() -> Optional[float]:
+    """How long a catalog cache load may lag the write that invalidated it, None on the primary"""
+    if CATALOG_READ_PREFERENCE == "primary":
+        return None
+    return float(CATALOG_MAX_STALENESS_SECONDS)
+
+
+class CatalogDatabase:
+    """Collections of ``db`` with the catalog read preference, as ``reads.gallery``.
+
+    Collections are taken with ``get_collection`` on the Motor database
+    rather than ``db.with_options``, which some Motor-compatible clients
+    (mongomock-motor) return unwrapped.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._read_preference = catalog_read_preference()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._db.get_collection(name, read_preference=self._read_preference)
+
+
+def catalog_database(db) -> CatalogDatabase:
+    """``db`` with the catalog read preference, for public read queries only"""
+    return CatalogDatabase(db)
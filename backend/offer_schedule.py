@@ -0,0 +1,123 @@
+"""Validity windows and the live set of special offers.
+
+``valid_from``/``valid_until`` stay free-form strings for display and are
+parsed into ``starts_at``/``ends_at`` (naive UTC, like every other stored
+datetime) when an offer is saved. A bare date covers that whole local day
+(OFFERS_TZ_OFFSET_MINUTES, IST by default); text that is not a date
+("Every weekend") leaves that side of the window open.
+
+``LiveOffers`` turns the candidate offers into the published snapshot and
+knows when it next changes, so GET /offers never re-queries and an offer
+appears or disappears exactly at its boundary.
+"""
+from datetime import datetime, timedelta, timezone
+from serialization import dumps
+from typing import Iterable, List, Optional, Tuple
+import hashlib
+import os
+
+OFFERS_TZ_OFFSET = timedelta(minutes=int(
+    os.getenv("OFFERS_TZ_OFFSET_MINUTES", os.getenv("SALES_TZ_OFFSET_MINUTES", "330"))
+))
+# Longest the scheduler sleeps between checks, even with no boundary due
+OFFER_REFRESH_SECONDS = float(os.getenv("OFFER_REFRESH_SECONDS", "60"))
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y")
+
+
+class OfferWindowError(ValueError):
+    """Raised when an offer ends before it starts"""
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_boundary(text: Optional[str], end: bool = False) -> Optional[datetime]:
+    """UTC instant a validity string denotes; a bare date ``end`` is the next local midnight"""
+    value = " ".join((text or "").replace(",", " ").split())
+    if not value:
+        return None
+    day = _parse_date(value)
+    if day is not None:
+        return (day + timedelta(days=1) if end else day) - OFFERS_TZ_OFFSET
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment - OFFERS_TZ_OFFSET
+
+
+def offer_window(offer: dict) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """``(starts_at, ends_at)`` of an offer document; raises OfferWindowError if inverted"""
+    starts_at = parse_boundary(offer.get("valid_from"))
+    ends_at = parse_boundary(offer.get("valid_until"), end=True)
+    if starts_at and ends_at and ends_at <= starts_at:
+        raise OfferWindowError("valid_until must be after valid_from")
+    return starts_at, ends_at
+
+
+def is_live(offer: dict, now: datetime) -> bool:
+    starts_at, ends_at = offer.get("starts_at"), offer.get("ends_at")
+    return (
+        bool(offer.get("active"))
+        and (starts_at is None or starts_at <= now)
+        and (ends_at is None or now < ends_at)
+    )
+
+
+class LiveOffers:
+    """Serialized snapshot of the offers live now, rebuilt at window boundaries"""
+
+    def __init__(self):
+        self.candidates: List[dict] = []
+        self.live_ids: List[str] = []
+        self.etag = '"offers-empty"'
+        self.body = dumps([])
+        self.next_change: Optional[datetime] = None
+
+    def load(self, offers: Iterable[dict], now: Optional[datetime] = None) -> None:
+        """Replace the candidates (public offer documents) and republish"""
+        candidates = []
+        for offer in offers:
+            if "ends_at" not in offer:
+                # Saved before windows were parsed; unparseable windows stay open
+                try:
+                    offer["starts_at"], offer["ends_at"] = offer_window(offer)
+                except OfferWindowError:
+                    continue
+            candidates.append(offer)
+        self.candidates = candidates
+        self.publish(now or datetime.utcnow())
+
+    def publish(self, now: datetime) -> None:
+        live = [offer for offer in self.candidates if is_live(offer, now)]
+        self.live_ids = [offer.get("id") for offer in live]
+        self.body = dumps(live)
+        # Content hash: every worker derives the same ETag at a boundary
+        self.etag = f'"offers-{hashlib.sha256(self.body).hexdigest()[:16]}"'
+        upcoming = [
+            boundary
+            for offer in self.candidates if offer.get("active")
+            for boundary in (offer.get("starts_at"), offer.get("ends_at"))
+            if boundary and boundary > now
+        ]
+        self.next_change = min(upcoming, default=None)
+
+    def current(self, now: Optional[datetime] = None) -> Tuple[str, bytes]:
+        now = now or datetime.utcnow()
+        if self.next_change and now >= self.next_change:
+            self.publish(now)
+        return self.etag, self.body
+
+    def seconds_until_change(self, now: Optional[datetime] = None) -> Optional[float]:
+        if self.next_change is None:
+            return None
+        return max((self.next_change - (now or datetime.utcnow())).total_seconds(), 0.0)
@@ -0,0 +1,43 @@
+from datetime import datetime
+from pymongo import ReturnDocument
+import asyncio
+import os
+
+# Each worker reserves this many numbers per counter round trip. Numbers left
+# over when a worker restarts or the day rolls over are simply skipped.
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", "20"))
+
+
+class OrderNumberAllocator:
+    """Hands out order numbers like ORD20241220-0042 from per-day counter blocks"""
+
+    def __init__(self, block_size: int = ORDER_NUMBER_BLOCK_SIZE, prefix: str = "ORD"):
+        self.block_size = block_size
+        self.prefix = prefix
+        self._day = None
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _reserve_block(self, db, day: str) -> None:
+        counter = await db.counters.find_one_and_update(
+            {"_id": f"order_number:{day}"},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._day = day
+        self._end = counter["seq"]
+        self._next = self._end - self.block_size + 1
+
+    async def allocate(self, db) -> str:
+        day = datetime.utcnow().strftime("%Y%m%d")
+        async with self._lock:
+            if day != self._day or self._next > self._end:
+                await self._reserve_block(db, day)
+            seq = self._next
+            self._next += 1
+        return f"{self.prefix}{day}-{seq:04d}"
+
+
+order_number_allocator = OrderNumberAllocator()
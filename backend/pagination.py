@@ -0,0 +1,56 @@
+from bson import ObjectId
+from datetime import datetime
+from typing import Any, Optional, Tuple
+import base64
+import json
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(value: Any, doc_id: ObjectId) -> str:
+    """Build an opaque cursor from the sort key and _id of the last document"""
+    if isinstance(value, datetime):
+        data = {"t": "dt", "v": value.isoformat(), "id": str(doc_id)}
+    else:
+        data = {"t": "raw", "v": value, "id": str(doc_id)}
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = datetime.fromisoformat(data["v"]) if data["t"] == "dt" else data["v"]
+        return value, ObjectId(data["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_query(query: dict, sort_field: str, cursor: Optional[str]) -> dict:
+    """Restrict a query to documents after the cursor in (sort_field, _id) descending order"""
+    if not cursor:
+        return query
+    value, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {sort_field: {"$lt": value}},
+        {sort_field: value, "_id": {"$lt": doc_id}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(collection, query: dict, sort_field: str, cursor: Optional[str],
+                     limit: int, projection: Optional[dict] = None) -> Tuple[list, Optional[str]]:
+    """Fetch one page sorted newest first; returns (documents, next cursor or None)"""
+    docs = await collection.find(
+        keyset_query(query, sort_field, cursor), projection
+    ).sort([(sort_field, -1), ("_id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+    return docs, next_cursor
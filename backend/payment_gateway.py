@@ -0,0 +1,240 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import httpx
+import logging
+import os
+import random
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+RAZORPAY_API_URL = os.getenv("RAZORPAY_API_URL", "https://api.razorpay.com/v1")
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "razorpay")  # razorpay, stub
+PAYMENT_TIMEOUT_SECONDS = float(os.getenv("PAYMENT_TIMEOUT_SECONDS", "10"))
+PAYMENT_MAX_RETRIES = int(os.getenv("PAYMENT_MAX_RETRIES", "2"))
+PAYMENT_RETRY_BASE_SECONDS = float(os.getenv("PAYMENT_RETRY_BASE_SECONDS", "0.2"))
+PAYMENT_BREAKER_THRESHOLD = int(os.getenv("PAYMENT_BREAKER_THRESHOLD", "5"))
+PAYMENT_BREAKER_COOLDOWN_SECONDS = float(os.getenv("PAYMENT_BREAKER_COOLDOWN_SECONDS", "30"))
+PAYMENT_STUB_LATENCY_MS = float(os.getenv("PAYMENT_STUB_LATENCY_MS", "0"))
+
+
+class PaymentGatewayError(Exception):
+    """Raised when the gateway rejects a call or cannot be reached"""
+
+
+class GatewayUnavailable(PaymentGatewayError):
+    """Raised without calling out while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._probing):
+            raise GatewayUnavailable("Payment gateway temporarily unavailable")
+        if state == "half-open":
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Free the half-open probe slot without counting a success or failure"""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class PaymentGateway(ABC):
+    """Common interface for payment providers"""
+
+    name = "base"
+
+    def __init__(self, key_id: str, key_secret: str):
+        self.key_id = key_id
+        self.key_secret = key_secret
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.key_id and self.key_secret)
+
+    @abstractmethod
+    async def create_order(self, amount: int, currency: str, receipt: Optional[str] = None) -> dict:
+        """Create a gateway order for ``amount`` in the currency's smallest unit"""
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        """Check the checkout signature Razorpay returns to the browser"""
+        expected = hmac.new(
+            self.key_secret.encode("utf-8"),
+            f"{order_id}|{payment_id}".encode("utf-8"),
+            hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    @staticmethod
+    def verify_webhook_signature(body: bytes, signature: str, secret: str) -> bool:
+        """Check the X-Razorpay-Signature header of a webhook delivery"""
+        expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature or "")
+
+    async def close(self) -> None:
+        pass
+
+
+class RazorpayGateway(PaymentGateway):
+    """Non-blocking Razorpay client sharing one pooled HTTP connection"""
+
+    name = "razorpay"
+
+    def __init__(self, key_id: str, key_secret: str):
+        super().__init__(key_id, key_secret)
+        self.breaker = CircuitBreaker(PAYMENT_BREAKER_THRESHOLD, PAYMENT_BREAKER_COOLDOWN_SECONDS)
+        self._client = httpx.AsyncClient(
+            base_url=RAZORPAY_API_URL,
+            auth=(key_id, key_secret),
+            timeout=PAYMENT_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def _post(self, path: str, payload: dict, idempotent: bool = False) -> dict:
+        self.breaker.before_call()
+        try:
+            return await self._send(path, payload, idempotent)
+        except PaymentGatewayError:
+            raise
+        except asyncio.CancelledError:
+            # The client went away; that says nothing about the gateway, so
+            # only give up the half-open probe slot if this call held it
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+    async def _send(self, path: str, payload: dict, idempotent: bool) -> dict:
+        for attempt in range(PAYMENT_MAX_RETRIES + 1):
+            retryable = True
+            try:
+                response = await self._client.post(path, json=payload)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # The request never reached the gateway
+                error = PaymentGatewayError(f"Gateway unreachable: {e!r}")
+            except httpx.TransportError as e:
+                # The gateway may have acted on it (e.g. a read timeout after
+                # the order was created), so only idempotent calls are retried
+                error = PaymentGatewayError(f"Gateway unreachable: {e!r}")
+                retryable = idempotent
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response.json()
+                error = PaymentGatewayError(f"Gateway returned {response.status_code}: {response.text}")
+                if response.status_code < 500 and response.status_code != 429:
+                    # The request itself is bad; retrying will not help and the
+                    # gateway is healthy, so do not count it against the breaker.
+                    self.breaker.record_success()
+                    raise error
+                # 429 and 503 are rejected before processing; other 5xx may not be
+                retryable = idempotent or response.status_code in (429, 503)
+
+            if not retryable:
+                break
+            if attempt < PAYMENT_MAX_RETRIES:
+                # Full jitter keeps retries from many workers from aligning
+                delay = random.uniform(0, PAYMENT_RETRY_BASE_SECONDS * (2 ** attempt))
+                logger.warning("Razorpay call to %s failed (%s), retrying in %.2fs", path, error, delay)
+                await asyncio.sleep(delay)
+
+        self.breaker.record_failure()
+        raise error
+
+    async def create_order(self, amount: int, currency: str, receipt: Optional[str] = None) -> dict:
+        payload = {"amount": amount, "currency": currency, "payment_capture": 1}
+        if receipt:
+            payload["receipt"] = receipt
+        return await self._post("/orders", payload)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class StubGateway(PaymentGateway):
+    """Offline gateway for local development and load tests.
+
+    Orders are fabricated locally, and signatures are computed with the
+    same key secret so the normal verify flow works end to end.
+    """
+
+    name = "stub"
+
+    def __init__(self, key_id: str = "", key_secret: str = ""):
+        super().__init__(key_id or "rzp_stub_key", key_secret or "rzp_stub_secret")
+
+    async def create_order(self, amount: int, currency: str, receipt: Optional[str] = None) -> dict:
+        if PAYMENT_STUB_LATENCY_MS:
+            await asyncio.sleep(PAYMENT_STUB_LATENCY_MS / 1000)
+        return {
+            "id": f"order_stub_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": amount,
+            "currency": currency,
+            "receipt": receipt,
+            "status": "created",
+        }
+
+    def sign_payment(self, order_id: str, payment_id: str) -> str:
+        """Produce the signature a real checkout would hand back"""
+        return hmac.new(
+            self.key_secret.encode("utf-8"),
+            f"{order_id}|{payment_id}".encode("utf-8"),
+            hashlib.sha256
+        ).hexdigest()
+
+
+_gateway: Optional[PaymentGateway] = None
+
+
+def get_gateway() -> PaymentGateway:
+    """Return the process-wide gateway selected by PAYMENT_GATEWAY"""
+    global _gateway
+    if _gateway is None:
+        key_id = os.getenv("RAZORPAY_KEY_ID", "")
+        key_secret = os.getenv("RAZORPAY_KEY_SECRET", "")
+        if PAYMENT_GATEWAY == "stub":
+            _gateway = StubGateway(key_id, key_secret)
+        else:
+            _gateway = RazorpayGateway(key_id, key_secret)
+    return _gateway
+
+
+async def close_gateway() -> None:
+    global _gateway
+    if _gateway is not None:
+        await _gateway.close()
+        _gateway = None
@@ -1,17 +1,16 @@
 from fastapi import APIRouter, HTTPException, Request
 from models import PaymentOrder, PaymentVerification
-import razorpay
+from datetime import datetime
+from events import publish_order_event, PAYMENT_COMPLETED
+from repositories import get_repositories
+import webhooks
+from payment_gateway import get_gateway, GatewayUnavailable, PaymentGatewayError
+from metrics import time_payment_call
+from pricing import to_paise
 import os
-import hmac
-import hashlib
 
 router = APIRouter()
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(
-    auth=(os.getenv("RAZORPAY_KEY_ID", ""), os.getenv("RAZORPAY_KEY_SECRET", ""))
-)
-
 def get_db():
     from server import db
     return db
@@ -20,44 +19,52 @@ def get_db():
 async def create_payment_order(payment_data: PaymentOrder):
     """Create a Razorpay order for payment"""
     try:
-        key_id = os.getenv("RAZORPAY_KEY_ID", "")
-        key_secret = os.getenv("RAZORPAY_KEY_SECRET", "")
+        gateway = get_gateway()
 
-        if not key_id or not key_secret:
+        if not gateway.configured:
             raise HTTPException(
                 status_code=500,
                 detail="Razorpay keys not configured in .env file"
             )
 
-        # Re-initialize client with current env values (in case of hot reload)
-        client = razorpay.Client(auth=(key_id, key_secret))
-
-        # Create Razorpay order
-        razorpay_order = client.order.create({
-            "amount": payment_data.amount,  # Amount in paise
-            "currency": payment_data.currency,
-            "payment_capture": 1  # Auto capture
-        })
+        # Charge the server-computed total when the order already exists;
+        # otherwise /payment/verify checks the amount against the order
+        amount = payment_data.amount
+        order = await get_repositories().orders.get(payment_data.order_id)
+        if order is not None:
+            amount = to_paise(order["total_amount"])
+
+        # Create Razorpay order (amount in paise, auto capture)
+        async with time_payment_call(gateway.name, "create_order"):
+            razorpay_order = await gateway.create_order(
+                amount,
+                payment_data.currency,
+                receipt=payment_data.order_id
+            )
 
         # Store order in database
-        db = get_db()
-        await db.payment_orders.insert_one({
+        await get_repositories().payments.create({
             "razorpay_order_id": razorpay_order["id"],
             "order_id": payment_data.order_id,
-            "amount": payment_data.amount,
+            "amount": amount,
             "currency": payment_data.currency,
-            "status": "created"
+            "status": "created",
+            "created_at": datetime.utcnow()
         })
 
         return {
             "order_id": razorpay_order["id"],
             "amount": razorpay_order["amount"],
             "currency": razorpay_order["currency"],
-            "key_id": key_id
+            "key_id": gateway.key_id
         }
 
     except HTTPException:
         raise
+    except GatewayUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except PaymentGatewayError as e:
+        raise HTTPException(status_code=502, detail=f"Error creating payment order: {str(e)}")
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -69,44 +76,53 @@ async def create_payment_order(payment_data: PaymentOrder):
 async def verify_payment(verification_data: PaymentVerification):
     """Verify Razorpay payment signature"""
     try:
-        key_secret = os.getenv("RAZORPAY_KEY_SECRET", "")
-
-        # ✅ Fixed: was hmac.new() which doesn't exist — correct is hmac.new via HMAC constructor
-        body = f"{verification_data.razorpay_order_id}|{verification_data.razorpay_payment_id}"
-        generated_signature = hmac.new(
-            key_secret.encode("utf-8"),
-            body.encode("utf-8"),
-            hashlib.sha256
-        ).hexdigest()
-
-        if generated_signature != verification_data.razorpay_signature:
+        if not get_gateway().verify_payment_signature(
+            verification_data.razorpay_order_id,
+            verification_data.razorpay_payment_id,
+            verification_data.razorpay_signature
+        ):
             raise HTTPException(status_code=400, detail="Invalid payment signature")
 
         db = get_db()
-
-        # Update payment order status
-        await db.payment_orders.update_one(
-            {"razorpay_order_id": verification_data.razorpay_order_id},
-            {"$set": {
-                "status": "completed",
-                "razorpay_payment_id": verification_data.razorpay_payment_id
-            }}
-        )
-
-        # Get the linked order_id from payment_orders
-        payment_order = await db.payment_orders.find_one(
-            {"razorpay_order_id": verification_data.razorpay_order_id}
+        repos = get_repositories()
+
+        payment = await repos.payments.get(verification_data.razorpay_order_id)
+        if payment is None:
+            raise HTTPException(status_code=404, detail="Payment not found")
+
+        # Checkout creates the payment before the order, under a temp_
+        # placeholder id, so attach it to the real order before completing
+        order_id = verification_data.order_id or payment.get("order_id")
+        order = await repos.orders.get(order_id)
+        if order_id != payment.get("order_id"):
+            if await repos.orders.get(payment.get("order_id")) is not None:
+                raise HTTPException(status_code=400, detail="Payment belongs to a different order")
+            if order is None:
+                raise HTTPException(status_code=404, detail="Order not found")
+
+        # The amount was chosen by the browser; never accept less than the
+        # server-computed total
+        if order is not None and payment.get("amount") != to_paise(order["total_amount"]):
+            raise HTTPException(status_code=400, detail="Payment amount does not match the order total")
+
+        if order_id != payment.get("order_id"):
+            if not await repos.payments.link_order_if(
+                verification_data.razorpay_order_id, payment.get("order_id"), order_id
+            ):
+                raise HTTPException(status_code=409, detail="Payment was modified concurrently, please retry")
+
+        # One atomic write on the payment record, then the linked order
+        payment_order = await repos.payments.complete(
+            verification_data.razorpay_order_id,
+            verification_data.razorpay_payment_id
         )
 
         if payment_order and payment_order.get("order_id"):
-            from bson import ObjectId
-            await db.orders.update_one(
-                {"_id": ObjectId(payment_order["order_id"])},
-                {"$set": {
-                    "payment_status": "completed",
-                    "payment_id": verification_data.razorpay_payment_id
-                }}
-            )
+            await publish_order_event(db, PAYMENT_COMPLETED, {
+                "order_id": payment_order["order_id"],
+                "payment_id": verification_data.razorpay_payment_id,
+                "amount": payment_order.get("amount")
+            })
 
         return {
             "message": "Payment verified successfully",
@@ -129,28 +145,24 @@ async def payment_webhook(request: Request):
         payload = await request.body()
         signature = request.headers.get('X-Razorpay-Signature', '')
 
+        # Webhook events mark orders paid, so unverified deliveries are
+        # refused outright rather than queued
         webhook_secret = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
-        if webhook_secret and webhook_secret != 'dummy_webhook_secret':
-            razorpay_client.utility.verify_webhook_signature(
-                payload.decode(),
-                signature,
-                webhook_secret
-            )
+        if not webhook_secret or webhook_secret == 'dummy_webhook_secret':
+            raise HTTPException(status_code=503, detail="Webhook secret not configured")
+        if not get_gateway().verify_webhook_signature(payload, signature, webhook_secret):
+            raise HTTPException(status_code=400, detail="Invalid webhook signature")
 
-        import json
-        data = json.loads(payload.decode())
         db = get_db()
+        try:
+            accepted = await webhooks.ingest(db, payload, request.headers.get('X-Razorpay-Event-Id'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid webhook payload")
 
-        event = data.get('event')
-        payment_entity = data.get('payload', {}).get('payment', {}).get('entity', {})
-
-        if payment_entity:
-            await db.payment_orders.update_one(
-                {"razorpay_payment_id": payment_entity.get('id')},
-                {"$set": {"webhook_event": event, "webhook_data": payment_entity}}
-            )
-
-        return {"status": "processed"}
+        # Processing happens in the background webhook workers
+        return {"status": "accepted" if accepted else "duplicate"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Webhook error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""Atomic payment completion shared by the payment routes.
+
+On a replica set or sharded cluster the payment record and its order are
+updated in one multi-document transaction. A standalone server cannot run
+transactions, so there the order update is followed by a compensating
+write that restores the payment record if the order could not be updated.
+"""
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument
+from typing import Optional
+import logging
+import sales_rollups
+
+logger = logging.getLogger(__name__)
+
+_transactions_supported: Optional[bool] = None
+
+# Order fields sales_rollups needs when a payment completes
+ROLLUP_PROJECTION = {"created_at": 1, "total_amount": 1}
+
+
+async def supports_transactions(db) -> bool:
+    """Whether the deployment is a replica set or mongos (checked once)"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await db.command("hello")
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+
+def _payment_update(payment_id: str) -> dict:
+    return {"$set": {
+        "status": "completed",
+        "razorpay_payment_id": payment_id,
+        "completed_at": datetime.utcnow()
+    }}
+
+
+def _order_filter(payment_order: dict) -> Optional[dict]:
+    order_id = payment_order.get("order_id")
+    if not order_id or not ObjectId.is_valid(order_id):
+        # Checkout creates the payment before the order, with a placeholder id
+        return None
+    return {"_id": ObjectId(order_id)}
+
+
+def _order_update(payment_id: str) -> dict:
+    return {"$set": {
+        "payment_status": "completed",
+        "payment_id": payment_id,
+        "updated_at": datetime.utcnow()
+    }}
+
+
+async def mark_order_paid(db, order_filter: dict, payment_id: str, session=None) -> Optional[dict]:
+    """Complete an order's payment; returns the order only if this call completed it"""
+    return await db.orders.find_one_and_update(
+        {**order_filter, "payment_status": {"$ne": "completed"}},
+        _order_update(payment_id),
+        projection=ROLLUP_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+
+
+async def complete_payment(client, db, razorpay_order_id: str, payment_id: str) -> Optional[dict]:
+    """Mark a payment and its order completed; returns the payment record before the update.
+
+    Returns None when no payment record exists for ``razorpay_order_id``.
+    """
+    if await supports_transactions(db):
+        async def in_transaction(session):
+            before = await db.payment_orders.find_one_and_update(
+                {"razorpay_order_id": razorpay_order_id},
+                _payment_update(payment_id),
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            paid = None
+            if before and _order_filter(before):
+                paid = await mark_order_paid(db, _order_filter(before), payment_id, session=session)
+            return before, paid
+
+        # with_transaction retries transient errors and unknown commit results
+        async with await client.start_session() as session:
+            before, paid = await session.with_transaction(in_transaction)
+        if paid:
+            await sales_rollups.record_payment(db, paid)
+        return before
+
+    before = await db.payment_orders.find_one_and_update(
+        {"razorpay_order_id": razorpay_order_id},
+        _payment_update(payment_id),
+        return_document=ReturnDocument.BEFORE
+    )
+    if before and _order_filter(before):
+        try:
+            paid = await mark_order_paid(db, _order_filter(before), payment_id)
+        except Exception:
+            # Put the payment record back so a retry starts from a clean state
+            restore = {k: before[k] for k in ("status", "razorpay_payment_id", "completed_at") if k in before}
+            unset = {k: "" for k in ("razorpay_payment_id", "completed_at") if k not in before}
+            compensation = {"$set": restore}
+            if unset:
+                compensation["$unset"] = unset
+            await db.payment_orders.update_one({"_id": before["_id"]}, compensation)
+            logger.error("Order update failed for payment %s; payment record restored", payment_id)
+            raise
+        if paid:
+            await sales_rollups.record_payment(db, paid)
+    return before
@@ -0,0 +1,67 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from models import OrderItem
+
+
+class PricingError(ValueError):
+    """Raised when an order references an unknown or unavailable item"""
+
+
+class PriceEntry(NamedTuple):
+    name: str
+    price: float
+    available: bool
+    category_id: str
+
+
+class PriceIndex:
+    """item_id -> PriceEntry lookup rebuilt whenever the menu cache reloads"""
+
+    def __init__(self):
+        self._entries: Dict[str, PriceEntry] = {}
+
+    def rebuild(self, categories: List[dict]) -> None:
+        entries = {}
+        for category in categories:
+            for item in category.get("items", []):
+                if item.get("id"):
+                    entries[item["id"]] = PriceEntry(
+                        name=item["name"],
+                        price=float(item["price"]),
+                        available=item.get("available", True),
+                        category_id=category.get("id"),
+                    )
+        # Swap in one assignment so readers never see a half-built index
+        self._entries = entries
+
+    def get(self, item_id: str) -> Optional[PriceEntry]:
+        return self._entries.get(item_id)
+
+    def price_items(self, items: List[OrderItem]) -> Tuple[List[OrderItem], float]:
+        """Recompute line prices and the order total from menu prices"""
+        priced = []
+        for item in items:
+            entry = self._entries.get(item.item_id)
+            if entry is None:
+                raise PricingError(f"Menu item not found: {item.item_id}")
+            if not entry.available:
+                raise PricingError(f"{entry.name} is currently unavailable")
+            if item.quantity < 1:
+                raise PricingError(f"Invalid quantity for {entry.name}")
+            priced.append(OrderItem(
+                item_id=item.item_id,
+                name=entry.name,
+                price=entry.price,
+                quantity=item.quantity,
+                subtotal=round(entry.price * item.quantity, 2),
+            ))
+        if not priced:
+            raise PricingError("Order has no items")
+        return priced, round(sum(item.subtotal for item in priced), 2)
+
+
+def to_paise(amount: float) -> int:
+    """Rupee amount in paise, the unit gateway orders are created in"""
+    return int(round(amount * 100))
+
+
+price_index = PriceIndex()
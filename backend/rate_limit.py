@@ -0,0 +1,208 @@
+"""Token-bucket rate limiting and load shedding for public write endpoints.
+
+Each limited route has a per-client-IP bucket and a global bucket, written
+as ``count/period`` (``10/minute``): the bucket holds ``count`` tokens and
+refills at ``count`` per period. Either bucket running dry gets a 429 with
+Retry-After. Bucket state lives behind ``RateLimitBackend`` so it can move
+to shared storage; ``MemoryBackend`` keeps it per process.
+
+Before buckets are consulted, limited routes are shed with a 503 when the
+event loop is lagging or too many requests are already in flight, so a
+flood is turned away before it reaches Mongo or bcrypt.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from metrics import rejected_requests
+from starlette.responses import JSONResponse
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+# Use the first X-Forwarded-For hop as the client IP (only behind a trusted proxy)
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() in ("1", "true", "yes")
+
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "256"))
+SHED_MAX_LOOP_LAG_MS = float(os.getenv("SHED_MAX_LOOP_LAG_MS", "250"))
+LOOP_LAG_SAMPLE_SECONDS = 0.1
+
+# Long-lived streams would otherwise count as in flight for their whole life
+UNCOUNTED_PREFIXES = ("/api/events/",)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+@dataclass(frozen=True)
+class Rate:
+    capacity: float
+    per_second: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "Rate":
+        count, _, period = spec.strip().partition("/")
+        if period not in PERIODS or float(count) <= 0:
+            raise ValueError(f"Invalid rate {spec!r}, expected e.g. '10/minute'")
+        return cls(float(count), float(count) / PERIODS[period])
+
+
+@dataclass(frozen=True)
+class RouteLimit:
+    per_ip: Rate
+    global_: Rate
+
+
+def _route_limit(name: str, per_ip: str, global_: str) -> RouteLimit:
+    return RouteLimit(
+        Rate.parse(os.getenv(f"RATE_LIMIT_{name}_IP", per_ip)),
+        Rate.parse(os.getenv(f"RATE_LIMIT_{name}_GLOBAL", global_)),
+    )
+
+
+# (method, path) -> limits; override with RATE_LIMIT_<NAME>_IP / _GLOBAL
+ROUTE_LIMITS: Dict[Tuple[str, str], RouteLimit] = {
+    ("POST", "/api/orders"): _route_limit("ORDERS", "10/minute", "20/second"),
+    ("POST", "/api/bookings"): _route_limit("BOOKINGS", "5/minute", "10/second"),
+    ("POST", "/api/testimonials"): _route_limit("TESTIMONIALS", "3/minute", "5/second"),
+    ("POST", "/api/auth/register"): _route_limit("REGISTER", "3/minute", "2/second"),
+    ("POST", "/api/auth/login"): _route_limit("LOGIN", "10/minute", "10/second"),
+}
+
+
+class RateLimitBackend(ABC):
+    """Token bucket storage; ``take`` returns 0 if allowed, else seconds to wait"""
+
+    @abstractmethod
+    async def take(self, key: str, rate: Rate, cost: float = 1) -> float:
+        ...
+
+
+class MemoryBackend(RateLimitBackend):
+    """Per-process buckets, least recently used keys evicted past max_keys"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: Rate, cost: float = 1) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (rate.capacity, now))
+        tokens = min(rate.capacity, tokens + (now - updated) * rate.per_second)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate.per_second
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def get_backend() -> RateLimitBackend:
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r}")
+    return MemoryBackend()
+
+
+class LoadMonitor:
+    """Tracks requests in flight and how late the event loop wakes up"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.loop_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_LAG_SAMPLE_SECONDS
+            await asyncio.sleep(LOOP_LAG_SAMPLE_SECONDS)
+            self.loop_lag_ms = max(0.0, (loop.time() - expected) * 1000)
+
+    def overloaded(self) -> Optional[str]:
+        if self.in_flight > SHED_MAX_IN_FLIGHT:
+            return "too many requests in flight"
+        if self.loop_lag_ms > SHED_MAX_LOOP_LAG_MS:
+            return "event loop lagging"
+        return None
+
+
+load_monitor = LoadMonitor()
+
+
+def client_ip(scope) -> str:
+    if TRUST_PROXY_HEADERS:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying load shedding and ROUTE_LIMITS"""
+
+    def __init__(self, app, backend: Optional[RateLimitBackend] = None, monitor: LoadMonitor = load_monitor):
+        self.app = app
+        self.backend = backend or get_backend()
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"].rstrip("/") or "/"
+        limit = ROUTE_LIMITS.get((scope["method"], path)) if RATE_LIMIT_ENABLED else None
+        if limit:
+            response = await self._check(scope, path, limit)
+            if response:
+                return await response(scope, receive, send)
+
+        if path.startswith(UNCOUNTED_PREFIXES):
+            return await self.app(scope, receive, send)
+        self.monitor.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.in_flight -= 1
+
+    async def _check(self, scope, path: str, limit: RouteLimit) -> Optional[JSONResponse]:
+        reason = self.monitor.overloaded()
+        if reason:
+            logger.warning("Shedding %s %s: %s", scope["method"], path, reason)
+            rejected_requests.inc(scope["method"], path, "shed")
+            return _reject(503, "Server busy, please retry shortly", 1)
+
+        route = f"{scope['method']} {path}"
+        # Per-IP first, so one noisy client cannot drain the shared budget
+        wait = await self.backend.take(f"ip:{client_ip(scope)}:{route}", limit.per_ip)
+        if not wait:
+            wait = await self.backend.take(f"global:{route}", limit.global_)
+        if wait:
+            rejected_requests.inc(scope["method"], path, "rate_limited")
+            return _reject(429, "Too many requests, please slow down", wait)
+        return None
@@ -0,0 +1,96 @@
+"""Storage used by the route handlers, selected with STORAGE_BACKEND.
+
+``mongo`` (the default) wraps the Motor database from server.py;
+``memory`` keeps everything in process, for tests and benchmarks that run
+without a MongoDB server. Handlers call ``get_repositories()`` instead of
+touching collections, and read-through caches wrap the repositories here
+(see repositories.caching).
+
+Analytics, exports, webhook ingestion, image storage and the Mongo event
+broker still talk to the database directly and need STORAGE_BACKEND=mongo.
+"""
+from dataclasses import dataclass
+from typing import Optional
+from .base import BookingRepository, CacheVersionRepository, OrderRepository, PaymentRepository
+from .caching import (
+    CachedGalleryRepository, CachedMenuRepository, CachedRestaurantRepository, CachedTestimonialRepository,
+    CachedUserRepository, ScheduledOfferRepository,
+)
+import os
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+
+@dataclass
+class Repositories:
+    versions: CacheVersionRepository
+    users: CachedUserRepository
+    restaurant: CachedRestaurantRepository
+    menu: CachedMenuRepository
+    orders: OrderRepository
+    bookings: BookingRepository
+    payments: PaymentRepository
+    testimonials: CachedTestimonialRepository
+    gallery: CachedGalleryRepository
+    offers: ScheduledOfferRepository
+
+
+def mongo_repositories(client, db) -> Repositories:
+    from . import mongo
+    from mongo_settings import catalog_database, catalog_reload_seconds
+    versions = mongo.MongoCacheVersionRepository(db)
+    # Public catalog reads may go to replicas; everything else reads the primary
+    reads = catalog_database(db)
+    reload_after = catalog_reload_seconds()
+    return Repositories(
+        versions=versions,
+        users=CachedUserRepository(mongo.MongoUserRepository(db), versions),
+        restaurant=CachedRestaurantRepository(mongo.MongoRestaurantRepository(db, reads), versions, reload_after),
+        menu=CachedMenuRepository(mongo.MongoMenuRepository(db, reads), versions, reload_after),
+        orders=mongo.MongoOrderRepository(db),
+        bookings=mongo.MongoBookingRepository(db),
+        payments=mongo.MongoPaymentRepository(db, client),
+        testimonials=CachedTestimonialRepository(mongo.MongoTestimonialRepository(db, reads, client), versions, reload_after),
+        gallery=CachedGalleryRepository(mongo.MongoGalleryRepository(db, reads), versions, reload_after),
+        offers=ScheduledOfferRepository(mongo.MongoOfferRepository(db, reads), versions, reload_after),
+    )
+
+
+def memory_repositories() -> Repositories:
+    from . import memory
+    versions = memory.MemoryCacheVersionRepository()
+    orders = memory.MemoryOrderRepository()
+    return Repositories(
+        versions=versions,
+        users=CachedUserRepository(memory.MemoryUserRepository(), versions),
+        restaurant=CachedRestaurantRepository(memory.MemoryRestaurantRepository(), versions),
+        menu=CachedMenuRepository(memory.MemoryMenuRepository(), versions),
+        orders=orders,
+        bookings=memory.MemoryBookingRepository(),
+        payments=memory.MemoryPaymentRepository(orders),
+        testimonials=CachedTestimonialRepository(memory.MemoryTestimonialRepository(), versions),
+        gallery=CachedGalleryRepository(memory.MemoryGalleryRepository(), versions),
+        offers=ScheduledOfferRepository(memory.MemoryOfferRepository(), versions),
+    )
+
+
+_repositories: Optional[Repositories] = None
+
+
+def get_repositories() -> Repositories:
+    global _repositories
+    if _repositories is None:
+        if STORAGE_BACKEND == "memory":
+            _repositories = memory_repositories()
+        elif STORAGE_BACKEND == "mongo":
+            from server import client, db
+            _repositories = mongo_repositories(client, db)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _repositories
+
+
+def set_repositories(repositories: Optional[Repositories]) -> None:
+    """Swap the storage used by the handlers (None re-reads STORAGE_BACKEND)"""
+    global _repositories
+    _repositories = repositories
@@ -0,0 +1,251 @@
+"""Storage interfaces used by the route handlers.
+
+Documents cross this boundary as plain dicts shaped like the Mongo
+documents (``_id`` included), so serialization.encode_documents works on
+the results of every backend. Ids are passed in as strings; an id that is
+malformed for the backend is treated like one that does not exist.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+Page = Tuple[List[dict], Optional[str]]
+
+# Fields left out of admin list views unless view=full is requested
+ORDER_SUMMARY_FIELDS = ("items", "special_instructions")
+BOOKING_SUMMARY_FIELDS = ("special_request",)
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def clamp_rating(rating) -> int:
+    return min(max(int(rating or 0), RATINGS[0]), RATINGS[-1])
+
+
+def rating_summary(count: int, total: int, histogram: dict) -> dict:
+    """Public shape of the approved-testimonial rating aggregate"""
+    return {
+        "count": count,
+        "average": round(total / count, 2) if count else None,
+        "histogram": {str(rating): histogram.get(str(rating), 0) for rating in RATINGS},
+    }
+
+
+class CacheVersionRepository(ABC):
+    """Version counters shared by every worker, behind cache.VersionedCache"""
+
+    @abstractmethod
+    async def get(self, name: str) -> int:
+        ...
+
+    @abstractmethod
+    async def bump(self, name: str) -> int:
+        ...
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def exists(self, username: str, email: str) -> bool:
+        """Whether the username or the email is already taken"""
+
+    @abstractmethod
+    async def create(self, user: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def set_password_hash(self, user_id, hashed_password: str) -> None:
+        ...
+
+
+class RestaurantRepository(ABC):
+    @abstractmethod
+    async def get_info(self) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update_info(self, info: dict) -> None:
+        ...
+
+
+class MenuRepository(ABC):
+    @abstractmethod
+    async def list_categories(self, primary: bool = False) -> List[dict]:
+        """Every category with its items, validated through MenuCategory.
+
+        ``primary`` forces an up-to-date read where the backend may serve
+        catalog reads from replicas.
+        """
+
+    @abstractmethod
+    async def category_exists(self, category_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def create_category(self, category: dict, items: List[dict]) -> str:
+        ...
+
+    @abstractmethod
+    async def create_item(self, item: dict) -> None:
+        ...
+
+    @abstractmethod
+    async def update_item(self, item_id: str, fields: dict) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_item(self, item_id: str) -> bool:
+        ...
+
+
+class OrderRepository(ABC):
+    @abstractmethod
+    async def next_order_number(self) -> str:
+        ...
+
+    @abstractmethod
+    async def create(self, order: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def get(self, order_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def list_page(
+        self,
+        cursor: Optional[str],
+        limit: int,
+        summary: bool = False,
+        order_status: Optional[str] = None,
+        payment_status: Optional[str] = None,
+        delivery_type: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> Page:
+        """Newest first; raises ValueError for a malformed cursor"""
+
+    @abstractmethod
+    async def set_status(self, order_id: str, status: str) -> Optional[dict]:
+        """Set order_status; returns the order as it was before, None if missing"""
+
+
+class BookingRepository(ABC):
+    @abstractmethod
+    async def reserve(self, date: str, slot: str, guests: int) -> str:
+        """Take covers from a slot; returns its key, raises booking_slots.SlotFull"""
+
+    @abstractmethod
+    async def release(self, key: str, guests: int) -> None:
+        ...
+
+    @abstractmethod
+    async def set_capacity(self, date: str, slot: str, capacity: int) -> None:
+        ...
+
+    @abstractmethod
+    async def availability(self, date: str) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def create(self, booking: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def get(self, booking_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def list_page(
+        self,
+        cursor: Optional[str],
+        limit: int,
+        summary: bool = False,
+        status: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> Page:
+        """Latest date first; raises ValueError for a malformed cursor"""
+
+    @abstractmethod
+    async def set_status_if(self, booking_id: str, expected: Optional[str], status: str) -> bool:
+        """Change the status only if it is still ``expected``"""
+
+
+class PaymentRepository(ABC):
+    @abstractmethod
+    async def create(self, payment_order: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def get(self, razorpay_order_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def link_order_if(self, razorpay_order_id: str, expected: Optional[str], order_id: str) -> bool:
+        """Point the payment at ``order_id`` only if its order id is still ``expected``"""
+
+    @abstractmethod
+    async def complete(self, razorpay_order_id: str, payment_id: str) -> Optional[dict]:
+        """Mark a payment and its order completed; returns the payment record before"""
+
+
+class TestimonialRepository(ABC):
+    @abstractmethod
+    async def list_approved(self, limit: int = 100) -> List[dict]:
+        """Most recent approved testimonials first"""
+
+    @abstractmethod
+    async def list_approved_page(self, cursor: Optional[str], limit: int) -> Page:
+        """Approved testimonials newest first; raises ValueError for a malformed cursor"""
+
+    @abstractmethod
+    async def list_pending(self, limit: int = 100) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def create(self, testimonial: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def approve(self, testimonial_id: str) -> bool:
+        """Approve a pending testimonial and add its rating to the summary"""
+
+    @abstractmethod
+    async def rating_summary(self) -> dict:
+        """Count, average and 1-5 histogram of approved ratings (see rating_summary)"""
+
+    @abstractmethod
+    async def ensure_rating_summary(self) -> None:
+        """Build the summary from existing testimonials if it does not exist yet"""
+
+
+class GalleryRepository(ABC):
+    @abstractmethod
+    async def list(self, limit: int = 100) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def create(self, image: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def delete(self, image_id: str) -> bool:
+        ...
+
+
+class OfferRepository(ABC):
+    @abstractmethod
+    async def list_active(self, limit: int = 100) -> List[dict]:
+        """Active offers whose window has not ended, including ones not started yet"""
+
+    @abstractmethod
+    async def create(self, offer: dict) -> str:
+        ...
+
+    @abstractmethod
+    async def update(self, offer_id: str, fields: dict) -> bool:
+        ...
@@ -0,0 +1,310 @@
+"""Read-through caches layered over any repository backend.
+
+Each wrapper owns a VersionedCache of the serialized public payload and
+bumps its version on every mutation that changes that payload, so callers
+never invalidate by hand. ``cached()`` returns ``(etag, body)``; between
+version checks it is answered from memory without a database round trip.
+``reload_after`` is passed when the inner repository reads from replicas
+(see mongo_settings).
+"""
+from typing import List, Optional, Tuple
+from cache import PrincipalCache, VersionedCache, principal_cache
+from pricing import price_index
+from serialization import dumps, public_document
+from . import base
+import asyncio
+import logging
+import offer_schedule
+
+logger = logging.getLogger(__name__)
+
+# Approved testimonials kept in the public cache, newest first
+RECENT_TESTIMONIALS = 100
+
+
+class _ReadThrough:
+    def _init_cache(
+        self, name: str, loader, versions: base.CacheVersionRepository, on_load=None, reload_after=None,
+    ) -> None:
+        self.cache = VersionedCache(name, loader, versions, on_load=on_load, reload_after=reload_after)
+
+    async def cached(self) -> Tuple[str, bytes]:
+        return await self.cache.get()
+
+    async def invalidate(self) -> int:
+        return await self.cache.bump()
+
+
+class CachedUserRepository(base.UserRepository):
+    """Evicts cached principals (cache.principal_cache) whenever a user changes.
+
+    The local entries go at once; other workers drop theirs when they see
+    the bumped ``users`` version.
+    """
+
+    def __init__(self, inner: base.UserRepository, versions: base.CacheVersionRepository):
+        self.inner = inner
+        self.versions = versions
+
+    async def _changed(self, user_id=None) -> None:
+        await self.versions.bump(PrincipalCache.VERSION)
+        if user_id is not None:
+            principal_cache.invalidate_user(user_id=user_id)
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        return await self.inner.get_by_username(username)
+
+    async def exists(self, username: str, email: str) -> bool:
+        return await self.inner.exists(username, email)
+
+    async def create(self, user: dict) -> str:
+        user_id = await self.inner.create(user)
+        await self._changed()
+        return user_id
+
+    async def set_password_hash(self, user_id, hashed_password: str) -> None:
+        await self.inner.set_password_hash(user_id, hashed_password)
+        await self._changed(user_id)
+
+
+class CachedMenuRepository(_ReadThrough, base.MenuRepository):
+    """Full menu, plus pricing.price_index for checkout.
+
+    The public payload may be read from a replica; the price index is
+    loaded from the primary by a second cache on the same version, so
+    orders are never priced from a lagging menu.
+    """
+
+    def __init__(
+        self,
+        inner: base.MenuRepository,
+        versions: base.CacheVersionRepository,
+        reload_after: Optional[float] = None,
+    ):
+        self.inner = inner
+        self._init_cache("menu", inner.list_categories, versions, reload_after=reload_after)
+        self.price_cache = VersionedCache("menu", self._load_prices, versions, on_load=price_index.rebuild)
+
+    async def _load_prices(self) -> List[dict]:
+        return await self.inner.list_categories(primary=True)
+
+    async def prices(self) -> None:
+        """Bring pricing.price_index up to date with the menu version"""
+        await self.price_cache.get()
+
+    async def invalidate(self) -> int:
+        version = await super().invalidate()
+        self.price_cache.expire()
+        return version
+
+    async def list_categories(self, primary: bool = False) -> List[dict]:
+        return await self.inner.list_categories(primary)
+
+    async def category_exists(self, category_id: str) -> bool:
+        return await self.inner.category_exists(category_id)
+
+    async def create_category(self, category: dict, items: List[dict]) -> str:
+        category_id = await self.inner.create_category(category, items)
+        await self.invalidate()
+        return category_id
+
+    async def create_item(self, item: dict) -> None:
+        await self.inner.create_item(item)
+        await self.invalidate()
+
+    async def update_item(self, item_id: str, fields: dict) -> bool:
+        updated = await self.inner.update_item(item_id, fields)
+        if updated:
+            await self.invalidate()
+        return updated
+
+    async def delete_item(self, item_id: str) -> bool:
+        deleted = await self.inner.delete_item(item_id)
+        if deleted:
+            await self.invalidate()
+        return deleted
+
+
+class CachedRestaurantRepository(_ReadThrough, base.RestaurantRepository):
+    def __init__(
+        self,
+        inner: base.RestaurantRepository,
+        versions: base.CacheVersionRepository,
+        reload_after: Optional[float] = None,
+    ):
+        self.inner = inner
+        self._init_cache("restaurant_info", self._load, versions, reload_after=reload_after)
+
+    async def _load(self) -> Optional[dict]:
+        info = await self.inner.get_info()
+        if info:
+            # Kept as "_id" for existing clients of GET /restaurant/info
+            info["_id"] = str(info["_id"])
+        return info
+
+    async def get_info(self) -> Optional[dict]:
+        return await self.inner.get_info()
+
+    async def update_info(self, info: dict) -> None:
+        await self.inner.update_info(info)
+        await self.invalidate()
+
+
+class CachedTestimonialRepository(_ReadThrough, base.TestimonialRepository):
+    """Caches the most recent approved testimonials and the rating summary.
+
+    Pending testimonials are never public, so only approval invalidates.
+    """
+
+    def __init__(
+        self,
+        inner: base.TestimonialRepository,
+        versions: base.CacheVersionRepository,
+        reload_after: Optional[float] = None,
+    ):
+        self.inner = inner
+        self._recent: List[dict] = []
+        self._init_cache("testimonials", self._load, versions, self._keep_recent, reload_after)
+        self.summary_cache = VersionedCache(
+            "testimonial_ratings", inner.rating_summary, versions, reload_after=reload_after,
+        )
+
+    async def _load(self) -> List[dict]:
+        return [public_document(doc) for doc in await self.inner.list_approved(RECENT_TESTIMONIALS)]
+
+    def _keep_recent(self, recent: List[dict]) -> None:
+        self._recent = recent
+
+    async def cached_recent(self, top: int) -> Tuple[str, bytes]:
+        """The ``top`` most recent approved testimonials, cut from the cached list"""
+        etag, _ = await self.cached()
+        return f'{etag[:-1]}-top{top}"', dumps(self._recent[:top])
+
+    async def cached_summary(self) -> Tuple[str, bytes]:
+        return await self.summary_cache.get()
+
+    async def invalidate(self) -> int:
+        await self.summary_cache.bump()
+        return await super().invalidate()
+
+    async def list_approved(self, limit: int = 100) -> List[dict]:
+        return await self.inner.list_approved(limit)
+
+    async def list_approved_page(self, cursor: Optional[str], limit: int) -> base.Page:
+        return await self.inner.list_approved_page(cursor, limit)
+
+    async def list_pending(self, limit: int = 100) -> List[dict]:
+        return await self.inner.list_pending(limit)
+
+    async def create(self, testimonial: dict) -> str:
+        return await self.inner.create(testimonial)
+
+    async def approve(self, testimonial_id: str) -> bool:
+        approved = await self.inner.approve(testimonial_id)
+        if approved:
+            await self.invalidate()
+        return approved
+
+    async def rating_summary(self) -> dict:
+        return await self.inner.rating_summary()
+
+    async def ensure_rating_summary(self) -> None:
+        await self.inner.ensure_rating_summary()
+
+
+class CachedGalleryRepository(_ReadThrough, base.GalleryRepository):
+    def __init__(
+        self,
+        inner: base.GalleryRepository,
+        versions: base.CacheVersionRepository,
+        reload_after: Optional[float] = None,
+    ):
+        self.inner = inner
+        self._init_cache("gallery", self._load, versions, reload_after=reload_after)
+
+    async def _load(self) -> List[dict]:
+        return [public_document(doc) for doc in await self.inner.list()]
+
+    async def list(self, limit: int = 100) -> List[dict]:
+        return await self.inner.list(limit)
+
+    async def create(self, image: dict) -> str:
+        image_id = await self.inner.create(image)
+        await self.invalidate()
+        return image_id
+
+    async def delete(self, image_id: str) -> bool:
+        deleted = await self.inner.delete(image_id)
+        if deleted:
+            await self.invalidate()
+        return deleted
+
+
+class ScheduledOfferRepository(_ReadThrough, base.OfferRepository):
+    """Publishes the offers live now from an in-memory snapshot.
+
+    The versioned cache holds the candidates (active, not yet ended); the
+    ``offer_schedule.LiveOffers`` snapshot narrows them to the current
+    window. A background task republishes at each window boundary, and a
+    request that arrives first republishes inline, so the snapshot never
+    lags a boundary. Mutations invalidate the candidates as usual.
+    """
+
+    def __init__(
+        self,
+        inner: base.OfferRepository,
+        versions: base.CacheVersionRepository,
+        reload_after: Optional[float] = None,
+    ):
+        self.inner = inner
+        self.live = offer_schedule.LiveOffers()
+        self._task: Optional[asyncio.Task] = None
+        self._init_cache("offers", self._load, versions, self.live.load, reload_after)
+
+    async def _load(self) -> List[dict]:
+        return [public_document(doc) for doc in await self.inner.list_active()]
+
+    async def cached(self) -> Tuple[str, bytes]:
+        await self.cache.get()
+        return self.live.current()
+
+    def seconds_until_change(self) -> Optional[float]:
+        return self.live.seconds_until_change()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                published = list(self.live.live_ids)
+                await self.cached()
+                if self.live.live_ids != published:
+                    logger.info("Live offers now %s", self.live.live_ids)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Refreshing live offers failed")
+            delay = self.seconds_until_change()
+            if delay is None or delay > offer_schedule.OFFER_REFRESH_SECONDS:
+                delay = offer_schedule.OFFER_REFRESH_SECONDS
+            await asyncio.sleep(max(delay, 0.05))
+
+    async def list_active(self, limit: int = 100) -> List[dict]:
+        return await self.inner.list_active(limit)
+
+    async def create(self, offer: dict) -> str:
+        offer_id = await self.inner.create(offer)
+        await self.invalidate()
+        return offer_id
+
+    async def update(self, offer_id: str, fields: dict) -> bool:
+        updated = await self.inner.update(offer_id, fields)
+        if updated:
+            await self.invalidate()
+        return updated
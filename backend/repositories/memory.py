@@ -0,0 +1,356 @@
+"""In-process repositories for tests and benchmarks (STORAGE_BACKEND=memory).
+
+Documents live in dicts keyed by ObjectId and are copied on the way in
+and out, so callers can mutate what they get back just as they would a
+Motor result. Nothing is shared between workers or survives a restart.
+"""
+from bson import ObjectId
+from copy import deepcopy
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from models import MenuCategory
+from pagination import decode_cursor, encode_cursor
+from . import base
+import booking_slots
+import uuid
+
+
+def _object_id(value) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+class _Collection:
+    """Documents keyed by ``_id``, in insertion order"""
+
+    def __init__(self):
+        self.docs: Dict[ObjectId, dict] = {}
+
+    def insert(self, doc: dict) -> ObjectId:
+        doc_id = doc.get("_id") or ObjectId()
+        # Motor sets _id on the inserted dict; do the same
+        doc["_id"] = doc_id
+        self.docs[doc_id] = deepcopy(doc)
+        return doc_id
+
+    def get(self, doc_id) -> Optional[dict]:
+        oid = _object_id(doc_id)
+        return self.docs.get(oid) if oid else None
+
+    def find(self, match: Callable[[dict], bool] = lambda doc: True) -> Iterable[dict]:
+        return (doc for doc in self.docs.values() if match(doc))
+
+    def find_one(self, match: Callable[[dict], bool]) -> Optional[dict]:
+        return next(iter(self.find(match)), None)
+
+    def list(self, match: Callable[[dict], bool] = lambda doc: True, limit: int = 100) -> List[dict]:
+        return [deepcopy(doc) for doc in list(self.find(match))[:limit]]
+
+    def page(self, match: Callable[[dict], bool], sort_field: str, cursor: Optional[str],
+             limit: int, exclude: Iterable[str] = ()) -> base.Page:
+        """Same (sort_field, _id) descending keyset paging as pagination.fetch_page"""
+        docs = sorted(self.find(match), key=lambda doc: (doc.get(sort_field), doc["_id"]), reverse=True)
+        if cursor:
+            after = decode_cursor(cursor)
+            docs = [doc for doc in docs if (doc.get(sort_field), doc["_id"]) < after]
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1].get(sort_field), docs[-1]["_id"])
+        return [
+            {key: deepcopy(value) for key, value in doc.items() if key not in exclude}
+            for doc in docs
+        ], next_cursor
+
+
+class MemoryCacheVersionRepository(base.CacheVersionRepository):
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+
+    async def get(self, name: str) -> int:
+        return self.versions.get(name, 0)
+
+    async def bump(self, name: str) -> int:
+        self.versions[name] = self.versions.get(name, 0) + 1
+        return self.versions[name]
+
+
+class MemoryUserRepository(base.UserRepository):
+    def __init__(self):
+        self.users = _Collection()
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        return deepcopy(self.users.find_one(lambda user: user.get("username") == username))
+
+    async def exists(self, username: str, email: str) -> bool:
+        return self.users.find_one(
+            lambda user: user.get("username") == username or user.get("email") == email
+        ) is not None
+
+    async def create(self, user: dict) -> str:
+        return str(self.users.insert(user))
+
+    async def set_password_hash(self, user_id, hashed_password: str) -> None:
+        user = self.users.get(user_id)
+        if user:
+            user["hashed_password"] = hashed_password
+
+
+class MemoryRestaurantRepository(base.RestaurantRepository):
+    def __init__(self):
+        self.info: Optional[dict] = None
+
+    async def get_info(self) -> Optional[dict]:
+        return deepcopy(self.info)
+
+    async def update_info(self, info: dict) -> None:
+        if self.info is None:
+            self.info = {"_id": ObjectId()}
+        self.info.update(deepcopy(info))
+
+
+class MemoryMenuRepository(base.MenuRepository):
+    def __init__(self):
+        self.categories = _Collection()
+        self.items: Dict[str, dict] = {}
+
+    async def list_categories(self, primary: bool = False) -> List[dict]:
+        categories = []
+        for category in self.categories.list():
+            category_id = str(category.pop("_id"))
+            items = [item for item in self.items.values() if item["category_id"] == category_id]
+            items.sort(key=lambda item: item.get("created_at") or datetime.min)
+            categories.append(MenuCategory(**category, id=category_id, items=deepcopy(items)).dict())
+        return categories
+
+    async def category_exists(self, category_id: str) -> bool:
+        return self.categories.get(category_id) is not None
+
+    async def create_category(self, category: dict, items: List[dict]) -> str:
+        category_id = str(self.categories.insert(category))
+        for item in items:
+            await self.create_item({**item, "id": str(uuid.uuid4()), "category_id": category_id})
+        return category_id
+
+    async def create_item(self, item: dict) -> None:
+        self.items[item["id"]] = deepcopy(item)
+
+    async def update_item(self, item_id: str, fields: dict) -> bool:
+        item = self.items.get(item_id)
+        if item is None:
+            return False
+        item.update(deepcopy(fields))
+        return True
+
+    async def delete_item(self, item_id: str) -> bool:
+        return self.items.pop(item_id, None) is not None
+
+
+class MemoryOrderRepository(base.OrderRepository):
+    def __init__(self):
+        self.orders = _Collection()
+        self._sequences: Dict[str, int] = {}
+
+    async def next_order_number(self) -> str:
+        day = datetime.utcnow().strftime("%Y%m%d")
+        self._sequences[day] = self._sequences.get(day, 0) + 1
+        return f"ORD{day}-{self._sequences[day]:04d}"
+
+    async def create(self, order: dict) -> str:
+        return str(self.orders.insert(order))
+
+    async def get(self, order_id: str) -> Optional[dict]:
+        return deepcopy(self.orders.get(order_id))
+
+    async def list_page(self, cursor, limit, summary=False, order_status=None, payment_status=None,
+                        delivery_type=None, date_from=None, date_to=None) -> base.Page:
+        def match(order: dict) -> bool:
+            return (
+                (not order_status or order.get("order_status") == order_status)
+                and (not payment_status or order.get("payment_status") == payment_status)
+                and (not delivery_type or order.get("delivery_type") == delivery_type)
+                and (not date_from or order["created_at"] >= date_from)
+                and (not date_to or order["created_at"] < date_to)
+            )
+        exclude = base.ORDER_SUMMARY_FIELDS if summary else ()
+        return self.orders.page(match, "created_at", cursor, limit, exclude)
+
+    async def set_status(self, order_id: str, status: str) -> Optional[dict]:
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        before = deepcopy(order)
+        order.update(order_status=status, updated_at=datetime.utcnow())
+        return before
+
+    def mark_paid(self, order_id: str, payment_id: str) -> None:
+        order = self.orders.get(order_id)
+        if order and order.get("payment_status") != "completed":
+            order.update(payment_status="completed", payment_id=payment_id, updated_at=datetime.utcnow())
+
+
+class MemoryBookingRepository(base.BookingRepository):
+    def __init__(self):
+        self.bookings = _Collection()
+        self.slots: Dict[str, dict] = {}
+
+    def _slot(self, date: str, slot: str) -> dict:
+        key = booking_slots.slot_key(date, slot)
+        if key not in self.slots:
+            self.slots[key] = {
+                "date": date, "slot": slot, "capacity": booking_slots.BOOKING_SLOT_COVERS, "booked": 0
+            }
+        return self.slots[key]
+
+    async def reserve(self, date: str, slot: str, guests: int) -> str:
+        counter = self._slot(date, slot)
+        if counter["booked"] + guests > counter["capacity"]:
+            raise booking_slots.SlotFull(f"Not enough seats left at {slot} on {date}")
+        counter["booked"] += guests
+        return booking_slots.slot_key(date, slot)
+
+    async def release(self, key: str, guests: int) -> None:
+        counter = self.slots.get(key)
+        if counter and counter["booked"] >= guests:
+            counter["booked"] -= guests
+
+    async def set_capacity(self, date: str, slot: str, capacity: int) -> None:
+        self._slot(date, slot)["capacity"] = capacity
+
+    async def availability(self, date: str) -> List[dict]:
+        counters = {counter["slot"]: counter for counter in self.slots.values() if counter["date"] == date}
+        return booking_slots.slot_availability(counters)
+
+    async def create(self, booking: dict) -> str:
+        return str(self.bookings.insert(booking))
+
+    async def get(self, booking_id: str) -> Optional[dict]:
+        return deepcopy(self.bookings.get(booking_id))
+
+    async def list_page(self, cursor, limit, summary=False, status=None,
+                        date_from=None, date_to=None) -> base.Page:
+        def match(booking: dict) -> bool:
+            return (
+                (not status or booking.get("status") == status)
+                and (not date_from or booking["date"] >= date_from)
+                and (not date_to or booking["date"] <= date_to)
+            )
+        exclude = base.BOOKING_SUMMARY_FIELDS if summary else ()
+        return self.bookings.page(match, "date", cursor, limit, exclude)
+
+    async def set_status_if(self, booking_id: str, expected: Optional[str], status: str) -> bool:
+        booking = self.bookings.get(booking_id)
+        if booking is None or booking.get("status") != expected:
+            return False
+        booking.update(status=status, updated_at=datetime.utcnow())
+        return True
+
+
+class MemoryPaymentRepository(base.PaymentRepository):
+    def __init__(self, orders: MemoryOrderRepository):
+        self.payments = _Collection()
+        self.orders = orders
+
+    async def create(self, payment_order: dict) -> str:
+        return str(self.payments.insert(payment_order))
+
+    def _find(self, razorpay_order_id: str) -> Optional[dict]:
+        return self.payments.find_one(lambda doc: doc.get("razorpay_order_id") == razorpay_order_id)
+
+    async def get(self, razorpay_order_id: str) -> Optional[dict]:
+        return deepcopy(self._find(razorpay_order_id))
+
+    async def link_order_if(self, razorpay_order_id: str, expected: Optional[str], order_id: str) -> bool:
+        payment = self._find(razorpay_order_id)
+        if payment is None or payment.get("order_id") != expected:
+            return False
+        payment["order_id"] = order_id
+        return True
+
+    async def complete(self, razorpay_order_id: str, payment_id: str) -> Optional[dict]:
+        payment = self._find(razorpay_order_id)
+        if payment is None:
+            return None
+        before = deepcopy(payment)
+        payment.update(status="completed", razorpay_payment_id=payment_id, completed_at=datetime.utcnow())
+        if payment.get("order_id"):
+            self.orders.mark_paid(payment["order_id"], payment_id)
+        return before
+
+
+class MemoryTestimonialRepository(base.TestimonialRepository):
+    def __init__(self):
+        self.testimonials = _Collection()
+        self.histogram: Dict[str, int] = {}
+
+    async def list_approved(self, limit: int = 100) -> List[dict]:
+        docs, _ = await self.list_approved_page(None, limit)
+        return docs
+
+    async def list_approved_page(self, cursor: Optional[str], limit: int) -> base.Page:
+        return self.testimonials.page(
+            lambda doc: doc.get("approved") is True, "created_at", cursor, limit, exclude=("approved",)
+        )
+
+    async def list_pending(self, limit: int = 100) -> List[dict]:
+        return self.testimonials.list(lambda doc: doc.get("approved") is False, limit)
+
+    async def create(self, testimonial: dict) -> str:
+        return str(self.testimonials.insert(testimonial))
+
+    async def approve(self, testimonial_id: str) -> bool:
+        testimonial = self.testimonials.get(testimonial_id)
+        if testimonial is None or testimonial.get("approved") is True:
+            return False
+        testimonial["approved"] = True
+        rating = str(base.clamp_rating(testimonial.get("rating")))
+        self.histogram[rating] = self.histogram.get(rating, 0) + 1
+        return True
+
+    async def rating_summary(self) -> dict:
+        count = sum(self.histogram.values())
+        total = sum(int(rating) * n for rating, n in self.histogram.items())
+        return base.rating_summary(count, total, self.histogram)
+
+    async def ensure_rating_summary(self) -> None:
+        # Maintained by approve() from the start
+        pass
+
+
+class MemoryGalleryRepository(base.GalleryRepository):
+    def __init__(self):
+        self.images = _Collection()
+
+    async def list(self, limit: int = 100) -> List[dict]:
+        return self.images.list(limit=limit)
+
+    async def create(self, image: dict) -> str:
+        return str(self.images.insert(image))
+
+    async def delete(self, image_id: str) -> bool:
+        oid = _object_id(image_id)
+        return bool(oid) and self.images.docs.pop(oid, None) is not None
+
+
+class MemoryOfferRepository(base.OfferRepository):
+    def __init__(self):
+        self.offers = _Collection()
+
+    async def list_active(self, limit: int = 100) -> List[dict]:
+        now = datetime.utcnow()
+        return self.offers.list(
+            lambda doc: doc.get("active") is True and (doc.get("ends_at") is None or doc["ends_at"] > now), limit
+        )
+
+    async def create(self, offer: dict) -> str:
+        return str(self.offers.insert(offer))
+
+    async def update(self, offer_id: str, fields: dict) -> bool:
+        offer = self.offers.get(offer_id)
+        if offer is None:
+            return False
+        changed = any(offer.get(field) != value for field, value in fields.items())
+        offer.update(deepcopy(fields))
+        return changed
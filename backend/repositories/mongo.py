@@ -0,0 +1,433 @@
+"""Motor-backed repositories (the production storage).
+
+Catalog repositories take ``reads``, the database handle with the catalog
+read preference (mongo_settings.catalog_database), and use it only for the
+public queries behind the read-through caches. Writes, admin reads and
+everything else stay on ``db`` and so on the primary.
+"""
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument
+from typing import List, Optional
+from models import MenuCategory
+from order_numbers import order_number_allocator
+from pagination import fetch_page
+from payment_store import complete_payment, supports_transactions
+from . import base
+import booking_slots
+import logging
+import sales_rollups
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def _object_id(value) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+def _summary_projection(summary: bool, fields) -> Optional[dict]:
+    return {field: 0 for field in fields} if summary else None
+
+
+class MongoCacheVersionRepository(base.CacheVersionRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, name: str) -> int:
+        doc = await self.db.cache_versions.find_one({"_id": name})
+        return doc["version"] if doc else 0
+
+    async def bump(self, name: str) -> int:
+        doc = await self.db.cache_versions.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"]
+
+
+class MongoUserRepository(base.UserRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        return await self.db.users.find_one({"username": username})
+
+    async def exists(self, username: str, email: str) -> bool:
+        found = await self.db.users.find_one(
+            {"$or": [{"username": username}, {"email": email}]}, {"_id": 1}
+        )
+        return found is not None
+
+    async def create(self, user: dict) -> str:
+        result = await self.db.users.insert_one(user)
+        return str(result.inserted_id)
+
+    async def set_password_hash(self, user_id, hashed_password: str) -> None:
+        await self.db.users.update_one({"_id": user_id}, {"$set": {"hashed_password": hashed_password}})
+
+
+class MongoRestaurantRepository(base.RestaurantRepository):
+    def __init__(self, db, reads=None):
+        self.db = db
+        self.reads = db if reads is None else reads
+
+    async def get_info(self) -> Optional[dict]:
+        return await self.reads.restaurant_info.find_one()
+
+    async def update_info(self, info: dict) -> None:
+        await self.db.restaurant_info.update_one({}, {"$set": info}, upsert=True)
+
+
+class MongoMenuRepository(base.MenuRepository):
+    def __init__(self, db, reads=None):
+        self.db = db
+        self.reads = db if reads is None else reads
+
+    async def list_categories(self, primary: bool = False) -> List[dict]:
+        # One round trip: categories joined with their rows in menu_items
+        source = self.db if primary else self.reads
+        categories = await source.menu_categories.aggregate([
+            {"$limit": 100},
+            {"$addFields": {"id": {"$toString": "$_id"}}},
+            {"$lookup": {
+                "from": "menu_items",
+                "localField": "id",
+                "foreignField": "category_id",
+                "as": "collection_items"
+            }},
+            {"$project": {"_id": 0}}
+        ]).to_list(100)
+
+        for category in categories:
+            # Items still embedded in the category (not yet migrated) are merged
+            # in; the menu_items copy wins if an item exists in both places
+            items = {item["id"]: item for item in category.get("items", []) if item.get("id")}
+            for item in category.pop("collection_items"):
+                item.pop("_id", None)
+                items[item["id"]] = item
+            category["items"] = sorted(items.values(), key=lambda item: item.get("created_at") or datetime.min)
+        return [MenuCategory(**category).dict() for category in categories]
+
+    async def category_exists(self, category_id: str) -> bool:
+        oid = _object_id(category_id)
+        return bool(oid) and await self.db.menu_categories.find_one({"_id": oid}, {"_id": 1}) is not None
+
+    async def create_category(self, category: dict, items: List[dict]) -> str:
+        result = await self.db.menu_categories.insert_one(category)
+        category_id = str(result.inserted_id)
+        if items:
+            await self.db.menu_items.insert_many([
+                {**item, "id": str(uuid.uuid4()), "category_id": category_id} for item in items
+            ])
+        return category_id
+
+    async def create_item(self, item: dict) -> None:
+        await self.db.menu_items.insert_one(item)
+
+    async def update_item(self, item_id: str, fields: dict) -> bool:
+        result = await self.db.menu_items.update_one({"id": item_id}, {"$set": fields})
+        if result.matched_count == 0:
+            # Item not migrated out of its category yet
+            result = await self.db.menu_categories.update_one(
+                {"items.id": item_id},
+                {"$set": {f"items.$.{field}": value for field, value in fields.items()}}
+            )
+        return result.matched_count > 0
+
+    async def delete_item(self, item_id: str) -> bool:
+        result = await self.db.menu_items.delete_one({"id": item_id})
+        # Also clear any copy still embedded in its category
+        legacy = await self.db.menu_categories.update_one(
+            {"items.id": item_id},
+            {"$pull": {"items": {"id": item_id}}}
+        )
+        return result.deleted_count > 0 or legacy.modified_count > 0
+
+
+class MongoOrderRepository(base.OrderRepository):
+    """Orders, keeping the sales rollups in step with every change"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def next_order_number(self) -> str:
+        return await order_number_allocator.allocate(self.db)
+
+    async def create(self, order: dict) -> str:
+        result = await self.db.orders.insert_one(order)
+        await sales_rollups.record_order(self.db, order)
+        return str(result.inserted_id)
+
+    async def get(self, order_id: str) -> Optional[dict]:
+        oid = _object_id(order_id)
+        return await self.db.orders.find_one({"_id": oid}) if oid else None
+
+    async def list_page(self, cursor, limit, summary=False, order_status=None, payment_status=None,
+                        delivery_type=None, date_from=None, date_to=None) -> base.Page:
+        query = {}
+        if order_status:
+            query["order_status"] = order_status
+        if payment_status:
+            query["payment_status"] = payment_status
+        if delivery_type:
+            query["delivery_type"] = delivery_type
+        if date_from or date_to:
+            query["created_at"] = {}
+            if date_from:
+                query["created_at"]["$gte"] = date_from
+            if date_to:
+                query["created_at"]["$lt"] = date_to
+        return await fetch_page(
+            self.db.orders, query, "created_at", cursor, limit,
+            _summary_projection(summary, base.ORDER_SUMMARY_FIELDS)
+        )
+
+    async def set_status(self, order_id: str, status: str) -> Optional[dict]:
+        oid = _object_id(order_id)
+        if not oid:
+            return None
+        before = await self.db.orders.find_one_and_update(
+            {"_id": oid},
+            {"$set": {"order_status": status, "updated_at": datetime.utcnow()}},
+            projection={"order_status": 1, "created_at": 1, "total_amount": 1, "items": 1, "delivery_type": 1}
+        )
+        if before:
+            was_cancelled = before.get("order_status") == "cancelled"
+            if was_cancelled != (status == "cancelled"):
+                await sales_rollups.record_cancellation(self.db, before, cancelled=not was_cancelled)
+        return before
+
+
+class MongoBookingRepository(base.BookingRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def reserve(self, date: str, slot: str, guests: int) -> str:
+        return await booking_slots.reserve(self.db, date, slot, guests)
+
+    async def release(self, key: str, guests: int) -> None:
+        await booking_slots.release(self.db, key, guests)
+
+    async def set_capacity(self, date: str, slot: str, capacity: int) -> None:
+        await booking_slots.set_capacity(self.db, date, slot, capacity)
+
+    async def availability(self, date: str) -> List[dict]:
+        return await booking_slots.availability(self.db, date)
+
+    async def create(self, booking: dict) -> str:
+        result = await self.db.bookings.insert_one(booking)
+        return str(result.inserted_id)
+
+    async def get(self, booking_id: str) -> Optional[dict]:
+        oid = _object_id(booking_id)
+        return await self.db.bookings.find_one({"_id": oid}) if oid else None
+
+    async def list_page(self, cursor, limit, summary=False, status=None,
+                        date_from=None, date_to=None) -> base.Page:
+        # Booking dates are stored as YYYY-MM-DD strings, which compare correctly
+        query = {}
+        if status:
+            query["status"] = status
+        if date_from or date_to:
+            query["date"] = {}
+            if date_from:
+                query["date"]["$gte"] = date_from
+            if date_to:
+                query["date"]["$lte"] = date_to
+        return await fetch_page(
+            self.db.bookings, query, "date", cursor, limit,
+            _summary_projection(summary, base.BOOKING_SUMMARY_FIELDS)
+        )
+
+    async def set_status_if(self, booking_id: str, expected: Optional[str], status: str) -> bool:
+        oid = _object_id(booking_id)
+        if not oid:
+            return False
+        result = await self.db.bookings.update_one(
+            {"_id": oid, "status": expected},
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+
+class MongoPaymentRepository(base.PaymentRepository):
+    def __init__(self, db, client):
+        self.db = db
+        self.client = client
+
+    async def create(self, payment_order: dict) -> str:
+        result = await self.db.payment_orders.insert_one(payment_order)
+        return str(result.inserted_id)
+
+    async def get(self, razorpay_order_id: str) -> Optional[dict]:
+        return await self.db.payment_orders.find_one({"razorpay_order_id": razorpay_order_id})
+
+    async def link_order_if(self, razorpay_order_id: str, expected: Optional[str], order_id: str) -> bool:
+        result = await self.db.payment_orders.update_one(
+            {"razorpay_order_id": razorpay_order_id, "order_id": expected},
+            {"$set": {"order_id": order_id}}
+        )
+        return result.matched_count > 0
+
+    async def complete(self, razorpay_order_id: str, payment_id: str) -> Optional[dict]:
+        return await complete_payment(self.client, self.db, razorpay_order_id, payment_id)
+
+
+class MongoTestimonialRepository(base.TestimonialRepository):
+    """Testimonials plus the rating summary in testimonial_stats.
+
+    An approval and its summary increment are one transaction on a replica
+    set; on a standalone server the summary is recomputed if the increment
+    fails after the approval was written.
+    """
+
+    SUMMARY_ID = "ratings"
+
+    def __init__(self, db, reads=None, client=None):
+        self.db = db
+        self.reads = db if reads is None else reads
+        self.client = client
+
+    async def list_approved(self, limit: int = 100) -> List[dict]:
+        docs, _ = await self.list_approved_page(None, limit)
+        return docs
+
+    async def list_approved_page(self, cursor: Optional[str], limit: int) -> base.Page:
+        return await fetch_page(self.reads.testimonials, {"approved": True}, "created_at", cursor, limit, {"approved": 0})
+
+    async def list_pending(self, limit: int = 100) -> List[dict]:
+        return await self.db.testimonials.find({"approved": False}).to_list(limit)
+
+    async def create(self, testimonial: dict) -> str:
+        result = await self.db.testimonials.insert_one(testimonial)
+        return str(result.inserted_id)
+
+    async def approve(self, testimonial_id: str) -> bool:
+        oid = _object_id(testimonial_id)
+        if not oid:
+            return False
+        if self.client is not None and await supports_transactions(self.db):
+            async with await self.client.start_session() as session:
+                return await session.with_transaction(lambda s: self._approve(oid, s))
+
+        rating = await self._flip(oid)
+        if rating is None:
+            return False
+        try:
+            await self._count(rating)
+        except Exception:
+            logger.exception("Rating summary update failed; recomputing it from the testimonials")
+            await self._write_summary(await self._summarize(), replace=True)
+        return True
+
+    async def _approve(self, oid: ObjectId, session) -> bool:
+        rating = await self._flip(oid, session)
+        if rating is None:
+            return False
+        await self._count(rating, session)
+        return True
+
+    async def _flip(self, oid: ObjectId, session=None) -> Optional[int]:
+        """Approve the testimonial; returns its rating only if this call approved it"""
+        approved = await self.db.testimonials.find_one_and_update(
+            {"_id": oid, "approved": {"$ne": True}},
+            {"$set": {"approved": True}},
+            projection={"rating": 1},
+            session=session
+        )
+        return base.clamp_rating(approved.get("rating")) if approved else None
+
+    async def _count(self, rating: int, session=None) -> None:
+        await self.db.testimonial_stats.update_one(
+            {"_id": self.SUMMARY_ID},
+            [
+                {"$set": {
+                    "count": {"$add": [{"$ifNull": ["$count", 0]}, 1]},
+                    "total": {"$add": [{"$ifNull": ["$total", 0]}, rating]},
+                    f"histogram.{rating}": {"$add": [{"$ifNull": [f"$histogram.{rating}", 0]}, 1]},
+                    "updated_at": datetime.utcnow(),
+                }},
+                {"$set": {"average": {"$divide": ["$total", "$count"]}}},
+            ],
+            upsert=True,
+            session=session
+        )
+
+    async def rating_summary(self) -> dict:
+        doc = await self.reads.testimonial_stats.find_one({"_id": self.SUMMARY_ID}) or {}
+        return base.rating_summary(doc.get("count", 0), doc.get("total", 0), doc.get("histogram", {}))
+
+    async def ensure_rating_summary(self) -> None:
+        if await self.db.testimonial_stats.find_one({"_id": self.SUMMARY_ID}, {"_id": 1}):
+            return
+        # An approval that created the document meanwhile wins
+        await self._write_summary(await self._summarize(), replace=False)
+
+    async def _summarize(self) -> dict:
+        """The rating summary document, computed from the approved testimonials"""
+        histogram = {}
+        async for group in self.db.testimonials.aggregate([
+            {"$match": {"approved": True}},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}},
+        ]):
+            rating = str(base.clamp_rating(group["_id"]))
+            histogram[rating] = histogram.get(rating, 0) + group["count"]
+        count = sum(histogram.values())
+        total = sum(int(rating) * n for rating, n in histogram.items())
+        return {
+            "count": count,
+            "total": total,
+            "average": total / count if count else None,
+            "histogram": histogram,
+            "updated_at": datetime.utcnow(),
+        }
+
+    async def _write_summary(self, summary: dict, replace: bool) -> None:
+        update = {"$set": summary} if replace else {"$setOnInsert": summary}
+        await self.db.testimonial_stats.update_one({"_id": self.SUMMARY_ID}, update, upsert=True)
+
+
+class MongoGalleryRepository(base.GalleryRepository):
+    def __init__(self, db, reads=None):
+        self.db = db
+        self.reads = db if reads is None else reads
+
+    async def list(self, limit: int = 100) -> List[dict]:
+        return await self.reads.gallery.find().to_list(limit)
+
+    async def create(self, image: dict) -> str:
+        result = await self.db.gallery.insert_one(image)
+        return str(result.inserted_id)
+
+    async def delete(self, image_id: str) -> bool:
+        oid = _object_id(image_id)
+        if not oid:
+            return False
+        result = await self.db.gallery.delete_one({"_id": oid})
+        return result.deleted_count > 0
+
+
+class MongoOfferRepository(base.OfferRepository):
+    def __init__(self, db, reads=None):
+        self.db = db
+        self.reads = db if reads is None else reads
+
+    async def list_active(self, limit: int = 100) -> List[dict]:
+        query = {"active": True, "$or": [{"ends_at": None}, {"ends_at": {"$gt": datetime.utcnow()}}]}
+        return await self.reads.special_offers.find(query).to_list(limit)
+
+    async def create(self, offer: dict) -> str:
+        result = await self.db.special_offers.insert_one(offer)
+        return str(result.inserted_id)
+
+    async def update(self, offer_id: str, fields: dict) -> bool:
+        oid = _object_id(offer_id)
+        if not oid:
+            return False
+        result = await self.db.special_offers.update_one({"_id": oid}, {"$set": fields})
+        return result.modified_count > 0
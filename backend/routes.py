@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
 from typing import List, Optional
 from models import (
     MenuItem, MenuCategory, Order, OrderCreate, Booking, BookingCreate,
@@ -6,31 +6,73 @@ from models import (
     User, UserLogin, UserCreate, PaymentOrder, PaymentVerification,
     RestaurantInfo
 )
-from auth import get_password_hash, verify_password, create_access_token, decode_access_token
+from auth import (
+    create_access_token, decode_access_token,
+    get_password_hash_async, verify_password_async, PasswordHasherBusy
+)
+from cache import etag_matches, principal_cache
+from metrics import principal_cache_hits, principal_cache_misses
+from http_cache import public_cache_control
+from offer_schedule import offer_window, OfferWindowError
+from pagination import NEXT_CURSOR_HEADER
+from serialization import FastJSONResponse, encode_documents, public_document
+from pricing import price_index, PricingError
+from events import publish_order_event, ORDER_CREATED, ORDER_STATUS_CHANGED
+from repositories import get_repositories
+from repositories.caching import RECENT_TESTIMONIALS
+import booking_slots
+import images
 from datetime import datetime
 import uuid
 import os
 
 router = APIRouter()
 
-# Dependency to get database
+# Dependency to get database (routes outside the repository layer)
 def get_db():
     from server import db
     return db
 
+async def resolve_image_field(db, model, width: int) -> None:
+    """Swap inline or uploaded images on a menu item / gallery entry for a derivative URL"""
+    try:
+        model.image = await images.resolve_image(db, model.image, model.image_id, width)
+    except images.ImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except images.ImageProcessingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def cached_json(payload, if_none_match: Optional[str], cache_control: Optional[str] = None):
+    """Serve ``(etag, body)`` from a read-through cache, or 304 if the client has it"""
+    etag, body = payload
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(content=body, headers=headers)
+
 # Dependency to verify admin token
 async def verify_admin(authorization: Optional[str] = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
     
     token = authorization.replace("Bearer ", "")
-    payload = decode_access_token(token)
-    
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    db = get_db()
-    user = await db.users.find_one({"username": payload.get("sub")})
+    await principal_cache.sync(get_repositories().versions)
+    user = principal_cache.get(token)
+    (principal_cache_misses if user is None else principal_cache_hits).inc()
+
+    if user is None:
+        payload = decode_access_token(token)
+
+        # Scoped tokens (e.g. stream tokens) are not admin credentials
+        if not payload or payload.get("scope"):
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        user = await get_repositories().users.get_by_username(payload.get("sub"))
+
+        if user:
+            principal_cache.put(token, user, payload.get("exp"))
     
     if not user or not user.get("is_admin"):
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -41,32 +83,48 @@ async def verify_admin(authorization: Optional[str] = Header(None)):
 
 @router.post("/auth/register")
 async def register(user_data: UserCreate):
-    db = get_db()
+    repos = get_repositories()
     
     # Check if user exists
-    existing_user = await db.users.find_one({"$or": [{"username": user_data.username}, {"email": user_data.email}]})
-    if existing_user:
+    if await repos.users.exists(user_data.username, user_data.email):
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
     # Create user
     user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=hashed_password,
         is_admin=False
     )
     
-    result = await db.users.insert_one(user.dict(exclude={"id"}))
+    user_id = await repos.users.create(user.dict(exclude={"id"}))
     
-    return {"message": "User created successfully", "user_id": str(result.inserted_id)}
+    return {"message": "User created successfully", "user_id": user_id}
 
 @router.post("/auth/login")
 async def login(credentials: UserLogin):
-    db = get_db()
+    repos = get_repositories()
     
-    user = await db.users.find_one({"username": credentials.username})
-    if not user or not verify_password(credentials.password, user["hashed_password"]):
+    user = await repos.users.get_by_username(credentials.username)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    try:
+        valid, new_hash = await verify_password_async(credentials.password, user["hashed_password"])
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Transparently upgrade hashes created with an outdated cost factor
+    if new_hash:
+        await repos.users.set_password_hash(user["_id"], new_hash)
     
     access_token = create_access_token(data={"sub": user["username"], "is_admin": user.get("is_admin", False)})
     
@@ -80,65 +138,55 @@ async def login(credentials: UserLogin):
 # ============= RESTAURANT INFO ROUTES =============
 
 @router.get("/restaurant/info")
-async def get_restaurant_info():
-    db = get_db()
-    info = await db.restaurant_info.find_one()
-    if info:
-        info["_id"] = str(info["_id"])
-    return info
+async def get_restaurant_info(if_none_match: Optional[str] = Header(None)):
+    return cached_json(await get_repositories().restaurant.cached(), if_none_match)
 
 @router.put("/restaurant/info", dependencies=[Depends(verify_admin)])
 async def update_restaurant_info(info: RestaurantInfo):
-    db = get_db()
-    await db.restaurant_info.update_one(
-        {},
-        {"$set": info.dict()},
-        upsert=True
-    )
+    await get_repositories().restaurant.update_info(info.dict())
     return {"message": "Restaurant info updated"}
 
 # ============= MENU ROUTES =============
 
 @router.get("/menu/categories", response_model=List[MenuCategory])
-async def get_menu_categories():
-    db = get_db()
-    categories = await db.menu_categories.find().to_list(100)
-    for category in categories:
-        category["id"] = str(category["_id"])
-        category.pop("_id", None)
-    return categories
+async def get_menu_categories(if_none_match: Optional[str] = Header(None)):
+    # Always revalidated: prices shown must match what checkout charges
+    return cached_json(await get_repositories().menu.cached(), if_none_match, "no-cache")
 
 @router.post("/menu/category", dependencies=[Depends(verify_admin)])
 async def create_menu_category(category: MenuCategory):
-    db = get_db()
-    result = await db.menu_categories.insert_one(category.dict(exclude={"id"}))
-    return {"message": "Category created", "id": str(result.inserted_id)}
+    category_id = await get_repositories().menu.create_category(
+        category.dict(exclude={"id", "items"}),
+        [item.dict(exclude={"id"}) for item in category.items]
+    )
+    return {"message": "Category created", "id": category_id}
 
 @router.post("/menu/item", dependencies=[Depends(verify_admin)])
 async def create_menu_item(item: MenuItem, category_id: str):
     db = get_db()
-    from bson import ObjectId
+    menu = get_repositories().menu
     
+    await resolve_image_field(db, item, images.MENU_IMAGE_WIDTH)
+
     # 1. Convert the Pydantic model to a dictionary
     item_dict = item.dict(exclude={"id"})
     
     # 2. Generate a unique ID for the item
     item_dict["id"] = str(uuid.uuid4())
     
-    # 3. Ensure the category_id is stored with the item if needed
+    # 3. Link the item to its category
     item_dict["category_id"] = category_id
     
-    # 4. Update the category document by pushing the item into the 'items' list
+    # 4. Store the item in its own collection
     try:
-        result = await db.menu_categories.update_one(
-            {"_id": ObjectId(category_id)},
-            {"$push": {"items": item_dict}}
-        )
-        
-        if result.matched_count == 0:
+        if not await menu.category_exists(category_id):
             raise HTTPException(status_code=404, detail="Category not found")
-            
+
+        await menu.create_item(item_dict)
+
         return {"message": "Item created successfully", "id": item_dict["id"]}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -146,30 +194,18 @@ async def create_menu_item(item: MenuItem, category_id: str):
 async def update_menu_item(item_id: str, item: MenuItem):
     db = get_db()
     
-    item_dict = item.dict(exclude={"id"})
+    await resolve_image_field(db, item, images.MENU_IMAGE_WIDTH)
+    item_dict = item.dict(exclude={"id", "created_at"})
     item_dict["updated_at"] = datetime.utcnow()
     
-    # Use the $ positional operator to update the specific item in the array
-    result = await db.menu_categories.update_one(
-        {"items.id": item_id},
-        {"$set": {"items.$": {**item_dict, "id": item_id}}}
-    )
-    
-    if result.matched_count == 0:
+    if not await get_repositories().menu.update_item(item_id, item_dict):
         raise HTTPException(status_code=404, detail="Item not found")
     
     return {"message": "Item updated successfully"}
 
 @router.delete("/menu/item/{item_id}", dependencies=[Depends(verify_admin)])
 async def delete_menu_item(item_id: str):
-    db = get_db()
-    
-    result = await db.menu_categories.update_one(
-        {"items.id": item_id},
-        {"$pull": {"items": {"id": item_id}}}
-    )
-    
-    if result.modified_count == 0:
+    if not await get_repositories().menu.delete_item(item_id):
         raise HTTPException(status_code=404, detail="Item not found")
     
     return {"message": "Item deleted"}
@@ -179,139 +215,230 @@ async def delete_menu_item(item_id: str):
 @router.post("/orders", response_model=dict)
 async def create_order(order_data: OrderCreate):
     db = get_db()
-    
+    repos = get_repositories()
+
+    # Never trust client prices: refresh the price index if the menu moved,
+    # then recompute every line and the total from it
+    await repos.menu.prices()
+    try:
+        items, total_amount = price_index.price_items(order_data.items)
+    except PricingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     order = Order(
-        order_number=f"ORD{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-        **order_data.dict()
+        order_number=await repos.orders.next_order_number(),
+        **order_data.dict(exclude={"items", "total_amount"}),
+        items=items,
+        total_amount=total_amount
     )
     
-    result = await db.orders.insert_one(order.dict(exclude={"id"}))
-    order_id = str(result.inserted_id)
+    order_id = await repos.orders.create(order.dict(exclude={"id"}))
+
+    await publish_order_event(db, ORDER_CREATED, {
+        "order_id": order_id,
+        "order_number": order.order_number,
+        "customer_name": order.customer_name,
+        "items": [item.dict() for item in order.items],
+        "total_amount": order.total_amount,
+        "delivery_type": order.delivery_type,
+        "order_status": order.order_status,
+        "payment_status": order.payment_status,
+        "special_instructions": order.special_instructions,
+        "created_at": order.created_at
+    })
     
     return {
         "message": "Order created successfully",
         "order_id": order_id,
-        "order_number": order.order_number
+        "order_number": order.order_number,
+        "total_amount": order.total_amount
     }
 
 @router.get("/orders", dependencies=[Depends(verify_admin)])
-async def get_all_orders():
-    db = get_db()
-    orders = await db.orders.find().sort("created_at", -1).to_list(1000)
-    for order in orders:
-        order["id"] = str(order["_id"])
-        order.pop("_id", None)
-    return orders
+async def get_all_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    order_status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    delivery_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    view: str = Query("full", regex="^(full|summary)$")
+):
+    try:
+        orders, next_cursor = await get_repositories().orders.list_page(
+            cursor, limit, summary=view == "summary",
+            order_status=order_status, payment_status=payment_status, delivery_type=delivery_type,
+            date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(content=encode_documents(orders), headers=headers)
 
 @router.get("/orders/{order_id}")
 async def get_order(order_id: str):
-    db = get_db()
-    from bson import ObjectId
-    
-    order = await db.orders.find_one({"_id": ObjectId(order_id)})
+    order = await get_repositories().orders.get(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    order["id"] = str(order["_id"])
-    order.pop("_id", None)
-    return order
+    return FastJSONResponse(content=public_document(order))
 
 @router.put("/orders/{order_id}/status", dependencies=[Depends(verify_admin)])
 async def update_order_status(order_id: str, status: str):
     db = get_db()
-    from bson import ObjectId
-    
-    result = await db.orders.update_one(
-        {"_id": ObjectId(order_id)},
-        {"$set": {"order_status": status, "updated_at": datetime.utcnow()}}
-    )
     
-    if result.modified_count == 0:
+    if not await get_repositories().orders.set_status(order_id, status):
         raise HTTPException(status_code=404, detail="Order not found")
     
+    await publish_order_event(db, ORDER_STATUS_CHANGED, {"order_id": order_id, "order_status": status})
     return {"message": "Order status updated"}
 
 # ============= BOOKING ROUTES =============
 
 @router.post("/bookings")
 async def create_booking(booking_data: BookingCreate):
-    db = get_db()
-    
-    booking = Booking(**booking_data.dict())
-    result = await db.bookings.insert_one(booking.dict(exclude={"id"}))
+    bookings = get_repositories().bookings
+
+    if booking_data.guests < 1:
+        raise HTTPException(status_code=400, detail="At least one guest is required")
+    try:
+        date = booking_slots.validate_date(booking_data.date)
+        slot = booking_slots.slot_for(booking_data.time)
+        key = await bookings.reserve(date, slot, booking_data.guests)
+    except booking_slots.SlotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except booking_slots.SlotFull as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    booking = Booking(**booking_data.dict(), slot_key=key)
+    try:
+        booking_id = await bookings.create(booking.dict(exclude={"id"}))
+    except Exception:
+        await bookings.release(key, booking.guests)
+        raise
     
     return {
         "message": "Booking created successfully",
-        "booking_id": str(result.inserted_id)
+        "booking_id": booking_id
     }
 
 @router.get("/bookings", dependencies=[Depends(verify_admin)])
-async def get_all_bookings():
-    db = get_db()
-    bookings = await db.bookings.find().sort("date", -1).to_list(1000)
-    for booking in bookings:
-        booking["id"] = str(booking["_id"])
-        booking.pop("_id", None)
-    return bookings
+async def get_all_bookings(
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    view: str = Query("full", regex="^(full|summary)$")
+):
+    try:
+        bookings, next_cursor = await get_repositories().bookings.list_page(
+            cursor, limit, summary=view == "summary", status=status, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(content=encode_documents(bookings), headers=headers)
 
 @router.put("/bookings/{booking_id}/status", dependencies=[Depends(verify_admin)])
 async def update_booking_status(booking_id: str, status: str):
-    db = get_db()
-    from bson import ObjectId
-    
-    result = await db.bookings.update_one(
-        {"_id": ObjectId(booking_id)},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
-    )
+    bookings = get_repositories().bookings
     
-    if result.modified_count == 0:
+    booking = await bookings.get(booking_id)
+    if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
+
+    # Bookings made before slot tracking hold no covers
+    key = booking.get("slot_key")
+    was_cancelled = booking.get("status") == "cancelled"
+    now_cancelled = status == "cancelled"
+
+    if key and was_cancelled and not now_cancelled:
+        try:
+            await bookings.reserve(booking["date"], key.split("|")[1], booking["guests"])
+        except booking_slots.SlotFull as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    # Only apply the change if nobody else changed the status meanwhile, so
+    # covers are never released or taken twice
+    if not await bookings.set_status_if(booking_id, booking.get("status"), status):
+        if key and was_cancelled and not now_cancelled:
+            await bookings.release(key, booking["guests"])
+        raise HTTPException(status_code=409, detail="Booking was modified concurrently, please retry")
+
+    if key and now_cancelled and not was_cancelled:
+        await bookings.release(key, booking["guests"])
     
     return {"message": "Booking status updated"}
 
+@router.get("/bookings/availability")
+async def get_booking_availability(date: str):
+    try:
+        booking_slots.validate_date(date)
+    except booking_slots.SlotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"date": date, "slots": await get_repositories().bookings.availability(date)}
+
+@router.put("/bookings/slots/{date}/{time}", dependencies=[Depends(verify_admin)])
+async def set_booking_slot_capacity(date: str, time: str, capacity: int = Query(..., ge=0)):
+    try:
+        booking_slots.validate_date(date)
+        slot = booking_slots.slot_for(time)
+    except booking_slots.SlotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await get_repositories().bookings.set_capacity(date, slot, capacity)
+    return {"message": "Slot capacity updated", "date": date, "time": slot, "capacity": capacity}
+
 # ============= TESTIMONIAL ROUTES =============
 
 @router.get("/testimonials")
-async def get_testimonials():
-    db = get_db()
-    testimonials = await db.testimonials.find({"approved": True}).to_list(100)
-    for testimonial in testimonials:
-        testimonial["id"] = str(testimonial["_id"])
-        testimonial.pop("_id", None)
-    return testimonials
+async def get_testimonials(
+    if_none_match: Optional[str] = Header(None),
+    top: Optional[int] = Query(None, ge=1, le=RECENT_TESTIMONIALS),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100)
+):
+    """Approved testimonials, newest first; top=N for the N most recent"""
+    testimonials = get_repositories().testimonials
+    if top:
+        return cached_json(await testimonials.cached_recent(top), if_none_match)
+    if not cursor and not limit:
+        return cached_json(await testimonials.cached(), if_none_match)
+
+    try:
+        page, next_cursor = await testimonials.list_approved_page(cursor, limit or 100)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(content=encode_documents(page), headers=headers)
+
+@router.get("/testimonials/summary")
+async def get_testimonial_summary(if_none_match: Optional[str] = Header(None)):
+    """Count, average and 1-5 histogram of approved ratings"""
+    return cached_json(await get_repositories().testimonials.cached_summary(), if_none_match)
 
 @router.post("/testimonials")
 async def create_testimonial(testimonial_data: TestimonialCreate):
-    db = get_db()
-    
     testimonial = Testimonial(**testimonial_data.dict(), approved=False)
-    result = await db.testimonials.insert_one(testimonial.dict(exclude={"id"}))
+    testimonial_id = await get_repositories().testimonials.create(testimonial.dict(exclude={"id"}))
     
     return {
         "message": "Testimonial submitted for approval",
-        "testimonial_id": str(result.inserted_id)
+        "testimonial_id": testimonial_id
     }
 
 @router.get("/testimonials/pending", dependencies=[Depends(verify_admin)])
 async def get_pending_testimonials():
-    db = get_db()
-    testimonials = await db.testimonials.find({"approved": False}).to_list(100)
-    for testimonial in testimonials:
-        testimonial["id"] = str(testimonial["_id"])
-        testimonial.pop("_id", None)
-    return testimonials
+    testimonials = await get_repositories().testimonials.list_pending()
+    return FastJSONResponse(content=encode_documents(testimonials))
 
 @router.put("/testimonials/{testimonial_id}/approve", dependencies=[Depends(verify_admin)])
 async def approve_testimonial(testimonial_id: str):
-    db = get_db()
-    from bson import ObjectId
-    
-    result = await db.testimonials.update_one(
-        {"_id": ObjectId(testimonial_id)},
-        {"$set": {"approved": True}}
-    )
-    
-    if result.modified_count == 0:
+    if not await get_repositories().testimonials.approve(testimonial_id):
         raise HTTPException(status_code=404, detail="Testimonial not found")
     
     return {"message": "Testimonial approved"}
@@ -319,27 +446,21 @@ async def approve_testimonial(testimonial_id: str):
 # ============= GALLERY ROUTES =============
 
 @router.get("/gallery")
-async def get_gallery():
-    db = get_db()
-    images = await db.gallery.find().to_list(100)
-    for image in images:
-        image["id"] = str(image["_id"])
-        image.pop("_id", None)
-    return images
+async def get_gallery(if_none_match: Optional[str] = Header(None)):
+    return cached_json(await get_repositories().gallery.cached(), if_none_match)
 
 @router.post("/gallery", dependencies=[Depends(verify_admin)])
 async def add_gallery_image(image: GalleryImage):
     db = get_db()
-    result = await db.gallery.insert_one(image.dict(exclude={"id"}))
-    return {"message": "Image added", "id": str(result.inserted_id)}
+    if not image.image and not image.image_id:
+        raise HTTPException(status_code=400, detail="image or image_id is required")
+    await resolve_image_field(db, image, images.GALLERY_IMAGE_WIDTH)
+    image_id = await get_repositories().gallery.create(image.dict(exclude={"id"}))
+    return {"message": "Image added", "id": image_id}
 
 @router.delete("/gallery/{image_id}", dependencies=[Depends(verify_admin)])
 async def delete_gallery_image(image_id: str):
-    db = get_db()
-    from bson import ObjectId
-    
-    result = await db.gallery.delete_one({"_id": ObjectId(image_id)})
-    if result.deleted_count == 0:
+    if not await get_repositories().gallery.delete(image_id):
         raise HTTPException(status_code=404, detail="Image not found")
     
     return {"message": "Image deleted"}
@@ -347,31 +468,28 @@ async def delete_gallery_image(image_id: str):
 # ============= SPECIAL OFFERS ROUTES =============
 
 @router.get("/offers")
-async def get_special_offers():
-    db = get_db()
-    offers = await db.special_offers.find({"active": True}).to_list(100)
-    for offer in offers:
-        offer["id"] = str(offer["_id"])
-        offer.pop("_id", None)
-    return offers
+async def get_special_offers(if_none_match: Optional[str] = Header(None)):
+    """Offers live now; cacheable at most until the next offer starts or ends"""
+    offers = get_repositories().offers
+    payload = await offers.cached()
+    return cached_json(payload, if_none_match, public_cache_control(offers.seconds_until_change()))
+
+def offer_document(offer: SpecialOffer) -> dict:
+    doc = offer.dict(exclude={"id"})
+    try:
+        doc["starts_at"], doc["ends_at"] = offer_window(doc)
+    except OfferWindowError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return doc
 
 @router.post("/offers", dependencies=[Depends(verify_admin)])
 async def create_special_offer(offer: SpecialOffer):
-    db = get_db()
-    result = await db.special_offers.insert_one(offer.dict(exclude={"id"}))
-    return {"message": "Offer created", "id": str(result.inserted_id)}
+    offer_id = await get_repositories().offers.create(offer_document(offer))
+    return {"message": "Offer created", "id": offer_id}
 
 @router.put("/offers/{offer_id}", dependencies=[Depends(verify_admin)])
 async def update_special_offer(offer_id: str, offer: SpecialOffer):
-    db = get_db()
-    from bson import ObjectId
-    
-    result = await db.special_offers.update_one(
-        {"_id": ObjectId(offer_id)},
-        {"$set": offer.dict(exclude={"id"})}
-    )
-    
-    if result.modified_count == 0:
+    if not await get_repositories().offers.update(offer_id, offer_document(offer)):
         raise HTTPException(status_code=404, detail="Offer not found")
     
     return {"message": "Offer updated"}
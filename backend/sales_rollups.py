@@ -0,0 +1,180 @@
+"""Per-day and per-hour sales rollups maintained incrementally.
+
+Each rollup document holds revenue, order counts, items sold per item_id
+and the pickup/delivery split for one bucket. The order and payment paths
+``$inc`` them as orders are created, cancelled and paid, so dashboards
+read a handful of documents instead of scanning orders. Buckets follow
+the restaurant's local day (SALES_TZ_OFFSET_MINUTES, IST by default).
+
+Rebuild a range from the orders collection with
+
+    python sales_rollups.py --from 2024-12-01 --to 2024-12-31
+"""
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, UpdateOne
+from typing import Dict, List, Tuple
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SALES_TZ_OFFSET = timedelta(minutes=int(os.getenv("SALES_TZ_OFFSET_MINUTES", "330")))
+
+
+def local_time(created_at: datetime) -> datetime:
+    return created_at + SALES_TZ_OFFSET
+
+
+def _buckets(created_at: datetime) -> List[Tuple[str, str, datetime]]:
+    local = local_time(created_at)
+    day = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return [
+        (f"day:{day:%Y-%m-%d}", "day", day),
+        (f"hour:{hour:%Y-%m-%dT%H}", "hour", hour),
+    ]
+
+
+def _order_deltas(order: dict, sign: int) -> Dict[str, float]:
+    """Counters an order contributes to while it is not cancelled"""
+    deltas = {
+        "revenue": sign * order.get("total_amount", 0),
+        "orders": sign,
+        f"delivery_type.{order.get('delivery_type', 'pickup')}": sign,
+    }
+    for item in order.get("items", []):
+        key = f"items.{item['item_id']}"
+        deltas[key] = deltas.get(key, 0) + sign * item.get("quantity", 0)
+    return deltas
+
+
+async def _apply(db, created_at: datetime, deltas: Dict[str, float]) -> None:
+    await db.sales_rollups.bulk_write([
+        UpdateOne(
+            {"_id": key},
+            {"$inc": deltas, "$setOnInsert": {"period": period, "start": start}},
+            upsert=True
+        )
+        for key, period, start in _buckets(created_at)
+    ], ordered=False)
+
+
+async def _safely(coro, what: str) -> None:
+    # Rollups are derived data; a failed increment must not fail the order
+    # request and can be repaired with a rebuild
+    try:
+        await coro
+    except Exception as e:
+        logger.error("Could not update sales rollups for %s: %s", what, e)
+
+
+async def record_order(db, order: dict) -> None:
+    await _safely(_apply(db, order["created_at"], _order_deltas(order, 1)), "new order")
+
+
+async def record_cancellation(db, order: dict, cancelled: bool = True) -> None:
+    """Remove a cancelled order from the sales counters (or restore it)"""
+    sign = 1 if cancelled else -1
+    deltas = _order_deltas(order, -sign)
+    deltas["cancelled_orders"] = sign
+    deltas["cancelled_revenue"] = sign * order.get("total_amount", 0)
+    await _safely(_apply(db, order["created_at"], deltas), "cancellation")
+
+
+async def record_payment(db, order: dict) -> None:
+    deltas = {"paid_orders": 1, "paid_revenue": order.get("total_amount", 0)}
+    await _safely(_apply(db, order["created_at"], deltas), "payment")
+
+
+def _add(target: dict, deltas: Dict[str, float]) -> None:
+    for key, value in deltas.items():
+        node = target
+        *parents, leaf = key.split(".")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = node.get(leaf, 0) + value
+
+
+async def rebuild(db, start_day: datetime, end_day: datetime) -> int:
+    """Recompute rollups for local days in [start_day, end_day) from orders"""
+    start_utc, end_utc = start_day - SALES_TZ_OFFSET, end_day - SALES_TZ_OFFSET
+    rollups: Dict[str, dict] = {}
+    projection = {"created_at": 1, "total_amount": 1, "items": 1, "delivery_type": 1,
+                  "order_status": 1, "payment_status": 1}
+    async for order in db.orders.find({"created_at": {"$gte": start_utc, "$lt": end_utc}}, projection):
+        cancelled = order.get("order_status") == "cancelled"
+        deltas = _order_deltas(order, 0 if cancelled else 1)
+        if cancelled:
+            deltas.update({"cancelled_orders": 1, "cancelled_revenue": order.get("total_amount", 0)})
+        if order.get("payment_status") == "completed":
+            deltas.update({"paid_orders": 1, "paid_revenue": order.get("total_amount", 0)})
+        for key, period, start in _buckets(order["created_at"]):
+            _add(rollups.setdefault(key, {"_id": key, "period": period, "start": start}), deltas)
+
+    # Replace in place rather than delete-then-insert: record_order and
+    # record_payment keep upserting these _ids while the rebuild runs, and
+    # the range must never be left empty or fail on a duplicate key
+    if rollups:
+        await db.sales_rollups.bulk_write(
+            [ReplaceOne({"_id": key}, rollup, upsert=True) for key, rollup in rollups.items()],
+            ordered=False
+        )
+    await db.sales_rollups.delete_many(
+        {"start": {"$gte": start_day, "$lt": end_day}, "_id": {"$nin": list(rollups)}}
+    )
+    return len(rollups)
+
+
+async def get_rollups(db, period: str, start: datetime, end: datetime) -> List[dict]:
+    return await db.sales_rollups.find(
+        {"period": period, "start": {"$gte": start, "$lt": end}}
+    ).sort("start", 1).to_list(None)
+
+
+def summarize(rollups: List[dict], top_items: int = 10) -> dict:
+    """Fold day rollups into range totals"""
+    totals: dict = {}
+    for rollup in rollups:
+        _add(totals, {
+            key: value for key, value in _flatten(rollup)
+            if key not in ("_id", "period", "start")
+        })
+    items = totals.pop("items", {})
+    return {
+        "revenue": round(totals.get("revenue", 0), 2),
+        "orders": totals.get("orders", 0),
+        "average_order_value": round(totals["revenue"] / totals["orders"], 2) if totals.get("orders") else 0,
+        "paid_orders": totals.get("paid_orders", 0),
+        "paid_revenue": round(totals.get("paid_revenue", 0), 2),
+        "cancelled_orders": totals.get("cancelled_orders", 0),
+        "cancelled_revenue": round(totals.get("cancelled_revenue", 0), 2),
+        "delivery_type": totals.get("delivery_type", {}),
+        "top_items": [
+            {"item_id": item_id, "quantity": quantity}
+            for item_id, quantity in sorted(items.items(), key=lambda kv: kv[1], reverse=True)[:top_items]
+        ],
+    }
+
+
+def _flatten(doc: dict, prefix: str = ""):
+    for key, value in doc.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from server import db
+
+    parser = argparse.ArgumentParser(description="Rebuild sales rollups from orders")
+    parser.add_argument("--from", dest="start", required=True, help="first local day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", required=True, help="last local day (inclusive), YYYY-MM-DD")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d")
+    end = datetime.strptime(args.end, "%Y-%m-%d") + timedelta(days=1)
+    count = asyncio.run(rebuild(db, start, end))
+    print(f"Rebuilt {count} rollup documents")
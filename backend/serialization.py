@@ -0,0 +1,58 @@
+"""Single-pass encoding of Mongo documents into JSON response bytes.
+
+Read routes hand their documents to ``encode_documents`` and return the
+bytes in a ``FastJSONResponse``, which skips FastAPI's jsonable_encoder and
+response_model re-validation. Pass ``model`` to validate through pydantic
+where a route needs it. orjson is used when installed, the stdlib json
+module otherwise.
+"""
+from bson import ObjectId
+from datetime import date, datetime
+from fastapi.responses import Response
+from typing import Any, Iterable, Optional, Type
+from pydantic import BaseModel
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """Encode to compact JSON bytes, handling ObjectId and datetime"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def public_document(doc: dict, model: Optional[Type[BaseModel]] = None) -> dict:
+    """Expose ``_id`` as a string ``id``, optionally validating through a model"""
+    if "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    if model is not None:
+        return model(**doc).dict()
+    return doc
+
+
+def encode_documents(docs: Iterable[dict], model: Optional[Type[BaseModel]] = None) -> bytes:
+    return dumps([public_document(doc, model) for doc in docs])
+
+
+class FastJSONResponse(Response):
+    """JSON response that accepts pre-encoded bytes or encodes with ``dumps``"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
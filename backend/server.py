@@ -1,17 +1,22 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
+from typing import Optional
+from metrics import MetricsMiddleware, mongo_listener, registry
+from mongo_settings import client_options
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; reads default to the primary, catalog reads are
+# routed per repository (see mongo_settings)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_listener], **client_options())
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -23,10 +28,18 @@ api_router = APIRouter(prefix="/api")
 # Import routes
 from routes import router as main_router
 from payment_routes import router as payment_router
+from export_routes import router as export_router
+from event_routes import router as event_router
+from analytics_routes import router as analytics_router
+from image_routes import router as image_router
 
 # Add routes to the API router
 api_router.include_router(main_router)
 api_router.include_router(payment_router)
+api_router.include_router(export_router)
+api_router.include_router(event_router)
+api_router.include_router(analytics_router)
+api_router.include_router(image_router)
 
 @api_router.get("/")
 async def root():
@@ -35,12 +48,32 @@ async def root():
 # Include the router in the main app
 app.include_router(api_router)
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint; requires METRICS_TOKEN as a bearer token when set"""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+from rate_limit import RateLimitMiddleware, load_monitor
+from http_cache import HTTPCacheMiddleware
+
+# Innermost, so only responses from the app itself are compressed
+app.add_middleware(HTTPCacheMiddleware)
+# Added before CORS so that 429/503 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+# Outside the rate limiter so that rejected requests are timed too
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Retry-After"],
 )
 
 # Configure logging
@@ -54,12 +87,38 @@ logger = logging.getLogger(__name__)
 async def startup_event():
     """Initialize database with default data"""
     logger.info("Starting up Indian Spices Restaurant API")
+
+    from repositories import get_repositories, STORAGE_BACKEND
+    repos = get_repositories()
+
+    from events import broker
+    await broker.start(db)
+
+    await load_monitor.start()
+    await repos.offers.start()
+
+    if STORAGE_BACKEND == "mongo":
+        from indexes import ensure_indexes, explain_query_shapes
+        await ensure_indexes(db)
+        if os.getenv("INDEX_DIAGNOSTICS", "").lower() in ("1", "true", "yes"):
+            await explain_query_shapes(db)
+
+        from webhooks import processor
+        await processor.start(db)
+
+        from menu_migration import migrate_embedded_menu_items
+        if await migrate_embedded_menu_items(db):
+            await repos.menu.invalidate()
+
+        await repos.testimonials.ensure_rating_summary()
+    else:
+        logger.info("Using %s storage; analytics, exports and webhooks need MongoDB", STORAGE_BACKEND)
     
     # Create default admin user if not exists
     from auth import get_password_hash
-    admin_exists = await db.users.find_one({"username": "admin"})
+    admin_exists = await repos.users.get_by_username("admin")
     if not admin_exists:
-        await db.users.insert_one({
+        await repos.users.create({
             "username": "admin",
             "email": "admin@indianspices.com",
             "hashed_password": get_password_hash("admin123"),
@@ -69,5 +128,16 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    from payment_gateway import close_gateway
+    from events import broker
+    from webhooks import processor
+    from images import close_image_pool
+    from repositories import get_repositories
+    await get_repositories().offers.stop()
+    await processor.stop()
+    await broker.stop()
+    await load_monitor.stop()
+    await close_gateway()
+    close_image_pool()
     client.close()
     logger.info("Database connection closed")
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""Durable Razorpay webhook ingestion.
+
+The webhook route only verifies the signature and stores the raw delivery
+in ``webhook_events`` under its event id, so gateway retries are deduped
+by the primary key and the gateway gets its 200 straight away. Background
+workers then claim pending events in batches, apply them to
+``payment_orders`` and ``orders`` with bulk writes, and move events that
+keep failing to ``webhook_dead_letters``. Completed orders are updated one
+at a time so the sales rollups count each payment exactly once.
+"""
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from typing import List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+from payment_store import mark_order_paid
+import sales_rollups
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "2"))
+# Events claimed by a worker that died are handed out again after this long
+WEBHOOK_CLAIM_TIMEOUT = timedelta(minutes=5)
+
+PENDING = "pending"
+PROCESSING = "processing"
+PROCESSED = "processed"
+
+# Razorpay payment states mapped onto payment_orders.status / orders.payment_status
+PAYMENT_STATUS = {
+    "captured": "completed",
+    "failed": "failed",
+    "authorized": "authorized",
+}
+
+
+def event_id_for(body: bytes, header_event_id: Optional[str]) -> str:
+    """Razorpay's X-Razorpay-Event-Id, or a content hash for deliveries without one"""
+    return header_event_id or hashlib.sha256(body).hexdigest()
+
+
+async def ingest(db, body: bytes, header_event_id: Optional[str]) -> bool:
+    """Persist a verified delivery; returns False if it was already received"""
+    payload = json.loads(body.decode())
+    if not isinstance(payload, dict):
+        raise ValueError("Webhook payload is not a JSON object")
+    now = datetime.utcnow()
+    try:
+        await db.webhook_events.insert_one({
+            "_id": event_id_for(body, header_event_id),
+            "event": payload.get("event"),
+            "payload": body.decode(),
+            "status": PENDING,
+            "attempts": 0,
+            "received_at": now,
+            "next_attempt_at": now,
+        })
+    except DuplicateKeyError:
+        return False
+    processor.wake()
+    return True
+
+
+def _payment_entity(payload: dict) -> dict:
+    return payload.get("payload", {}).get("payment", {}).get("entity", {})
+
+
+class WebhookProcessor:
+    """Pool of asyncio workers draining webhook_events in batches"""
+
+    def __init__(self, workers: int = WEBHOOK_WORKERS, batch_size: int = WEBHOOK_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self) -> None:
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def start(self, db) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(db)) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _run(self, db) -> None:
+        while True:
+            try:
+                processed = await self.process_batch(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Webhook worker error: %s", e)
+                processed = 0
+            if processed < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), WEBHOOK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _claim(self, db) -> List[dict]:
+        now = datetime.utcnow()
+        claim = uuid.uuid4().hex
+        candidates = await db.webhook_events.find(
+            {"$or": [
+                {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": PROCESSING, "claimed_at": {"$lt": now - WEBHOOK_CLAIM_TIMEOUT}},
+            ]},
+            {"_id": 1, "status": 1}
+        ).sort("next_attempt_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not candidates:
+            return []
+        # Workers race for the same candidates; the status condition makes
+        # each event go to exactly one claim
+        await db.webhook_events.update_many(
+            {"_id": {"$in": [c["_id"] for c in candidates]}, "$or": [
+                {"status": PENDING},
+                {"status": PROCESSING, "claimed_at": {"$lt": now - WEBHOOK_CLAIM_TIMEOUT}},
+            ]},
+            {"$set": {"status": PROCESSING, "claim": claim, "claimed_at": now}}
+        )
+        return await db.webhook_events.find({"claim": claim, "status": PROCESSING}).to_list(self.batch_size)
+
+    async def process_batch(self, db) -> int:
+        events = await self._claim(db)
+        if not events:
+            return 0
+
+        parsed = {}
+        for event in events:
+            try:
+                payload = json.loads(event["payload"])
+            except ValueError as e:
+                await self._fail(db, event, f"Unparseable payload: {e}", retry=False)
+                continue
+            if not isinstance(payload, dict):
+                await self._fail(db, event, "Payload is not a JSON object", retry=False)
+                continue
+            parsed[event["_id"]] = payload
+
+        applied = list(parsed)
+        try:
+            await self._apply(db, list(parsed.values()))
+        except Exception as e:
+            # Events are idempotent, so retry them one by one and fail only
+            # those that still raise instead of the whole batch
+            logger.warning("Webhook batch failed (%s); applying events individually", e)
+            applied = []
+            for event in events:
+                if event["_id"] not in parsed:
+                    continue
+                try:
+                    await self._apply(db, [parsed[event["_id"]]])
+                except Exception as e:
+                    await self._fail(db, event, str(e))
+                else:
+                    applied.append(event["_id"])
+
+        if applied:
+            await db.webhook_events.update_many(
+                {"_id": {"$in": applied}},
+                {"$set": {"status": PROCESSED, "processed_at": datetime.utcnow()}, "$unset": {"claim": ""}}
+            )
+        return len(events)
+
+    async def _apply(self, db, payloads: List[dict]) -> None:
+        """Apply a batch of payment events with one bulk write per collection"""
+        payment_ops = []
+        order_updates = {}
+        for payload in payloads:
+            entity = _payment_entity(payload)
+            razorpay_order_id = entity.get("order_id")
+            if not razorpay_order_id:
+                continue
+            status = PAYMENT_STATUS.get(entity.get("status"))
+            update = {
+                "webhook_event": payload.get("event"),
+                "webhook_data": entity,
+            }
+            if entity.get("id"):
+                # Never write a null into the unique razorpay_payment_id index
+                update["razorpay_payment_id"] = entity["id"]
+            if status:
+                update["status"] = status
+            payment_ops.append(UpdateOne(
+                # Never downgrade a completed payment on an out-of-order event
+                {"razorpay_order_id": razorpay_order_id, "status": {"$ne": "completed"}},
+                {"$set": update}
+            ))
+            if status in ("completed", "failed"):
+                # A completed payment wins over any failure in the same batch
+                if order_updates.get(razorpay_order_id, (None,))[0] != "completed":
+                    order_updates[razorpay_order_id] = (status, entity.get("id"))
+
+        if payment_ops:
+            await db.payment_orders.bulk_write(payment_ops, ordered=False)
+        if not order_updates:
+            return
+
+        links = await db.payment_orders.find(
+            {"razorpay_order_id": {"$in": list(order_updates)}},
+            {"razorpay_order_id": 1, "order_id": 1}
+        ).to_list(len(order_updates))
+        order_ops = []
+        completions = []
+        for link in links:
+            order_id = link.get("order_id")
+            if not order_id or not ObjectId.is_valid(order_id):
+                # Still under checkout's temp_ placeholder: /payment/verify links
+                # the payment to its order and completes the order itself
+                continue
+            status, payment_id = order_updates[link["razorpay_order_id"]]
+            if status == "completed":
+                completions.append(mark_order_paid(db, {"_id": ObjectId(order_id)}, payment_id))
+                continue
+            order_ops.append(UpdateOne(
+                {"_id": ObjectId(order_id), "payment_status": {"$ne": "completed"}},
+                {"$set": {"payment_status": status, "payment_id": payment_id, "updated_at": datetime.utcnow()}}
+            ))
+        if order_ops:
+            await db.orders.bulk_write(order_ops, ordered=False)
+        for paid in await asyncio.gather(*completions):
+            if paid:
+                await sales_rollups.record_payment(db, paid)
+
+    async def _fail(self, db, event: dict, error: str, retry: bool = True) -> None:
+        attempts = event.get("attempts", 0) + 1
+        if not retry or attempts >= WEBHOOK_MAX_ATTEMPTS:
+            logger.error("Webhook %s dead-lettered after %d attempts: %s", event["_id"], attempts, error)
+            await db.webhook_dead_letters.replace_one(
+                {"_id": event["_id"]},
+                {**event, "attempts": attempts, "last_error": error, "failed_at": datetime.utcnow()},
+                upsert=True
+            )
+            await db.webhook_events.delete_one({"_id": event["_id"]})
+            return
+        backoff = timedelta(seconds=2 ** attempts)
+        await db.webhook_events.update_one(
+            {"_id": event["_id"]},
+            {"$set": {
+                "status": PENDING,
+                "attempts": attempts,
+                "last_error": error,
+                "next_attempt_at": datetime.utcnow() + backoff,
+            }, "$unset": {"claim": ""}}
+        )
+
+
+processor = WebhookProcessor()
@@ -98,6 +98,8 @@ export const bookingAPI = {
 // Testimonial API
 export const testimonialAPI = {
   getAll: () => api.get('/testimonials'),
+  getRecent: (top) => api.get('/testimonials', { params: { top } }),
+  getSummary: () => api.get('/testimonials/summary'),
   create: (testimonialData) => api.post('/testimonials', testimonialData),
   getPending: () => api.get('/testimonials/pending'),
   approve: (testimonialId) => api.put(`/testimonials/${testimonialId}/approve`),
@@ -139,7 +139,8 @@ const Checkout = () => {
             await paymentAPI.verifyPayment({
               razorpay_order_id: response.razorpay_order_id,
               razorpay_payment_id: response.razorpay_payment_id,
-              razorpay_signature: response.razorpay_signature
+              razorpay_signature: response.razorpay_signature,
+              order_id: dbOrderId // links the payment to the order created above
             });
 
             toast.dismiss();
@@ -0,0 +1,34 @@
+from pathlib import Path
+import os
+import sys
+
+# Backend modules import each other by top-level name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("PAYMENT_GATEWAY", "stub")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("ORDER_EVENTS_BROKER", "memory")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import pytest
+
+
+@pytest.fixture
+def api():
+    """Test client for the app on fresh in-memory storage"""
+    from fastapi.testclient import TestClient
+    from repositories import memory_repositories, set_repositories
+    import server
+
+    set_repositories(memory_repositories())
+    with TestClient(server.app) as client:
+        yield client
+    set_repositories(None)
+
+
+@pytest.fixture
+def admin_headers(api):
+    response = api.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
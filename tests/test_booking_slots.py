@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+import booking_slots
+from repositories.memory import MemoryBookingRepository
+from repositories.mongo import MongoBookingRepository
+
+DATE = "2030-01-01"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def bookings(request):
+    if request.param == "memory":
+        return MemoryBookingRepository()
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return MongoBookingRepository(mongomock_motor.AsyncMongoMockClient()["booking_slots_test"])
+
+
+async def booked(bookings, slot: str) -> int:
+    (counter,) = [s for s in await bookings.availability(DATE) if s["time"] == slot]
+    return counter["booked"]
+
+
+async def try_reserve(bookings, guests: int) -> bool:
+    try:
+        await bookings.reserve(DATE, "19:00", guests)
+    except booking_slots.SlotFull:
+        return False
+    return True
+
+
+def test_concurrent_reservations_never_exceed_capacity(bookings):
+    async def scenario():
+        await bookings.set_capacity(DATE, "19:00", 10)
+        results = await asyncio.gather(*(try_reserve(bookings, 3) for _ in range(6)))
+        assert results.count(True) == 3
+        assert await booked(bookings, "19:00") == 9
+        # The last cover can still go to a party that fits
+        assert await try_reserve(bookings, 1)
+        assert not await try_reserve(bookings, 1)
+    run(scenario())
+
+
+def test_first_reservation_creates_the_slot_with_default_capacity(bookings):
+    async def scenario():
+        key = await bookings.reserve(DATE, "12:30", booking_slots.BOOKING_SLOT_COVERS)
+        assert key == booking_slots.slot_key(DATE, "12:30")
+        with pytest.raises(booking_slots.SlotFull):
+            await bookings.reserve(DATE, "12:30", 1)
+    run(scenario())
+
+
+def test_release_returns_covers_and_never_goes_negative(bookings):
+    async def scenario():
+        key = await bookings.reserve(DATE, "19:00", 4)
+        await bookings.release(key, 4)
+        assert await booked(bookings, "19:00") == 0
+        await bookings.release(key, 4)
+        assert await booked(bookings, "19:00") == 0
+        await bookings.release(booking_slots.slot_key(DATE, "20:00"), 2)
+        assert await booked(bookings, "20:00") == 0
+    run(scenario())
+
+
+@pytest.mark.parametrize("time, slot", [("11:00", "11:00"), ("19:10", "19:00"), ("22:59", "22:30")])
+def test_slot_for_maps_times_to_slot_starts(time, slot):
+    assert booking_slots.slot_for(time) == slot
+
+
+@pytest.mark.parametrize("time", ["10:59", "23:00", "7pm"])
+def test_slot_for_rejects_times_outside_service(time):
+    with pytest.raises(booking_slots.SlotError):
+        booking_slots.slot_for(time)
+
+
+def booking(time: str = "19:10", guests: int = 4, date: str = DATE) -> dict:
+    return {"name": "Asha", "email": "asha@example.com", "phone": "9999999999",
+            "date": date, "time": time, "guests": guests}
+
+
+def booked_at(api, slot: str = "19:00") -> int:
+    slots = api.get("/api/bookings/availability", params={"date": DATE}).json()["slots"]
+    return next(s["booked"] for s in slots if s["time"] == slot)
+
+
+def test_booking_rejects_invalid_requests(api):
+    assert api.post("/api/bookings", json=booking(guests=0)).status_code == 400
+    assert api.post("/api/bookings", json=booking(time="03:00")).status_code == 400
+    assert api.post("/api/bookings", json=booking(date="01/01/2030")).status_code == 400
+    assert booked_at(api) == 0
+
+
+def test_full_slot_returns_conflict(api):
+    assert api.post("/api/bookings", json=booking(guests=booking_slots.BOOKING_SLOT_COVERS)).status_code == 200
+    assert api.post("/api/bookings", json=booking(guests=1)).status_code == 409
+
+
+def test_failed_create_releases_covers(api, monkeypatch):
+    from repositories import get_repositories
+
+    async def fail(booking):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(get_repositories().bookings, "create", fail)
+    with pytest.raises(RuntimeError):
+        api.post("/api/bookings", json=booking())
+    assert booked_at(api) == 0
+
+
+def test_cancel_and_reinstate_move_covers_once(api, admin_headers):
+    booking_id = api.post("/api/bookings", json=booking(guests=4)).json()["booking_id"]
+    assert booked_at(api) == 4
+
+    def set_status(status):
+        return api.put(f"/api/bookings/{booking_id}/status", params={"status": status}, headers=admin_headers)
+
+    assert set_status("cancelled").status_code == 200
+    assert set_status("cancelled").status_code == 200
+    assert booked_at(api) == 0
+    assert set_status("confirmed").status_code == 200
+    assert booked_at(api) == 4
+
+
+def test_stale_status_update_is_rejected_without_moving_covers(api, admin_headers, monkeypatch):
+    from repositories import get_repositories
+
+    bookings = get_repositories().bookings
+    booking_id = api.post("/api/bookings", json=booking(guests=4)).json()["booking_id"]
+    stale = run(bookings.get(booking_id))
+    assert api.put(f"/api/bookings/{booking_id}/status", params={"status": "cancelled"},
+                   headers=admin_headers).status_code == 200
+
+    # A second admin read the booking before the first cancellation landed
+    async def get(booking_id):
+        return dict(stale)
+
+    monkeypatch.setattr(bookings, "get", get)
+    response = api.put(f"/api/bookings/{booking_id}/status", params={"status": "cancelled"}, headers=admin_headers)
+    assert response.status_code == 409
+    assert booked_at(api) == 0
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from auth import create_access_token, create_stream_token
+from event_routes import verify_admin_stream
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def stream_token(api, admin_headers) -> str:
+    response = api.post("/api/events/orders/token", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["expires_in"] > 0
+    return response.json()["stream_token"]
+
+
+def test_stream_token_opens_the_stream(api, admin_headers):
+    user = run(verify_admin_stream(None, stream_token(api, admin_headers)))
+    assert user["username"] == "admin"
+
+
+def test_admin_token_is_refused_in_the_query_string(api, admin_headers):
+    access_token = admin_headers["Authorization"].split(" ", 1)[1]
+    with pytest.raises(HTTPException) as refused:
+        run(verify_admin_stream(None, access_token))
+    assert refused.value.status_code == 401
+
+
+def test_stream_token_is_not_an_admin_credential(api, admin_headers):
+    token = stream_token(api, admin_headers)
+    assert api.get("/api/orders", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert api.post("/api/events/orders/token", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_token_endpoint_requires_an_admin(api):
+    assert api.post("/api/events/orders/token").status_code == 401
+    customer = create_access_token({"sub": "nobody"})
+    assert api.post("/api/events/orders/token", headers={"Authorization": f"Bearer {customer}"}).status_code == 403
+
+
+def test_stream_token_of_a_non_admin_is_refused(api):
+    with pytest.raises(HTTPException) as refused:
+        run(verify_admin_stream(None, create_stream_token("nobody")))
+    assert refused.value.status_code == 403
+
+
+def test_stream_refuses_requests_without_a_stream_token(api, admin_headers):
+    access_token = admin_headers["Authorization"].split(" ", 1)[1]
+    assert api.get("/api/events/orders", params={"access_token": access_token}).status_code == 401
+    assert api.get("/api/events/orders", params={"stream_token": access_token}).status_code == 401
@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+
+import payment_gateway
+from payment_gateway import GatewayUnavailable, PaymentGatewayError, RazorpayGateway
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(payment_gateway, "PAYMENT_RETRY_BASE_SECONDS", 0)
+
+
+def gateway(handler) -> RazorpayGateway:
+    gateway = RazorpayGateway("rzp_test_key", "rzp_test_secret")
+    gateway._client = httpx.AsyncClient(base_url="https://gateway.test", transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def test_cancelled_calls_do_not_open_the_breaker():
+    async def hang(request):
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        client = gateway(hang)
+        for _ in range(client.breaker.threshold + 1):
+            call = asyncio.create_task(client.create_order(100, "INR"))
+            await asyncio.sleep(0.01)
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+        assert client.breaker.state == "closed"
+        assert client.breaker.failures == 0
+    run(scenario())
+
+
+def test_cancelled_half_open_probe_frees_the_slot():
+    async def hang(request):
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        client = gateway(hang)
+        client.breaker.opened_at = 0  # cooled down long ago: half-open
+        probe = asyncio.create_task(client.create_order(100, "INR"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(GatewayUnavailable):
+            await client.create_order(100, "INR")
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert client.breaker.state == "half-open"
+        assert client.breaker.failures == 0
+
+        # The next call becomes the probe and closes the breaker on success
+        client._client = httpx.AsyncClient(
+            base_url="https://gateway.test",
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"id": "order_1"}))
+        )
+        assert (await client.create_order(100, "INR"))["id"] == "order_1"
+        assert client.breaker.state == "closed"
+    run(scenario())
+
+
+def test_unreachable_gateway_counts_as_a_failure():
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        client = gateway(refuse)
+        for _ in range(client.breaker.threshold):
+            with pytest.raises(PaymentGatewayError):
+                await client.create_order(100, "INR")
+        assert client.breaker.state == "open"
+    run(scenario())
@@ -0,0 +1,165 @@
+from datetime import datetime
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import payment_store
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # mongomock is a standalone server: exercise the non-transactional path
+    monkeypatch.setattr(payment_store, "_transactions_supported", None)
+    return mongomock_motor.AsyncMongoMockClient()
+
+
+@pytest.fixture
+def db(client):
+    return client["payment_store_test"]
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Orders passed to sales_rollups.record_payment"""
+    calls = []
+
+    async def record_payment(db, order):
+        calls.append(order)
+
+    monkeypatch.setattr(payment_store.sales_rollups, "record_payment", record_payment)
+    return calls
+
+
+async def seed(db) -> str:
+    order = await db.orders.insert_one({
+        "created_at": datetime.utcnow(), "total_amount": 440, "payment_status": "pending",
+    })
+    await db.payment_orders.insert_one({
+        "razorpay_order_id": "order_rzp_1", "order_id": str(order.inserted_id), "status": "created",
+    })
+    return order.inserted_id
+
+
+def test_mark_order_paid_returns_the_order_only_once(db):
+    async def scenario():
+        order_id = await seed(db)
+        first = await payment_store.mark_order_paid(db, {"_id": order_id}, "pay_1")
+        assert first["total_amount"] == 440
+        assert await payment_store.mark_order_paid(db, {"_id": order_id}, "pay_2") is None
+        order = await db.orders.find_one({"_id": order_id})
+        assert (order["payment_status"], order["payment_id"]) == ("completed", "pay_1")
+    run(scenario())
+
+
+def test_repeated_completion_pays_the_order_once(client, db, recorded):
+    async def scenario():
+        order_id = await seed(db)
+        first = await payment_store.complete_payment(client, db, "order_rzp_1", "pay_1")
+        second = await payment_store.complete_payment(client, db, "order_rzp_1", "pay_1")
+        assert first["status"] == "created"
+        assert second["status"] == "completed"
+        assert [order["_id"] for order in recorded] == [order_id]
+        order = await db.orders.find_one({"_id": order_id})
+        assert order["payment_status"] == "completed"
+        payment = await db.payment_orders.find_one()
+        assert (payment["status"], payment["razorpay_payment_id"]) == ("completed", "pay_1")
+    run(scenario())
+
+
+def test_unknown_payment_order_is_ignored(client, db, recorded):
+    async def scenario():
+        await seed(db)
+        assert await payment_store.complete_payment(client, db, "order_unknown", "pay_1") is None
+        assert await db.orders.count_documents({"payment_status": "completed"}) == 0
+        assert recorded == []
+    run(scenario())
+
+
+def test_payment_record_is_restored_when_the_order_update_fails(client, db, recorded, monkeypatch):
+    async def fail(db, order_filter, payment_id, session=None):
+        raise RuntimeError("order update failed")
+
+    async def scenario():
+        await seed(db)
+        monkeypatch.setattr(payment_store, "mark_order_paid", fail)
+        with pytest.raises(RuntimeError):
+            await payment_store.complete_payment(client, db, "order_rzp_1", "pay_1")
+        payment = await db.payment_orders.find_one()
+        assert payment["status"] == "created"
+        assert "razorpay_payment_id" not in payment and "completed_at" not in payment
+        assert recorded == []
+    run(scenario())
+
+
+def test_memory_repository_completes_payments_idempotently():
+    from repositories import memory_repositories
+
+    async def scenario():
+        repos = memory_repositories()
+        order_id = await repos.orders.create({"payment_status": "pending", "total_amount": 440})
+        await repos.payments.create({"razorpay_order_id": "order_rzp_1", "order_id": order_id, "status": "created"})
+        assert (await repos.payments.complete("order_rzp_1", "pay_1"))["status"] == "created"
+        assert (await repos.payments.complete("order_rzp_1", "pay_2"))["status"] == "completed"
+        order = await repos.orders.get(order_id)
+        assert (order["payment_status"], order["payment_id"]) == ("completed", "pay_1")
+        assert await repos.payments.complete("order_unknown", "pay_1") is None
+    run(scenario())
+
+
+def test_checkout_payment_is_completed_once_linked_to_its_order(client, db, recorded):
+    from repositories.mongo import MongoPaymentRepository
+
+    async def scenario():
+        payments = MongoPaymentRepository(db, client)
+        # Checkout creates the payment before the order, under a placeholder id
+        await payments.create({"razorpay_order_id": "order_rzp_1", "order_id": "temp_1700000000000",
+                               "amount": 44000, "status": "created"})
+        order = await db.orders.insert_one({
+            "created_at": datetime.utcnow(), "total_amount": 440, "payment_status": "pending",
+        })
+        order_id = str(order.inserted_id)
+
+        # Unlinked, the payment completes but cannot reach the order
+        await payment_store.complete_payment(client, db, "order_rzp_1", "pay_1")
+        assert (await db.orders.find_one())["payment_status"] == "pending"
+
+        assert not await payments.link_order_if("order_rzp_1", "temp_other", order_id)
+        assert await payments.link_order_if("order_rzp_1", "temp_1700000000000", order_id)
+        before = await payments.complete("order_rzp_1", "pay_1")
+        assert before["order_id"] == order_id
+        assert (await db.orders.find_one())["payment_status"] == "completed"
+        assert [paid["_id"] for paid in recorded] == [order.inserted_id]
+    run(scenario())
+
+
+def test_verify_links_and_completes_checkout_orders(api):
+    from payment_gateway import get_gateway
+    from repositories import get_repositories
+
+    async def create_order():
+        return await get_repositories().orders.create({"payment_status": "pending", "total_amount": 440})
+
+    payment = api.post("/api/payment/create-order", json={"amount": 44000, "order_id": "temp_1700000000000"}).json()
+    order_id = run(create_order())
+    verification = {
+        "razorpay_order_id": payment["order_id"],
+        "razorpay_payment_id": "pay_1",
+        "razorpay_signature": get_gateway().sign_payment(payment["order_id"], "pay_1"),
+        "order_id": order_id,
+    }
+    assert api.post("/api/payment/verify", json=verification).status_code == 200
+    assert api.post("/api/payment/verify", json=verification).status_code == 200
+    order = run(get_repositories().orders.get(order_id))
+    assert (order["payment_status"], order["payment_id"]) == ("completed", "pay_1")
+
+    # A linked payment cannot be moved to another order
+    other_id = run(create_order())
+    response = api.post("/api/payment/verify", json={**verification, "order_id": other_id})
+    assert response.status_code == 400
+    assert run(get_repositories().orders.get(other_id))["payment_status"] == "pending"
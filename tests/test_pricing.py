@@ -0,0 +1,119 @@
+import pytest
+
+from models import OrderItem
+from pricing import PriceIndex, PricingError
+
+CATEGORIES = [{
+    "id": "cat_1",
+    "items": [
+        {"id": "paneer", "name": "Paneer Tikka", "price": 220, "available": True},
+        {"id": "naan", "name": "Butter Naan", "price": 45.5},
+        {"id": "kulfi", "name": "Kulfi", "price": 90, "available": False},
+    ],
+}]
+
+
+def line(item_id: str, quantity: int = 1, price: float = 1) -> OrderItem:
+    """An order line as the browser sends it, with a client-side price"""
+    return OrderItem(item_id=item_id, name="client name", price=price, quantity=quantity, subtotal=price * quantity)
+
+
+@pytest.fixture
+def index():
+    index = PriceIndex()
+    index.rebuild(CATEGORIES)
+    return index
+
+
+def test_lines_and_total_are_recomputed_from_menu_prices(index):
+    items, total = index.price_items([line("paneer", 2, price=1), line("naan", 3, price=0)])
+    assert [(i.name, i.price, i.subtotal) for i in items] == [("Paneer Tikka", 220.0, 440.0), ("Butter Naan", 45.5, 136.5)]
+    assert total == 576.5
+
+
+@pytest.mark.parametrize("items, message", [
+    ([line("missing")], "not found"),
+    ([line("kulfi")], "unavailable"),
+    ([line("paneer", 0)], "Invalid quantity"),
+    ([line("paneer", -2)], "Invalid quantity"),
+    ([], "no items"),
+])
+def test_invalid_orders_are_rejected(index, items, message):
+    with pytest.raises(PricingError, match=message):
+        index.price_items(items)
+
+
+def test_rebuild_replaces_the_previous_index(index):
+    index.rebuild([{"id": "cat_1", "items": [{"id": "naan", "name": "Butter Naan", "price": 50}]}])
+    assert index.get("paneer") is None
+    assert index.get("naan").price == 50.0
+
+
+def create_item(api, headers, price, available=True) -> str:
+    category = api.post("/api/menu/category", json={"name": "Starters", "description": "d"}, headers=headers).json()
+    item = {"name": "Paneer Tikka", "description": "d", "price": price, "category": "Veg", "available": available}
+    return api.post("/api/menu/item", params={"category_id": category["id"]}, json=item, headers=headers).json()["id"]
+
+
+def order(*items: OrderItem) -> dict:
+    return {
+        "customer_name": "Asha", "customer_email": "asha@example.com", "customer_phone": "9999999999",
+        "items": [item.dict() for item in items], "total_amount": 1,
+    }
+
+
+def test_checkout_charges_menu_prices(api, admin_headers):
+    item_id = create_item(api, admin_headers, price=220)
+    response = api.post("/api/orders", json=order(line(item_id, 2, price=1)))
+    assert response.status_code == 200
+    assert response.json()["total_amount"] == 440.0
+    stored = api.get(f"/api/orders/{response.json()['order_id']}").json()
+    assert stored["items"][0]["price"] == 220.0
+
+
+def test_checkout_sees_price_changes(api, admin_headers):
+    item_id = create_item(api, admin_headers, price=220)
+    assert api.post("/api/orders", json=order(line(item_id))).json()["total_amount"] == 220.0
+    update = {"name": "Paneer Tikka", "description": "d", "price": 250, "category": "Veg", "available": True}
+    assert api.put(f"/api/menu/item/{item_id}", json=update, headers=admin_headers).status_code == 200
+    assert api.post("/api/orders", json=order(line(item_id))).json()["total_amount"] == 250.0
+
+
+@pytest.mark.parametrize("available, quantity", [(False, 1), (True, 0)])
+def test_checkout_rejects_invalid_lines(api, admin_headers, available, quantity):
+    item_id = create_item(api, admin_headers, price=220, available=available)
+    assert api.post("/api/orders", json=order(line(item_id, quantity))).status_code == 400
+    assert api.post("/api/orders", json=order(line("unknown"))).status_code == 400
+
+
+def pay(api, amount: int, order_id: str, linked_order_id=None):
+    """Create a gateway order and verify a stub payment for it"""
+    from payment_gateway import get_gateway
+
+    payment = api.post("/api/payment/create-order", json={"amount": amount, "order_id": order_id}).json()
+    verification = {
+        "razorpay_order_id": payment["order_id"],
+        "razorpay_payment_id": "pay_1",
+        "razorpay_signature": get_gateway().sign_payment(payment["order_id"], "pay_1"),
+        "order_id": linked_order_id,
+    }
+    return payment, api.post("/api/payment/verify", json=verification)
+
+
+def test_gateway_order_is_created_for_the_stored_total(api, admin_headers):
+    item_id = create_item(api, admin_headers, price=220)
+    order_id = api.post("/api/orders", json=order(line(item_id, 2))).json()["order_id"]
+    payment, response = pay(api, 100, order_id)
+    assert payment["amount"] == 44000
+    assert response.status_code == 200
+    assert api.get(f"/api/orders/{order_id}").json()["payment_status"] == "completed"
+
+
+def test_underpaid_checkout_is_rejected(api, admin_headers):
+    item_id = create_item(api, admin_headers, price=220)
+    order_id = api.post("/api/orders", json=order(line(item_id, 2))).json()["order_id"]
+    # Checkout creates the payment under a placeholder id with its own amount
+    _, response = pay(api, 100, "temp_1", linked_order_id=order_id)
+    assert response.status_code == 400
+    assert "amount" in response.json()["detail"]
+    assert api.get(f"/api/orders/{order_id}").json()["payment_status"] == "pending"
@@ -0,0 +1,54 @@
+import asyncio
+
+from cache import PrincipalCache, principal_cache
+from repositories.caching import CachedUserRepository
+from repositories.memory import MemoryCacheVersionRepository, MemoryUserRepository
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def users():
+    versions = MemoryCacheVersionRepository()
+    return CachedUserRepository(MemoryUserRepository(), versions), versions
+
+
+def test_user_change_evicts_principals_on_other_workers():
+    async def scenario():
+        repo, versions = users()
+        user_id = await repo.create({"username": "admin", "is_admin": True})
+        other_worker = PrincipalCache(check_interval=0)
+        await other_worker.sync(versions)
+        other_worker.put("token", {"_id": user_id, "username": "admin"})
+
+        await repo.set_password_hash(user_id, "new-hash")
+        assert other_worker.get("token") is not None  # not synced yet
+        await other_worker.sync(versions)
+        assert other_worker.get("token") is None
+    run(scenario())
+
+
+def test_version_is_reread_only_after_the_check_interval():
+    async def scenario():
+        repo, versions = users()
+        cache = PrincipalCache(check_interval=3600)
+        await cache.sync(versions)
+        cache.put("token", {"username": "admin"})
+        await repo.create({"username": "other"})
+        await cache.sync(versions)
+        assert cache.get("token") is not None
+        cache.check_interval = 0
+        await cache.sync(versions)
+        assert cache.get("token") is None
+    run(scenario())
+
+
+def test_password_change_evicts_the_local_worker_at_once():
+    async def scenario():
+        repo, _ = users()
+        user_id = await repo.create({"username": "admin", "is_admin": True})
+        principal_cache.put("token", {"_id": user_id, "username": "admin"})
+        await repo.set_password_hash(user_id, "new-hash")
+        assert principal_cache.get("token") is None
+    run(scenario())
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import payment_store
+from repositories.mongo import MongoTestimonialRepository
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def testimonials(monkeypatch):
+    # mongomock is a standalone server: no transactions
+    monkeypatch.setattr(payment_store, "_transactions_supported", None)
+    client = mongomock_motor.AsyncMongoMockClient()
+    return MongoTestimonialRepository(client["testimonials_test"], client=client)
+
+
+async def submit(testimonials, rating: int) -> str:
+    return await testimonials.create({"name": "Asha", "comment": "Lovely", "rating": rating, "approved": False})
+
+
+def test_approval_counts_the_rating_once(testimonials):
+    async def scenario():
+        testimonial_id = await submit(testimonials, 4)
+        assert await testimonials.approve(testimonial_id)
+        assert not await testimonials.approve(testimonial_id)
+        summary = await testimonials.rating_summary()
+        assert summary["count"] == 1
+        assert summary["average"] == 4
+    run(scenario())
+
+
+def test_summary_is_recomputed_when_the_increment_fails(testimonials, monkeypatch):
+    async def scenario():
+        assert await testimonials.approve(await submit(testimonials, 5))
+
+        async def fail(rating, session=None):
+            raise RuntimeError("stats write failed")
+
+        monkeypatch.setattr(testimonials, "_count", fail)
+        assert await testimonials.approve(await submit(testimonials, 3))
+        summary = await testimonials.rating_summary()
+        assert summary["count"] == 2
+        assert summary["average"] == 4
+    run(scenario())
+
+
+def test_missing_summary_is_built_at_startup(testimonials):
+    async def scenario():
+        for rating in (5, 4):
+            await testimonials.approve(await submit(testimonials, rating))
+        await submit(testimonials, 1)
+        await testimonials.db.testimonial_stats.delete_many({})
+        await testimonials.ensure_rating_summary()
+        summary = await testimonials.rating_summary()
+        assert summary["count"] == 2
+        assert summary["average"] == 4.5
+    run(scenario())
@@ -0,0 +1,205 @@
+from datetime import datetime
+import asyncio
+import hashlib
+import hmac
+import json
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import webhooks
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def payment_event(razorpay_order_id: str, status: str, payment_id: str = "pay_1") -> dict:
+    return {
+        "event": f"payment.{status}",
+        "payload": {"payment": {"entity": {"id": payment_id, "order_id": razorpay_order_id, "status": status}}},
+    }
+
+
+async def seed(db, count: int = 1) -> list:
+    """Orders with a linked payment record; returns their razorpay order ids"""
+    ids = []
+    for i in range(count):
+        order = await db.orders.insert_one({
+            "created_at": datetime.utcnow(), "total_amount": 100, "payment_status": "pending",
+        })
+        await db.payment_orders.insert_one({
+            "razorpay_order_id": f"order_{i}", "order_id": str(order.inserted_id), "status": "created",
+        })
+        ids.append(f"order_{i}")
+    return ids
+
+
+async def deliver(db, payloads) -> None:
+    for i, payload in enumerate(payloads):
+        await webhooks.ingest(db, json.dumps(payload).encode(), f"evt_{i}")
+
+
+async def store_raw(db, event_id: str, body: str) -> None:
+    """An event row as ingest would write it, bypassing ingest's validation"""
+    now = datetime.utcnow()
+    await db.webhook_events.insert_one({
+        "_id": event_id, "payload": body, "status": webhooks.PENDING, "attempts": 0,
+        "received_at": now, "next_attempt_at": now,
+    })
+
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["webhooks_test"]
+
+
+def test_batch_completes_orders_and_marks_events_processed(db):
+    async def scenario():
+        ids = await seed(db, 3)
+        await deliver(db, [payment_event(i, "captured", f"pay_{i}") for i in ids])
+        assert await webhooks.WebhookProcessor(batch_size=10).process_batch(db) == 3
+        orders = await db.orders.find().to_list(None)
+        assert {o["payment_status"] for o in orders} == {"completed"}
+        payments = await db.payment_orders.find().to_list(None)
+        assert {p["status"] for p in payments} == {"completed"}
+        events = await db.webhook_events.find().to_list(None)
+        assert {e["status"] for e in events} == {webhooks.PROCESSED}
+    run(scenario())
+
+
+def test_redelivered_event_is_ingested_once(db):
+    async def scenario():
+        body = json.dumps(payment_event("order_0", "captured")).encode()
+        assert await webhooks.ingest(db, body, "evt_same") is True
+        assert await webhooks.ingest(db, body, "evt_same") is False
+        assert await db.webhook_events.count_documents({}) == 1
+    run(scenario())
+
+
+def test_failure_after_capture_in_same_batch_keeps_order_completed(db):
+    async def scenario():
+        (razorpay_order_id,) = await seed(db)
+        await deliver(db, [payment_event(razorpay_order_id, "captured"), payment_event(razorpay_order_id, "failed")])
+        await webhooks.WebhookProcessor(batch_size=10).process_batch(db)
+        order = await db.orders.find_one()
+        assert order["payment_status"] == "completed"
+        payment = await db.payment_orders.find_one()
+        assert payment["status"] == "completed"
+    run(scenario())
+
+
+def test_ingest_rejects_payloads_that_are_not_objects(db):
+    async def scenario():
+        for body in (b"not json", b"[1, 2]"):
+            with pytest.raises(ValueError):
+                await webhooks.ingest(db, body, None)
+        assert await db.webhook_events.count_documents({}) == 0
+    run(scenario())
+
+
+def test_invalid_payloads_are_dead_lettered_without_failing_the_batch(db):
+    async def scenario():
+        ids = await seed(db, 2)
+        await store_raw(db, "evt_bad_json", "not json")
+        await store_raw(db, "evt_list", "[1, 2]")
+        await deliver(db, [payment_event(i, "captured", f"pay_{i}") for i in ids])
+        await webhooks.WebhookProcessor(batch_size=10).process_batch(db)
+        assert await db.webhook_dead_letters.count_documents({}) == 2
+        assert await db.orders.count_documents({"payment_status": "completed"}) == 2
+        assert await db.webhook_events.count_documents({"status": webhooks.PROCESSED}) == 2
+    run(scenario())
+
+
+def test_poison_event_is_retried_alone_then_dead_lettered(db, monkeypatch):
+    async def scenario():
+        ids = await seed(db, 3)
+        poison = payment_event(ids[0], "captured", "pay_poison")
+        await deliver(db, [poison] + [payment_event(i, "captured", f"pay_{i}") for i in ids[1:]])
+
+        real_apply = webhooks.WebhookProcessor._apply
+
+        async def apply(self, db, payloads):
+            if any(_entity_id(p) == "pay_poison" for p in payloads):
+                raise RuntimeError("boom")
+            await real_apply(self, db, payloads)
+
+        monkeypatch.setattr(webhooks.WebhookProcessor, "_apply", apply)
+        processor = webhooks.WebhookProcessor(batch_size=10)
+        await processor.process_batch(db)
+
+        # The valid events went through individually
+        assert await db.webhook_events.count_documents({"status": webhooks.PROCESSED}) == 2
+        assert await db.orders.count_documents({"payment_status": "completed"}) == 2
+        pending = await db.webhook_events.find_one({"status": webhooks.PENDING})
+        assert pending["_id"] == "evt_0" and pending["attempts"] == 1
+
+        # Retried until WEBHOOK_MAX_ATTEMPTS, then moved to the dead letters
+        for _ in range(webhooks.WEBHOOK_MAX_ATTEMPTS - 1):
+            await db.webhook_events.update_one({"_id": "evt_0"}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+            await processor.process_batch(db)
+        dead = await db.webhook_dead_letters.find_one({"_id": "evt_0"})
+        assert dead["attempts"] == webhooks.WEBHOOK_MAX_ATTEMPTS
+        assert dead["last_error"] == "boom"
+        assert await db.webhook_events.find_one({"_id": "evt_0"}) is None
+    run(scenario())
+
+
+def _entity_id(payload: dict):
+    return webhooks._payment_entity(payload).get("id")
+
+
+@pytest.fixture
+def webhook(api, db, monkeypatch):
+    """POST a signed (or unsigned) delivery to /api/payment/webhook"""
+    import payment_routes
+
+    monkeypatch.setattr(payment_routes, "get_db", lambda: db)
+
+    def post(payload: dict, secret=None, event_id: str = "evt_1"):
+        body = json.dumps(payload).encode()
+        headers = {"X-Razorpay-Event-Id": event_id}
+        if secret:
+            headers["X-Razorpay-Signature"] = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return api.post("/api/payment/webhook", content=body, headers=headers)
+
+    return post
+
+
+@pytest.mark.parametrize("secret", [None, "", "dummy_webhook_secret"])
+def test_webhooks_are_refused_without_a_secret(webhook, db, monkeypatch, secret):
+    if secret is None:
+        monkeypatch.delenv("RAZORPAY_WEBHOOK_SECRET", raising=False)
+    else:
+        monkeypatch.setenv("RAZORPAY_WEBHOOK_SECRET", secret)
+    assert webhook(payment_event("order_0", "captured"), secret="dummy_webhook_secret").status_code == 503
+    assert run(db.webhook_events.count_documents({})) == 0
+
+
+def test_only_signed_webhooks_are_queued(webhook, db, monkeypatch):
+    monkeypatch.setenv("RAZORPAY_WEBHOOK_SECRET", "whsec_test")
+    event = payment_event("order_0", "captured")
+    assert webhook(event).status_code == 400
+    assert webhook(event, secret="forged").status_code == 400
+    assert run(db.webhook_events.count_documents({})) == 0
+    response = webhook(event, secret="whsec_test")
+    assert response.json() == {"status": "accepted"}
+    assert run(db.webhook_events.count_documents({})) == 1
+
+
+def test_events_without_a_payment_id_leave_it_unset(db):
+    from indexes import INDEXES
+
+    async def scenario():
+        await db.payment_orders.create_indexes(INDEXES["payment_orders"])
+        ids = await seed(db, 2)
+        events = [payment_event(i, "failed") for i in ids]
+        for event in events:
+            del event["payload"]["payment"]["entity"]["id"]
+        await deliver(db, events)
+        assert await webhooks.WebhookProcessor(batch_size=10).process_batch(db) == 2
+        assert await db.webhook_events.count_documents({"status": webhooks.PROCESSED}) == 2
+        assert await db.payment_orders.count_documents({"razorpay_payment_id": {"$exists": True}}) == 0
+        assert await db.payment_orders.count_documents({"status": "failed"}) == 2
+    run(scenario())